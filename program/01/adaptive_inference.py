@@ -0,0 +1,161 @@
+import math
+import time
+import numpy as np
+import cv2
+
+
+class FlowTracker:
+    """Moves boxes between detector runs with sparse Lucas-Kanade flow on a downscaled frame."""
+
+    def __init__(self, scale=0.25, points_per_box=16, fb_threshold=1.0):
+        self.scale = scale
+        self.points_per_box = points_per_box
+        self.fb_threshold = fb_threshold  # forward-backward error in downscaled pixels
+        self.prev_gray = None
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def prepare(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def reset(self, frame):
+        self.prev_gray = self.prepare(frame)
+
+    def _flow(self, gray, pts):
+        nxt, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, pts, None, **self.lk_params)
+        back, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, nxt, None, **self.lk_params)
+        fb_err = np.linalg.norm((pts - back).reshape(-1, 2), axis=1)
+        ok = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb_err < self.fb_threshold)
+        return (nxt - pts).reshape(-1, 2), ok
+
+    def _grid(self, x, y, w, h, n):
+        k = max(int(math.sqrt(n)), 2)
+        xs = np.linspace(x + 0.2 * w, x + 0.8 * w, k)
+        ys = np.linspace(y + 0.2 * h, y + 0.8 * h, k)
+        return np.array(np.meshgrid(xs, ys), dtype=np.float32).reshape(2, -1).T
+
+    def update(self, frame, boxes):
+        """Shift (n, 4) ltwh boxes to frame.
+
+        Returns (boxes, quality, motion): quality is the per-box fraction of
+        points tracked reliably, motion the median global displacement in
+        full-resolution pixels.
+        """
+        gray = self.prepare(frame)
+        h, w = gray.shape
+        s = self.scale
+        # coarse grid over the whole frame for global scene motion
+        grid = self._grid(0, 0, w, h, 36).reshape(-1, 1, 2)
+        per_box = [self._grid(b[0] * s, b[1] * s, b[2] * s, b[3] * s, self.points_per_box) for b in boxes]
+        pts = np.concatenate([grid.reshape(-1, 2)] + per_box).reshape(-1, 1, 2).astype(np.float32)
+        disp, ok = self._flow(gray, pts)
+        self.prev_gray = gray
+
+        n_grid = len(grid)
+        motion = float(np.median(np.linalg.norm(disp[:n_grid][ok[:n_grid]], axis=1))) / s if ok[:n_grid].any() else float("inf")
+        new_boxes = boxes.copy()
+        quality = np.zeros(len(boxes), dtype=np.float32)
+        start = n_grid
+        for i, p in enumerate(per_box):
+            d, o = disp[start:start + len(p)], ok[start:start + len(p)]
+            start += len(p)
+            quality[i] = o.mean() if len(o) else 0.0
+            if o.any():
+                new_boxes[i, :2] += np.median(d[o], axis=0) / s
+        return new_boxes, quality, motion
+
+
+class AdaptiveDetector:
+    """Runs the detector every N frames and tracks boxes with optical flow in between.
+
+    N shrinks when the scene moves fast and grows when it is static, but
+    never below what the latency budget allows for the measured detector
+    time. The detector is forced as soon as a track's quality drops below
+    min_quality.
+    """
+
+    def __init__(self, detector, confidence_thres=0.8, iou_thres=0.45, min_interval=1, max_interval=8,
+                 latency_budget=0.05, motion_high=20.0, min_quality=0.5, flow_scale=0.25):
+        self.detector = detector
+        self.confidence_thres = confidence_thres
+        self.iou_thres = iou_thres
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.latency_budget = latency_budget  # seconds per frame, averaged over an interval
+        self.motion_high = motion_high        # px/frame at which the interval drops to min_interval
+        self.min_quality = min_quality
+        self.tracker = FlowTracker(flow_scale)
+
+        self.result = None
+        self.scores = None  # detector scores of the tracked boxes, result carries them scaled by the flow quality
+        self.interval = min_interval
+        self.since_detect = 0
+        self.motion = 0.0
+        self.detect_time = None  # EMA, seconds
+        self.track_time = 0.0
+        self.detections = 0
+        self.tracked = 0
+        self.forced = 0
+        self.last_source = None
+
+    def _ema(self, old, new, a=0.2):
+        return new if old is None else (1 - a) * old + a * new
+
+    def detect(self, frame, reset_tracker=True):
+        t0 = time.perf_counter()
+        y = self.detector.predict(self.detector.preprocess(frame))
+        self.result = self.detector.postprocess(frame, y, self.confidence_thres, self.iou_thres)
+        self.scores = self.result[1]
+        if reset_tracker:
+            self.tracker.reset(frame)
+        self.detect_time = self._ema(self.detect_time, time.perf_counter() - t0)
+        self.since_detect = 0
+        self.detections += 1
+        self.last_source = "detect"
+        return self.result
+
+    def _update_interval(self):
+        motion_factor = min(self.motion / self.motion_high, 1.0)
+        n_motion = round(self.max_interval - motion_factor * (self.max_interval - self.min_interval))
+        # smallest interval whose average per-frame cost fits the budget
+        n_latency = self.min_interval
+        if self.detect_time is not None and self.latency_budget > self.track_time:
+            n_latency = math.ceil((self.detect_time - self.track_time) / (self.latency_budget - self.track_time))
+        self.interval = int(min(max(n_motion, n_latency, self.min_interval), self.max_interval))
+
+    def process(self, frame):
+        """Detections for frame, (boxes, scores, class_ids) like NCNNRunner.postprocess."""
+        if self.result is None:
+            return self.detect(frame)
+
+        # flow runs on every frame: it measures scene motion even when the detector is due
+        boxes, _, class_ids = self.result
+        t0 = time.perf_counter()
+        boxes, quality, self.motion = self.tracker.update(frame, boxes)
+        self.track_time = self._ema(self.track_time, time.perf_counter() - t0)
+        self._update_interval()
+        self.since_detect += 1
+
+        lost = not math.isfinite(self.motion) or (len(quality) > 0 and quality.min() < self.min_quality)
+        if lost or self.since_detect >= self.interval:
+            if lost:
+                self.forced += 1
+            return self.detect(frame, reset_tracker=False)
+
+        # tracked boxes are discounted by this frame's flow quality only, not compounded over frames
+        self.result = (boxes, self.scores * quality, class_ids)
+        self.tracked += 1
+        self.last_source = "track"
+        return self.result
+
+    def stats(self):
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "forced": self.forced,
+            "interval": self.interval,
+            "motion_px": self.motion,
+            "detect_ms": 1000 * (self.detect_time or 0.0),
+            "track_ms": 1000 * self.track_time,
+        }
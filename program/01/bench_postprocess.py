@@ -0,0 +1,74 @@
+import sys
+import time
+import numpy as np
+import cv2
+from ncnn_runner import decode_output
+
+
+def postprocess_loop(output, confidence_thres, iou_thres, dw, dh, gain):
+    # the original per-row decoder, kept here as the baseline
+    outputs = np.transpose(np.squeeze(output))
+    boxes, scores, class_ids = [], [], []
+    for i in range(outputs.shape[0]):
+        classes_scores = outputs[i][4:]
+        max_score = np.amax(classes_scores)
+        if max_score >= confidence_thres:
+            class_id = np.argmax(classes_scores)
+            x, y, w, h = outputs[i][0], outputs[i][1], outputs[i][2], outputs[i][3]
+            boxes.append([x - w / 2, y - h / 2, w, h])
+            scores.append(max_score)
+            class_ids.append(class_id)
+
+    indices = cv2.dnn.NMSBoxes(boxes, scores, confidence_thres, iou_thres)
+    boxes = np.array(boxes)
+    scores = np.array(scores)
+    class_ids = np.array(class_ids)
+    for b in boxes:
+        b[0] -= dw
+        b[1] -= dh
+    return boxes[indices] * gain, scores[indices], class_ids[indices]
+
+
+def synthetic_output(num_classes=2, anchors=8400, num_objects=20, imgsz=640, seed=0):
+    """Fake (1, 4 + C, anchors) head: low background scores plus a few clustered objects."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((1, 4 + num_classes, anchors), dtype=np.float32)
+    out[0, 0:2] = rng.uniform(0, imgsz, (2, anchors))
+    out[0, 2:4] = rng.uniform(8, imgsz / 4, (2, anchors))
+    out[0, 4:] = rng.uniform(0, 0.3, (num_classes, anchors))
+    # each object fires on a handful of neighbouring anchors
+    for k in range(num_objects):
+        idx = rng.choice(anchors, 8, replace=False)
+        cls = k % num_classes
+        center = rng.uniform(64, imgsz - 64, 2)
+        head = out[0]
+        head[0:2, idx] = (center + rng.normal(0, 2, (8, 2))).T
+        head[2:4, idx] = 60 + rng.normal(0, 2, (2, 8))
+        head[4 + cls, idx] = rng.uniform(0.6, 0.95, 8)
+    return out
+
+
+def bench(fn, args, repeat):
+    fn(*args)  # warm up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1000
+
+
+if __name__ == '__main__':
+    num_classes = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    conf, iou = 0.5, 0.45
+    output = synthetic_output(num_classes)
+    args = (output, conf, iou, 0.0, 140.0, 1.0)
+
+    r_loop = postprocess_loop(*args)
+    r_vec = decode_output(*args)
+    print(f"detections  loop: {len(r_loop[1])}  vectorized: {len(r_vec[1])}")
+
+    for name, fn in (("loop", postprocess_loop), ("vectorized", decode_output)):
+        t = bench(fn, args, repeat)
+        print(f"{name:>10}: mean {t.mean():.3f} ms  p50 {np.percentile(t, 50):.3f} ms  p95 {np.percentile(t, 95):.3f} ms")
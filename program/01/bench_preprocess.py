@@ -0,0 +1,49 @@
+import sys
+import time
+import numpy as np
+from ncnn_runner import NCNNRunner
+
+
+def preprocess_reference(runner, im):
+    # the torch path of NCNNRunner.preprocess_torch, in plain numpy
+    im2 = np.stack([runner.pre_transform(im)])
+    im2 = im2[..., ::-1].transpose((0, 3, 1, 2))
+    im2 = np.ascontiguousarray(im2).astype(np.float32)
+    im2 /= 255
+    return im2
+
+
+def bench(fn, im, repeat):
+    fn(im)  # warm up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(im)
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1000
+
+
+if __name__ == '__main__':
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "obstacle_ncnn_model"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    tolerance = 1e-6
+
+    runner = NCNNRunner(model_path)
+    rng = np.random.default_rng(0)
+    failed = False
+    for shape in ((480, 640, 3), (720, 1280, 3), (640, 640, 3), (481, 333, 3)):
+        im = rng.integers(0, 256, shape, dtype=np.uint8)
+        ref = preprocess_reference(runner, im)[0]
+        ref_geom = (runner.dw, runner.dh, runner.ratio)
+        out = np.array(runner.preprocess(im))
+        err = float(np.abs(out - ref).max())
+        same_geom = ref_geom == (runner.dw, runner.dh, runner.ratio)
+        ok = out.shape == ref.shape and err <= tolerance and same_geom
+        failed |= not ok
+        print(f"{shape}: max abs diff {err:.2e} letterbox {'ok' if same_geom else 'MISMATCH'} -> {'OK' if ok else 'FAIL'}")
+
+    im = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    for name, fn in (("reference", lambda x: preprocess_reference(runner, x)), ("ncnn", runner.preprocess)):
+        t = bench(fn, im, repeat)
+        print(f"{name:>10}: mean {t.mean():.3f} ms  p50 {np.percentile(t, 50):.3f} ms  p95 {np.percentile(t, 95):.3f} ms")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+from ncnn_runner import NCNNRunner, decode_output
+from bench_postprocess import synthetic_output
+from replay import open_source, SimulatedPCA9685, run_replay
+
+# throughput metrics regress downwards, everything else (latency, memory) upwards
+LOWER_IS_WORSE = ("fps", "sustained_fps")
+# reported only: peak RSS is the high-water mark of the whole process, not of one stage
+NOT_GATED = ("frames", "peak_rss_mb")
+# tail percentiles are noise on short runs, gate them only when both runs had this many frames
+TAIL_MIN_FRAMES = {"p95_ms": 100, "p99_ms": 500}
+
+
+def summarize(times):
+    t = np.asarray(times) * 1000
+    return {
+        "frames": int(len(t)),
+        "mean_ms": float(t.mean()),
+        "p50_ms": float(np.percentile(t, 50)),
+        "p95_ms": float(np.percentile(t, 95)),
+        "p99_ms": float(np.percentile(t, 99)),
+        "fps": float(1000 / t.mean()) if t.mean() > 0 else 0.0,
+    }
+
+
+def alloc_per_frame(fn, inputs):
+    """Peak bytes allocated while processing one frame (tracemalloc), averaged."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        for x in inputs:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(x)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks)) / 1024
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_stage(fn, inputs, warmup=3, alloc_frames=5):
+    for x in inputs[:warmup]:
+        fn(x)
+    times = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        times.append(time.perf_counter() - t0)
+    result = summarize(times)
+    result["alloc_kb_per_frame"] = alloc_per_frame(fn, inputs[:alloc_frames])
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def load_frames(spec, count):
+    source = open_source(spec)
+    frames = []
+    while len(frames) < count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+    return frames
+
+
+def bench_runner(runner, frames, conf, iou):
+    results = {}
+    results["pre_transform"] = bench_stage(runner.pre_transform, frames)
+    results["preprocess"] = bench_stage(runner.preprocess, frames)
+    inputs = [runner.preprocess(f) for f in frames]
+    results["predict"] = bench_stage(runner.predict, inputs)
+    outputs = [(f, runner.predict(x)) for f, x in zip(frames, inputs)]
+    results["postprocess"] = bench_stage(lambda fy: runner.postprocess(fy[0], fy[1], conf, iou), outputs)
+    return results
+
+
+def bench_synthetic(num_classes, count, conf, iou):
+    heads = [synthetic_output(num_classes, seed=i) for i in range(count)]
+    return bench_stage(lambda y: decode_output(y, conf, iou), heads)
+
+
+def bench_decision_loop(model_path, spec, max_frames, seed):
+    from main import RobotControl
+    from motor_control import MotorControl
+
+    source = open_source(spec, seed=seed)
+    robot = RobotControl(model_path, camera_source=source, motor_control=MotorControl(SimulatedPCA9685()), seed=seed,
+                         arm_delay=0, record=None)
+    try:
+        frames, elapsed = run_replay(robot, max_frames)
+    finally:
+        # writer, actuator and bus threads would otherwise outlive the run and skew the next benchmark
+        robot.release_resources()
+        robot.frame_bus.close()
+    return {
+        "frames": frames,
+        "sustained_fps": frames / elapsed if elapsed > 0 else 0.0,
+        "latency_avg_ms": source.stats()["latency_avg_ms"],
+        "latency_max_ms": source.stats()["latency_max_ms"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Return a list of (benchmark, metric, baseline, current, change) beyond threshold."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        frames = min(metrics.get("frames", 0), base.get("frames", 0))
+        for key, value in metrics.items():
+            old = base.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old == 0 or key in NOT_GATED:
+                continue
+            if frames < TAIL_MIN_FRAMES.get(key, 0):
+                continue
+            change = (value - old) / abs(old)
+            worse = change < -threshold if key in LOWER_IS_WORSE else change > threshold
+            if worse:
+                regressions.append((name, key, old, value, change))
+    return regressions
+
+
+if __name__ == '__main__':
+    import ratelog
+    ratelog.setup()
+    parser = argparse.ArgumentParser(description="Benchmark per-stage dan loop keputusan NCNNRunner")
+    parser.add_argument("--model", default="obstacle_ncnn_model")
+    parser.add_argument("--clip", action="append", default=[],
+                        help="file video, folder gambar atau synthetic[:N] (boleh berulang)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--num-classes", type=int, default=2)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark.json")
+    parser.add_argument("--compare", help="hasil JSON sebelumnya sebagai baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="batas regresi relatif (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    clips = args.clip or ["synthetic:%d" % args.frames]
+    runner = NCNNRunner(args.model)
+    report = {
+        "meta": {
+            "model": os.path.abspath(args.model),
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "ncnn_options": runner.options,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    report["results"]["postprocess_synthetic"] = bench_synthetic(args.num_classes, args.frames, args.conf, args.iou)
+    for clip in clips:
+        name = os.path.basename(clip.rstrip("/")) or clip
+        frames = load_frames(clip, args.frames)
+        if not frames:
+            print(f"Tidak ada frame dari {clip}, dilewati")
+            continue
+        for stage, result in bench_runner(runner, frames, args.conf, args.iou).items():
+            report["results"][f"{stage}[{name}]"] = result
+        report["results"][f"decision_loop[{name}]"] = bench_decision_loop(args.model, clip, args.frames, args.seed)
+
+    for name, r in report["results"].items():
+        if "p50_ms" in r:
+            print(f"{name:<32} p50 {r['p50_ms']:8.3f}  p95 {r['p95_ms']:8.3f}  p99 {r['p99_ms']:8.3f} ms  "
+                  f"{r['fps']:8.1f} FPS  alloc {r['alloc_kb_per_frame']:9.1f} KB/frame")
+        else:
+            print(f"{name:<32} {r['sustained_fps']:8.1f} FPS sustained  rss {r['peak_rss_mb']:.0f} MB")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan ke {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, key, old, new, change in regressions:
+            print(f"REGRESI {name} {key}: {old:.3f} -> {new:.3f} ({100 * change:+.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"Tidak ada regresi di atas {100 * args.threshold:.0f}%")
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import cv2
+
+
+class CameraSource:
+    """Camera (or video file) reader with a background grabber thread.
+
+    The grabber keeps only the newest frame, so read() never returns an
+    image that has been sitting in the driver queue. Every frame is
+    timestamped (time.monotonic) the moment it is grabbed.
+    """
+
+    def __init__(self, source=0, backend=None, fourcc="MJPG", width=None, height=None, fps=None,
+                 buffer_size=1, realtime=None):
+        self.source = source
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        if backend is None:
+            backend = cv2.CAP_ANY if self.is_file else cv2.CAP_V4L2
+        self.backend = backend
+        self.fourcc = fourcc
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.buffer_size = buffer_size
+        # files are paced at their own FPS by default, like a live camera
+        self.realtime = self.is_file if realtime is None else realtime
+
+        self.cap = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._frame_time = 0.0
+        self._delivered_id = 0
+        self._eof = False
+
+        self.last_frame_id = 0
+        self.last_frame_time = 0.0
+        self.grabbed = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        self.cap = cv2.VideoCapture(self.source, self.backend)
+        if not self.cap.isOpened():
+            print(f"Tidak dapat membuka sumber video: {self.source}")
+            return self
+        if not self.is_file:
+            if self.fourcc:
+                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+            if self.width:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            if self.height:
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            if self.fps:
+                self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+            if self.buffer_size:
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        if not self.fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._grab_loop, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def _grab_loop(self):
+        period = 1.0 / self.fps if self.realtime else 0.0
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            ok, frame = self.cap.read()
+            t = time.monotonic()
+            with self._cond:
+                if not ok:
+                    self._eof = True
+                    self._cond.notify_all()
+                    return
+                self.grabbed += 1
+                if self._frame_id > self._delivered_id:
+                    self.dropped += 1  # previous frame was never read
+                self._frame = frame
+                self._frame_id += 1
+                self._frame_time = t
+                self._cond.notify_all()
+            if period:
+                next_time += period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.monotonic()
+
+    @property
+    def ended(self):
+        """End of stream reached and the last frame already returned."""
+        with self._cond:
+            return self._eof and self._frame_id == self._delivered_id
+
+    def read(self, timeout=1.0):
+        """Wait for a frame newer than the last one returned, like VideoCapture.read."""
+        frame = self.read_frame(timeout)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def read_frame(self, timeout=1.0):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frame_id > self._delivered_id or self._eof, timeout):
+                return None
+            if self._frame_id == self._delivered_id:
+                return None  # end of stream
+            self._delivered_id = self._frame_id
+            self.delivered += 1
+            self.last_frame_id = self._frame_id
+            self.last_frame_time = self._frame_time
+            return self._frame
+
+    def mark_decision(self, frame_time=None):
+        """Record capture-to-decision latency for the frame just acted on."""
+        if frame_time is None:
+            frame_time = self.last_frame_time
+        latency = time.monotonic() - frame_time
+        self.latency_count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        return latency
+
+    def stats(self):
+        return {
+            "grabbed": self.grabbed,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "latency_avg_ms": 1000 * self.latency_sum / self.latency_count if self.latency_count else 0.0,
+            "latency_max_ms": 1000 * self.latency_max,
+        }
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+
+
+if __name__ == '__main__':
+    import sys
+    source = sys.argv[1] if len(sys.argv) > 1 else 0
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cam = CameraSource(source).start()
+    if not cam.isOpened():
+        sys.exit(1)
+    try:
+        while True:
+            ret, frame = cam.read()
+            if not ret:
+                break
+            time.sleep(0.05)  # pretend to run inference
+            cam.mark_decision()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cam.release()
+    print(cam.stats())
@@ -0,0 +1,207 @@
+import glob
+import os
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+import cv2
+
+
+def dhash(frame, size=8):
+    """64-bit difference hash of a BGR frame, near-identical frames differ in few bits."""
+    gray = cv2.cvtColor(cv2.resize(frame, (size + 1, size), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def yolo_labels(result, width, height):
+    """(boxes ltwh, scores, class_ids) -> YOLO label lines (class cx cy w h, normalized)."""
+    lines = []
+    boxes, scores, class_ids = result
+    for (x, y, w, h), c in zip(boxes, class_ids):
+        x0, y0 = max(float(x), 0.0), max(float(y), 0.0)
+        x1, y1 = min(float(x + w), width), min(float(y + h), height)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        lines.append(f"{int(c)} {(x0 + x1) / 2 / width:.6f} {(y0 + y1) / 2 / height:.6f} "
+                     f"{(x1 - x0) / width:.6f} {(y1 - y0) / height:.6f}")
+    return lines
+
+
+class CaptureWriter:
+    """Saves uncertain frames with pseudo-labels as a YOLO dataset (images/ + labels/).
+
+    offer() runs on the control loop: it only checks the score band and
+    enqueues, a full queue drops the frame. Workers do the duplicate check
+    (dHash against recently saved frames), JPEG encoding, writing, and keep
+    the directory under max_bytes by deleting the oldest samples.
+    Offered frames must not be modified afterwards.
+    """
+
+    def __init__(self, output_dir, save_threshold=0.6, confidence_thres=0.8, num_workers=2, queue_size=8,
+                 max_bytes=2 * 1024 ** 3, min_interval=0.2, dup_distance=6, dup_history=64, jpeg_quality=95):
+        self.output_dir = output_dir
+        self.image_dir = os.path.join(output_dir, "images")
+        self.label_dir = os.path.join(output_dir, "labels")
+        os.makedirs(self.image_dir, exist_ok=True)
+        os.makedirs(self.label_dir, exist_ok=True)
+        self.save_threshold = save_threshold
+        self.confidence_thres = confidence_thres
+        self.max_bytes = max_bytes
+        self.min_interval = min_interval  # seconds between accepted offers
+        self.dup_distance = dup_distance  # max differing dHash bits for a near-duplicate
+        self.jpeg_quality = jpeg_quality
+
+        self.offered = 0
+        self.queued = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self.saved = 0
+        self.deleted = 0
+        self.errors = 0
+        self._last_offer = 0.0
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=dup_history)
+        self._files = deque()  # (image, label, bytes), oldest first
+        self.disk_bytes = 0
+        self._scan()
+
+        self._queue = queue.Queue(queue_size)
+        self._workers = [threading.Thread(target=self._run, name=f"capture-{i}", daemon=True) for i in range(num_workers)]
+        for w in self._workers:
+            w.start()
+
+    def _scan(self):
+        """Pick up samples from earlier runs so the disk cap covers them too."""
+        images = sorted(glob.glob(os.path.join(self.image_dir, "*.jpg")), key=os.path.getmtime)
+        for image in images:
+            label = os.path.join(self.label_dir, os.path.splitext(os.path.basename(image))[0] + ".txt")
+            size = os.path.getsize(image) + (os.path.getsize(label) if os.path.exists(label) else 0)
+            self._files.append((image, label, size))
+            self.disk_bytes += size
+
+    def wants(self, result):
+        """True if the best score lies in [save_threshold, confidence_thres)."""
+        scores = result[1]
+        if len(scores) == 0:
+            return False
+        best = float(np.max(scores))
+        return self.save_threshold <= best < self.confidence_thres
+
+    def offer(self, frame, result, frame_id=None):
+        """Queue frame for saving if it is a hard example, never blocks."""
+        self.offered += 1
+        if not self.wants(result):
+            return False
+        now = time.monotonic()
+        if now - self._last_offer < self.min_interval:
+            return False
+        try:
+            self._queue.put_nowait((frame, result, frame_id, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._last_offer = now
+        self.queued += 1
+        return True
+
+    def _is_duplicate(self, h):
+        with self._lock:
+            for other in self._recent:
+                if bin(h ^ other).count("1") <= self.dup_distance:
+                    return True
+            self._recent.append(h)
+            return False
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._save(*job)
+            except Exception as e:
+                self.errors += 1
+                print(f"Gagal menyimpan contoh: {e!r}")
+            finally:
+                self._queue.task_done()
+
+    def _save(self, frame, result, frame_id, wall_time):
+        if self._is_duplicate(dhash(frame)):
+            with self._lock:
+                self.duplicates += 1
+            return
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError("imencode gagal")
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(wall_time)) + f"_{int(wall_time * 1000) % 1000:03d}"
+        name = f"{stamp}_{frame_id}" if frame_id is not None else stamp
+        image = os.path.join(self.image_dir, name + ".jpg")
+        label = os.path.join(self.label_dir, name + ".txt")
+        h, w = frame.shape[:2]
+        text = "\n".join(yolo_labels(result, w, h)) + "\n"
+        with open(label, "w") as f:
+            f.write(text)
+        with open(image, "wb") as f:
+            f.write(buf)
+        size = len(buf) + len(text)
+        with self._lock:
+            self._files.append((image, label, size))
+            self.disk_bytes += size
+            self.saved += 1
+            old = []
+            while self.disk_bytes > self.max_bytes and len(self._files) > 1:
+                old.append(self._files.popleft())
+                self.disk_bytes -= old[-1][2]
+                self.deleted += 1
+        for paths in old:
+            for path in paths[:2]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def close(self, timeout=5.0):
+        """Finish queued frames and stop the workers, giving up on what is left after timeout."""
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            try:
+                self._queue.put(None, timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Full:
+                # workers stuck (slow card) or gone: drop the waiting frames to make room for the stop
+                self._drop_queued()
+                try:
+                    self._queue.put_nowait(None)
+                except queue.Full:
+                    pass  # daemon workers, they do not keep the process alive
+        for w in self._workers:
+            w.join(timeout=max(deadline - time.monotonic(), 0.0))
+
+    def _drop_queued(self):
+        stops = 0
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if job is None:
+                stops += 1
+            else:
+                self.dropped += 1
+        for _ in range(stops):
+            self._queue.put_nowait(None)
+
+    def stats(self):
+        return {
+            "offered": self.offered,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "duplicates": self.duplicates,
+            "saved": self.saved,
+            "deleted": self.deleted,
+            "errors": self.errors,
+            "disk_mb": self.disk_bytes / 1024 ** 2,
+        }
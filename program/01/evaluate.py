@@ -0,0 +1,218 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import cv2
+import yaml
+from profiler import LatencyHistogram
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+SCORE_BINS = 1000  # score resolution of the streamed PR curves
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def find_samples(root):
+    """(image, label) pairs of a YOLO dataset: root/images + root/labels, or files side by side."""
+    image_dir = os.path.join(root, "images") if os.path.isdir(os.path.join(root, "images")) else root
+    samples = []
+    for path in sorted(glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)):
+        if not path.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        stem = os.path.splitext(path)[0]
+        label = stem + ".txt"
+        if image_dir != root:
+            label = os.path.join(root, "labels", os.path.relpath(stem, image_dir) + ".txt")
+        samples.append((path, label))
+    return samples
+
+
+def load_labels(path, width, height):
+    """YOLO txt (class cx cy w h, normalized) -> class ids, xyxy pixel boxes."""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32)
+    data = np.loadtxt(path, ndmin=2, dtype=np.float32)
+    if data.size == 0:
+        return np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32)
+    cls = data[:, 0].astype(np.int32)
+    cx, cy, w, h = data[:, 1] * width, data[:, 2] * height, data[:, 3] * width, data[:, 4] * height
+    return cls, np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def box_iou(a, b):
+    """IoU matrix between (n, 4) and (m, 4) xyxy boxes."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match(det_boxes, det_scores, det_cls, gt_boxes, gt_cls):
+    """Greedy score-ordered matching, returns (n_det, len(IOU_THRESHOLDS)) true-positive flags."""
+    tp = np.zeros((len(det_scores), len(IOU_THRESHOLDS)), dtype=bool)
+    if len(det_scores) == 0 or len(gt_cls) == 0:
+        return tp
+    iou = box_iou(det_boxes, gt_boxes)
+    iou[det_cls[:, None] != gt_cls[None, :]] = 0
+    order = np.argsort(-det_scores, kind="stable")
+    for k, t in enumerate(IOU_THRESHOLDS):
+        taken = np.zeros(len(gt_cls), dtype=bool)
+        for i in order:
+            candidates = np.where(taken, 0, iou[i])
+            j = int(np.argmax(candidates))
+            if candidates[j] >= t:
+                taken[j] = True
+                tp[i, k] = True
+    return tp
+
+
+_runner = None
+
+
+def _init_worker(model_path, num_threads):
+    global _runner
+    from ncnn_runner import NCNNRunner
+    _runner = NCNNRunner(model_path)
+    _runner.net.opt.num_threads = num_threads
+
+
+def _evaluate_image(task):
+    image_path, label_path, conf, iou_thres = task
+    im = cv2.imread(image_path)
+    if im is None:
+        return None
+    t0 = time.perf_counter()
+    mat_in = _runner.preprocess(im)
+    t1 = time.perf_counter()
+    y = _runner.predict(mat_in)
+    t2 = time.perf_counter()
+    boxes, scores, class_ids = _runner.postprocess(im, y, conf, iou_thres)
+    t3 = time.perf_counter()
+
+    xyxy = boxes.copy()
+    xyxy[:, 2:] += xyxy[:, :2]
+    gt_cls, gt_boxes = load_labels(label_path, im.shape[1], im.shape[0])
+    tp = match(xyxy, scores, class_ids, gt_boxes, gt_cls)
+    return class_ids, scores, tp, gt_cls, (t1 - t0, t2 - t1, t3 - t2)
+
+
+class Accumulator:
+    """Per-class TP/FP counts binned by score, so memory does not grow with the dataset."""
+
+    def __init__(self, num_classes):
+        self.tp = np.zeros((num_classes, SCORE_BINS, len(IOU_THRESHOLDS)), dtype=np.int64)
+        self.fp = np.zeros_like(self.tp)
+        self.n_gt = np.zeros(num_classes, dtype=np.int64)
+        self.latency = {"preprocess": LatencyHistogram(), "predict": LatencyHistogram(), "postprocess": LatencyHistogram()}
+        self.images = 0
+
+    def add(self, result):
+        class_ids, scores, tp, gt_cls, timings = result
+        self.images += 1
+        bins = np.minimum((scores * SCORE_BINS).astype(np.int64), SCORE_BINS - 1)
+        np.add.at(self.tp, (class_ids, bins), tp.astype(np.int64))
+        np.add.at(self.fp, (class_ids, bins), (~tp).astype(np.int64))
+        self.n_gt += np.bincount(gt_cls, minlength=len(self.n_gt))[:len(self.n_gt)]
+        for name, t in zip(("preprocess", "predict", "postprocess"), timings):
+            self.latency[name].add(t)
+
+    def class_metrics(self, c, report_conf):
+        # cumulate from the highest score bin downwards
+        tp = np.cumsum(self.tp[c, ::-1], axis=0)
+        fp = np.cumsum(self.fp[c, ::-1], axis=0)
+        n_gt = self.n_gt[c]
+        recall = tp / max(n_gt, 1)
+        precision = tp / np.maximum(tp + fp, 1)
+        aps = [average_precision(recall[:, k], precision[:, k]) if n_gt else 0.0 for k in range(len(IOU_THRESHOLDS))]
+        # precision / recall at IoU 0.5 for detections scoring >= report_conf
+        idx = SCORE_BINS - 1 - min(int(report_conf * SCORE_BINS), SCORE_BINS - 1)
+        return {
+            "instances": int(n_gt),
+            "precision": float(precision[idx, 0]),
+            "recall": float(recall[idx, 0]),
+            "mAP50": float(aps[0]),
+            "mAP50-95": float(np.mean(aps)),
+        }
+
+
+def evaluate(model_path, samples, num_classes, conf=0.01, iou_thres=0.6, workers=1, threads=1, progress=None):
+    """Run the model over (image, label) samples into an Accumulator, on a process pool when workers > 1."""
+    acc = Accumulator(num_classes)
+    tasks = ((img, lbl, conf, iou_thres) for img, lbl in samples)
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_worker, (model_path, threads))
+        results = pool.imap_unordered(_evaluate_image, tasks, chunksize=4)
+    else:
+        pool = None
+        _init_worker(model_path, threads)
+        results = map(_evaluate_image, tasks)
+    try:
+        for i, result in enumerate(results, 1):
+            if result is not None:
+                acc.add(result)
+            if progress is not None:
+                progress(i)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return acc
+
+
+def average_precision(recall, precision):
+    """COCO-style 101-point interpolated AP."""
+    p = np.flip(np.maximum.accumulate(np.flip(precision)))
+    idx = np.searchsorted(recall, np.linspace(0, 1, 101), side="left")
+    # recall levels never reached count as zero precision
+    return float(np.mean(np.where(idx < len(p), p[np.minimum(idx, len(p) - 1)], 0.0)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluasi model ncnn pada dataset berformat YOLO")
+    parser.add_argument("dataset", help="folder dataset (images/ + labels/)")
+    parser.add_argument("--model", default="obstacle_ncnn_model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--threads", type=int, default=1, help="ncnn num_threads per worker")
+    parser.add_argument("--conf", type=float, default=0.01, help="ambang confidence untuk mAP")
+    parser.add_argument("--iou", type=float, default=0.6, help="ambang IoU NMS")
+    parser.add_argument("--report-conf", type=float, default=0.5, help="confidence untuk precision/recall")
+    parser.add_argument("--out", help="simpan hasil ke JSON")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.model, "metadata.yaml")) as f:
+        names = yaml.safe_load(f)["names"]
+    samples = find_samples(args.dataset)
+    if not samples:
+        print(f"Tidak ada gambar di {args.dataset}")
+        sys.exit(1)
+
+    def progress(i):
+        if i % 100 == 0:
+            print(f"{i}/{len(samples)} gambar")
+
+    start = time.perf_counter()
+    acc = evaluate(args.model, samples, len(names), args.conf, args.iou, args.workers, args.threads, progress)
+    elapsed = time.perf_counter() - start
+
+    report = {"images": acc.images, "images_per_s": acc.images / elapsed, "classes": {},
+              "latency": {k: h.summary() for k, h in acc.latency.items()}}
+    print(f"{'class':<12}{'inst':>7}{'P':>8}{'R':>8}{'mAP50':>8}{'mAP50-95':>10}")
+    for c in range(len(names)):
+        m = acc.class_metrics(c, args.report_conf)
+        report["classes"][names[c]] = m
+        print(f"{names[c]:<12}{m['instances']:>7}{m['precision']:>8.3f}{m['recall']:>8.3f}{m['mAP50']:>8.3f}{m['mAP50-95']:>10.3f}")
+    with_gt = [m for m in report["classes"].values() if m["instances"]]
+    report["mAP50"] = float(np.mean([m["mAP50"] for m in with_gt])) if with_gt else 0.0
+    report["mAP50-95"] = float(np.mean([m["mAP50-95"] for m in with_gt])) if with_gt else 0.0
+    print(f"{'all':<12}{'':>23}{report['mAP50']:>8.3f}{report['mAP50-95']:>10.3f}")
+    for name, s in report["latency"].items():
+        print(f"{name:<12} mean {s['mean_ms']:.2f} ms  p50 {s['p50_ms']:.2f}  p95 {s['p95_ms']:.2f}  p99 {s['p99_ms']:.2f}")
+    print(f"{acc.images} gambar dalam {elapsed:.1f} s ({report['images_per_s']:.1f} gambar/s)")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
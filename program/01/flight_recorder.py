@@ -0,0 +1,221 @@
+import csv
+import os
+import struct
+import sys
+import threading
+import time
+import numpy as np
+
+MAGIC = b"PLRVREC1"
+HEADER = struct.Struct("<8sIIQQ")  # magic, version, record size, capacity, records written
+HEADER_SIZE = 64
+VERSION = 1
+MAX_DETECTIONS = 8
+
+KIND_SESSION = 1  # stamps[0] = wall clock time at start, maps monotonic t to real time
+KIND_FRAME = 2
+KIND_PWM = 3
+
+# recordings of the vehicle go here, not into whatever directory it was started from
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+DEFAULT_PATH = os.path.join(LOG_DIR, "flight.rec")
+
+# stamps of a frame record, seconds on time.monotonic
+STAGES = ("capture", "preprocess", "infer", "decide")
+
+RECORD_DTYPE = np.dtype([
+    ("kind", np.uint8),
+    ("n_det", np.uint8),
+    ("channel", np.uint8),
+    ("duty_cycle", np.uint16),
+    ("frame_id", np.uint64),
+    ("t", np.float64),
+    ("stamps", np.float64, (len(STAGES),)),
+    ("det_box", np.float32, (MAX_DETECTIONS, 4)),
+    ("det_score", np.float32, (MAX_DETECTIONS,)),
+    ("det_class", np.int16, (MAX_DETECTIONS,)),
+], align=True)
+
+
+class FlightRecorder:
+    """Fixed-size binary records in a memory-mapped ring file.
+
+    Frame records hold the frame id, the camera (stream index, in the
+    channel field), per-stage timestamps and up to MAX_DETECTIONS
+    detections (highest scores first); PWM records hold one channel
+    write. Writing a record is a few field stores into the mapping, the
+    kernel takes care of getting it to disk, also when the process dies.
+    An existing file with the same layout is appended to.
+    """
+
+    def __init__(self, path, capacity=100000):
+        self.path = path
+        self._lock = threading.Lock()
+        self.frame_id = 0  # frame the control loop is working on, PWM records are tagged with it
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        count = 0
+        if os.path.exists(path) and os.path.getsize(path) == HEADER_SIZE + capacity * RECORD_DTYPE.itemsize:
+            with open(path, "rb") as f:
+                magic, version, size, cap, count = HEADER.unpack(f.read(HEADER.size))
+            if (magic, version, size, cap) != (MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity):
+                count = 0
+        if count == 0:
+            with open(path, "wb") as f:
+                f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self.capacity = capacity
+        self.count = count
+        self._empty = np.zeros(1, dtype=RECORD_DTYPE)
+        self._header = np.memmap(path, dtype=np.uint8, mode="r+", shape=(HEADER_SIZE,))
+        self._records = np.memmap(path, dtype=RECORD_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(capacity,))
+        self._write_header()
+        rec = self._next()
+        rec["kind"] = KIND_SESSION
+        rec["t"] = time.monotonic()
+        rec["stamps"][0, 0] = time.time()
+        self._commit()
+
+    def _write_header(self):
+        self._header[:HEADER.size] = np.frombuffer(
+            HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, self.capacity, self.count), dtype=np.uint8)
+
+    def _next(self):
+        # one-element slice: a view into the mapping, field assignment writes through
+        i = self.count % self.capacity
+        rec = self._records[i:i + 1]
+        rec[...] = self._empty
+        return rec
+
+    def _commit(self):
+        # the count goes in last, a reader never sees a half-written newest record as valid
+        self.count += 1
+        self._header[HEADER.size - 8:HEADER.size] = np.frombuffer(struct.pack("<Q", self.count), dtype=np.uint8)
+
+    def frame(self, frame_id, stamps, result, stream=0):
+        """stamps: monotonic time per STAGES entry (nan if the stage did not run)."""
+        boxes, scores, class_ids = result
+        order = np.argsort(-scores)[:MAX_DETECTIONS]
+        n = len(order)
+        with self._lock:
+            rec = self._next()
+            rec["kind"] = KIND_FRAME
+            rec["frame_id"] = frame_id
+            rec["channel"] = stream
+            rec["t"] = time.monotonic()
+            rec["stamps"] = stamps
+            rec["n_det"] = n
+            if n:
+                rec["det_box"][0, :n] = boxes[order]
+                rec["det_score"][0, :n] = scores[order]
+                rec["det_class"][0, :n] = class_ids[order]
+            self._commit()
+
+    def pwm(self, changed):
+        """One record per channel of a committed {channel: duty_cycle} write."""
+        t = time.monotonic()
+        with self._lock:
+            for ch, v in changed.items():
+                rec = self._next()
+                rec["kind"] = KIND_PWM
+                rec["frame_id"] = self.frame_id
+                rec["t"] = t
+                rec["channel"] = ch
+                rec["duty_cycle"] = v
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._records.flush()
+            self._header.flush()
+
+    def close(self):
+        self.flush()
+
+
+def read_records(path):
+    """All records still in the ring, oldest first."""
+    with open(path, "rb") as f:
+        magic, version, size, capacity, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a flight recorder file of version {VERSION}")
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(capacity,))
+    if count <= capacity:
+        return np.array(records[:count])
+    start = count % capacity
+    return np.concatenate([records[start:], records[:start]])
+
+
+def to_columns(records):
+    """Split records into column tables: {"sessions": {...}, "frames": {...}, "detections": {...}, "pwm": {...}}."""
+    sessions = records[records["kind"] == KIND_SESSION]
+    frames = records[records["kind"] == KIND_FRAME]
+    pwm = records[records["kind"] == KIND_PWM]
+    tables = {
+        "sessions": {"t": sessions["t"], "wall_time": sessions["stamps"][:, 0]},
+        "frames": {"frame_id": frames["frame_id"], "stream": frames["channel"], "t": frames["t"], "n_det": frames["n_det"]},
+        "pwm": {"frame_id": pwm["frame_id"], "t": pwm["t"], "channel": pwm["channel"], "duty_cycle": pwm["duty_cycle"]},
+    }
+    for i, stage in enumerate(STAGES):
+        tables["frames"][f"t_{stage}"] = frames["stamps"][:, i]
+    # one row per detection
+    mask = np.arange(MAX_DETECTIONS)[None, :] < frames["n_det"][:, None]
+    boxes = frames["det_box"][mask]
+    tables["detections"] = {
+        "frame_id": np.repeat(frames["frame_id"], frames["n_det"]),
+        "class_id": frames["det_class"][mask],
+        "score": frames["det_score"][mask],
+        "x": boxes[:, 0], "y": boxes[:, 1], "w": boxes[:, 2], "h": boxes[:, 3],
+    }
+    return tables
+
+
+def save_csv(tables, prefix):
+    paths = []
+    for name, cols in tables.items():
+        path = f"{prefix}_{name}.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(cols.keys())
+            writer.writerows(zip(*(c.tolist() for c in cols.values())))
+        paths.append(path)
+    return paths
+
+
+def save_columnar(tables, prefix):
+    """Parquet per table if pyarrow is installed, otherwise one .npz with table/column keys."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        path = prefix + ".npz"
+        np.savez(path, **{f"{name}/{col}": v for name, cols in tables.items() for col, v in cols.items()})
+        return [path]
+    paths = []
+    for name, cols in tables.items():
+        path = f"{prefix}_{name}.parquet"
+        pq.write_table(pa.table(cols), path)
+        paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Ekspor isi flight recorder")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH, help=f"file rekaman (default {DEFAULT_PATH})")
+    parser.add_argument("--out", default=None, help="prefix file keluaran (default: nama file rekaman)")
+    parser.add_argument("--format", choices=("csv", "columnar", "both"), default="csv")
+    args = parser.parse_args()
+
+    try:
+        records = read_records(args.path)
+    except (OSError, ValueError) as e:
+        print(f"Gagal membaca rekaman: {e}")
+        sys.exit(1)
+    tables = to_columns(records)
+    prefix = args.out or os.path.splitext(args.path)[0]
+    written = []
+    if args.format in ("csv", "both"):
+        written += save_csv(tables, prefix)
+    if args.format in ("columnar", "both"):
+        written += save_columnar(tables, prefix)
+    print(f"{len(records)} record ({len(tables['frames']['t'])} frame, {len(tables['pwm']['t'])} PWM) -> "
+          + ", ".join(written))
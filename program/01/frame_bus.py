@@ -0,0 +1,122 @@
+import threading
+import time
+import cv2
+
+
+def draw_detections(img, result, class_names, scale=1.0):
+    """Draw (boxes, scores, class_ids) on img in place, boxes scaled by `scale` first."""
+    boxes, scores, class_ids = result
+    for box, score, class_id in zip(boxes, scores, class_ids):
+        x, y, w, h = (float(v) * scale for v in box)
+        cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), (0, 255, 0), 2)
+        cv2.putText(img, f"{class_names[int(class_id)]} {score:.2f}", (int(x), max(int(y) - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (36, 255, 12), 1)
+    return img
+
+
+def fit_size(frame_shape, max_size):
+    """Largest (w, h) with the frame's aspect ratio that fits in max_size, never upscaled."""
+    h, w = frame_shape[:2]
+    r = min(max_size[0] / w, max_size[1] / h, 1.0)
+    return max(int(w * r), 1), max(int(h * r), 1)
+
+
+class FrameBus:
+    """Latest-item hand-off from the detection loop to any number of viewers.
+
+    publish() only stores a reference and never blocks, a slow viewer just
+    skips items. Published items must not be modified afterwards.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self._closed = False
+
+    def publish(self, item):
+        with self._cond:
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        """(seq, item) of the newest publish, (0, None) before the first one."""
+        with self._cond:
+            return self._seq, self._item
+
+    def wait(self, after_seq, timeout=None):
+        """Block until something newer than after_seq is published; (after_seq, None) on timeout or close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq or self._closed, timeout):
+                return after_seq, None
+            if self._seq <= after_seq:
+                return after_seq, None
+            return self._seq, self._item
+
+    def subscribe(self, transform=None, max_fps=None):
+        return FrameSubscriber(self, transform, max_fps)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class FrameSubscriber:
+    """Applies transform to bus items on its own thread, at most max_fps times a second.
+
+    The consumer polls latest() for the newest transformed result, so the
+    expensive part (annotation, resize, colour conversion) stays off the
+    consumer's thread and runs at the display rate, not the control rate.
+    """
+
+    def __init__(self, bus, transform=None, max_fps=None):
+        self.bus = bus
+        self.transform = transform
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.processed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._result = (0, None)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-subscriber", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        seq = 0
+        next_time = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now < next_time:
+                self._stop.wait(next_time - now)
+                continue
+            new_seq, item = self.bus.wait(seq, timeout=0.1)
+            if item is None:
+                if self.bus.closed:
+                    return
+                continue
+            self.skipped += new_seq - seq - 1
+            seq = new_seq
+            next_time = time.monotonic() + self.min_interval
+            try:
+                out = self.transform(item) if self.transform is not None else item
+            except Exception as e:
+                print(f"Gagal menyiapkan frame tampilan: {e!r}")
+                continue
+            with self._lock:
+                self._result = (seq, out)
+            self.processed += 1
+
+    def latest(self):
+        """(seq, transformed item), seq changes only when there is a new result."""
+        with self._lock:
+            return self._result
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
@@ -1,66 +1,105 @@
+import threading
 import tkinter as tk
-from tkinter import Label, Button
+from tkinter import Label, Button, Frame
 import cv2
 from PIL import Image, ImageTk
 from main import RobotControl  # Import RobotControl class dari main.py
+from frame_bus import draw_detections, fit_size
+import ratelog
 
 class RobotControlApp:
-    def __init__(self, root):
+    def __init__(self, root, display_size=(640, 480)):
         self.root = root
         self.root.title("Robot Control and Object Detection")
         self.root.geometry("800x600")
 
-        # Inisialisasi RobotControl
-        self.robot_control = RobotControl()
+        # Inisialisasi RobotControl; kontrol otonom mati, motor hanya digerakkan tombol manual
+        self.robot_control = RobotControl(autonomous=False)
 
+        # tombol di bawah, area video mengisi sisa jendela
+        self.buttons = Frame(self.root)
+        self.buttons.pack(side="bottom")
+        self.video = Frame(self.root, width=display_size[0], height=display_size[1])
+        self.video.pack_propagate(False)
+        self.video.pack(side="top", fill="both", expand=True)
         # Label untuk menampilkan feed kamera
-        self.image_label = Label(self.root)
-        self.image_label.pack()
+        self.image_label = Label(self.video)
+        self.image_label.pack(fill="both", expand=True)
+        # ukuran tampilan mengikuti ukuran widget video, dibaca oleh thread subscriber
+        self.display_size = display_size
+        self.video.bind("<Configure>", self.on_resize)
+        self.photo = None
+        self.shown_seq = 0
+
+        # satu pipeline kamera+deteksi di thread terpisah, GUI hanya berlangganan frame_bus;
+        # anotasi, resize dan konversi warna dikerjakan di thread subscriber, maksimal 15 FPS
+        self.subscriber = self.robot_control.frame_bus.subscribe(self.prepare_image, max_fps=15)
+        self.control_thread = threading.Thread(target=self.robot_control.run, kwargs={"headless": True}, daemon=True)
+        self.control_thread.start()
 
         # Tombol untuk kontrol manual motor
-        self.move_forward_btn = Button(self.root, text="Move Forward", command=self.robot_control.move_forward)
-        self.move_forward_btn.pack()
+        self.move_forward_btn = Button(self.buttons, text="Move Forward", command=self.robot_control.move_forward)
+        self.move_forward_btn.pack(side="left")
 
-        self.move_backward_btn = Button(self.root, text="Move Backward", command=self.robot_control.move_backward)
-        self.move_backward_btn.pack()
+        self.move_backward_btn = Button(self.buttons, text="Move Backward", command=self.robot_control.move_backward)
+        self.move_backward_btn.pack(side="left")
 
-        self.move_left_btn = Button(self.root, text="Move Left", command=self.robot_control.move_left)
-        self.move_left_btn.pack()
+        self.move_left_btn = Button(self.buttons, text="Move Left", command=self.robot_control.move_left)
+        self.move_left_btn.pack(side="left")
 
-        self.move_right_btn = Button(self.root, text="Move Right", command=self.robot_control.move_right)
-        self.move_right_btn.pack()
+        self.move_right_btn = Button(self.buttons, text="Move Right", command=self.robot_control.move_right)
+        self.move_right_btn.pack(side="left")
 
-        self.move_up_btn = Button(self.root, text="Move Up", command=self.robot_control.move_up)
-        self.move_up_btn.pack()
+        self.move_up_btn = Button(self.buttons, text="Move Up", command=self.robot_control.move_up)
+        self.move_up_btn.pack(side="left")
 
-        self.move_down_btn = Button(self.root, text="Move Down", command=self.robot_control.move_down)
-        self.move_down_btn.pack()
+        self.move_down_btn = Button(self.buttons, text="Move Down", command=self.robot_control.move_down)
+        self.move_down_btn.pack(side="left")
 
-        self.stop_btn = Button(self.root, text="Stop", command=self.robot_control.stop_all_motors)
-        self.stop_btn.pack()
+        self.stop_btn = Button(self.buttons, text="Stop", command=self.robot_control.stop_all_motors)
+        self.stop_btn.pack(side="left")
 
         # Memperbarui frame setiap 30ms
         self.update_frame()
 
-    def update_frame(self):
-        frame = self.robot_control.get_frame()
-        if frame is not None:
-            # Mengonversi frame menjadi gambar yang dapat ditampilkan di Tkinter
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame)
-            img = ImageTk.PhotoImage(img)
+    def on_resize(self, event):
+        if event.width > 1 and event.height > 1:
+            self.display_size = (event.width, event.height)
+
+    def prepare_image(self, item):
+        # dijalankan di thread subscriber, bukan di thread Tk
+        frame = item["frame"]
+        size = fit_size(frame.shape, self.display_size)
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        draw_detections(small, item["result"], self.robot_control.detector.class_names, size[0] / frame.shape[1])
+        return Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
 
-            # Menampilkan gambar pada label
-            self.image_label.config(image=img)
-            self.image_label.image = img
+    def update_frame(self):
+        seq, img = self.subscriber.latest()
+        if seq != self.shown_seq:
+            self.shown_seq = seq
+            if self.photo is not None and (self.photo.width(), self.photo.height()) == img.size:
+                self.photo.paste(img)
+            else:
+                self.photo = ImageTk.PhotoImage(img)
+                self.image_label.config(image=self.photo)
+                self.image_label.image = self.photo
 
         # Memanggil kembali update_frame setiap 30ms
         self.root.after(30, self.update_frame)
 
     def close(self):
-        self.robot_control.release_resources()
+        self.subscriber.close()
+        if self.control_thread.is_alive():
+            # run() menghentikan motor dan melepas kamera sendiri
+            self.robot_control.stop()
+            self.control_thread.join(timeout=5.0)
+        else:
+            self.robot_control.release_resources()
         self.root.quit()
 
+ratelog.setup()
+
 # Membuat root window untuk Tkinter
 root = tk.Tk()
 
@@ -1,119 +1,330 @@
+import time
+START_TIME = time.monotonic()  # before the heavy imports, the startup breakdown starts here
+from concurrent.futures import ThreadPoolExecutor
 from motor_control import MotorControl
-from ncnn_runner import NCNNRunner
+from ncnn_runner import NCNNRunner, filter_scores
+from camera_source import CameraSource
+from pipeline import Pipeline, DROP_OLDEST
+from adaptive_inference import AdaptiveDetector
+from tracker import MultiObjectTracker, DecisionFilter, class_index
+from roi_inference import RoiDetector
+from model_set import ModelSet
+from startup import StartupTimer
+from frame_bus import FrameBus, draw_detections
+from capture_writer import CaptureWriter
+from flight_recorder import FlightRecorder, DEFAULT_PATH as DEFAULT_RECORD
+import ratelog
+from ratelog import RateLimitedLogger
+from profiler import PROFILER, profiled
+from control_scheduler import ControlScheduler, dodge, slow_through_gate
+from multi_camera import CameraStream, MultiCamera, merge_decisions, parse_stream_spec
+import threading
 import cv2
-import os
-import time
 import random
+import signal
 
 class RobotControl:
-    def __init__(self, model_path="obstacle_ncnn_model", confidence_thres=0.8, iou_thres=0.45, save_threshold=0.6):
+    def __init__(self, model_path="obstacle_ncnn_model", confidence_thres=0.8, iou_thres=0.45, save_threshold=0.6, camera_source=0,
+                 motor_control=None, seed=None, adaptive=False, roi=False, target_latency=0.1, arm_delay=3.0,
+                 capture=False, record=DEFAULT_RECORD, control_rate=50.0, dodge_time=2.0, gate_time=1.0, precision="fp32",
+                 autonomous=True):
         self.model_path = model_path
+        # autonomous=False: detection only, the thrusters are left to manual commands (Tk interface)
+        self.autonomous = autonomous
+        self.precision = precision  # "int8": quantized export, see quantize.py
         self.confidence_thres = confidence_thres
         self.iou_thres = iou_thres
         self.save_threshold = save_threshold
-
-        self.cap = cv2.VideoCapture(0)
+        # detect down to save_threshold so hard examples are visible, decide() filters back to confidence_thres
+        self.detect_thres = min(save_threshold, confidence_thres)
+        self.startup = StartupTimer(START_TIME)
+        self.startup.mark("imports", since=0.0)
+        self._first_decision = True
+        self.log = RateLimitedLogger("polrov.decide")
+        # ring file of frames, detections and PWM writes; survives a crash of the process
+        self.recorder = FlightRecorder(record) if record else None
+        # every decided frame is published here for viewers (Tk interface, streaming)
+        self.frame_bus = FrameBus()
+        self._stop_event = threading.Event()
+
+        # camera, model and ESC arming are independent, the arming delay covers the other two
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            motors = pool.submit(self.startup.timed, "motors", self._init_motors, motor_control, arm_delay)
+            camera = pool.submit(self.startup.timed, "camera", self._open_camera, camera_source)
+            detector = pool.submit(self.startup.timed, "model", self._load_detector, target_latency)
+            self.motor_control = motors.result()
+            self.cap = camera.result()
+            self.detector = detector.result()
+        self.motor_control.recorder = self.recorder
+        self.scheduler = None
+        self.capture = None
         if not self.cap.isOpened():
             print("Tidak dapat membuka kamera.")
             self.cap = None
+            # the ESCs were armed concurrently, do not leave them armed with nothing driving them
+            self.motor_control.stop_all_motors()
+            self.motor_control.close()
             return
 
-        self.detector = NCNNRunner(self.model_path)
-        self.motor_control = MotorControl()
+        self.rng = random.Random(seed)
+        self.gate_id = class_index(self.detector.class_names, "Gate")
+        self.cylinder_id = class_index(self.detector.class_names, "Cylinder")
+        # several cameras share the detector; tracks and debouncing are per camera, decisions are merged
+        self.multi_camera = isinstance(self.cap, MultiCamera)
+        self.stream_names = self.cap.names if self.multi_camera else ["cam0"]
+        self.trackers = [MultiObjectTracker() for _ in self.stream_names]
+        self.decision_filters = [DecisionFilter((self.gate_id, self.cylinder_id), on_thres=confidence_thres,
+                                                off_thres=0.75 * confidence_thres) for _ in self.stream_names]
+        self.stream_decisions = {}
+        self.tracker = self.trackers[0]
+        self.decisions = self.decision_filters[0]
+        if len(self.stream_names) > 1 and (adaptive or roi):
+            # optical flow and ROI crops follow one view, frames of other cameras in between break them
+            print("Mode adaptif/ROI hanya untuk satu kamera, dinonaktifkan.")
+            adaptive = roi = False
+        # adaptive: run the detector every N frames, optical flow in between
+        self.adaptive = AdaptiveDetector(self.detector, self.detect_thres, iou_thres) if adaptive else None
+        # roi: crop around tracked objects, with a periodic full-frame pass
+        self.roi = RoiDetector(self.detector, self.detect_thres, iou_thres) if roi and not adaptive else None
 
         self.output_dir = "screenshots"
-        os.makedirs(self.output_dir, exist_ok=True)
+        # frames with a best score in [save_threshold, confidence_thres) + YOLO labels, saved in the background
+        self.capture = CaptureWriter(self.output_dir, save_threshold, confidence_thres)
 
-        self.screenshot_enabled = False
+        self.screenshot_enabled = capture
         self.robot_active = True
+        # thrusters are updated at control_rate by the scheduler, decide() only hands over its decision
+        self.dodge_time = dodge_time
+        self.gate_time = gate_time
+        self.scheduler = ControlScheduler(self.motor_control, self.control_policy, control_rate)
+
+    def _init_motors(self, motor_control, arm_delay):
+        motor_control = motor_control if motor_control is not None else MotorControl(async_writes=True)
+        # neutral to the ESCs also without a delay (replay), so a run always starts from the same command
+        motor_control.arm(arm_delay)
+        return motor_control
+
+    def _open_camera(self, camera_source):
+        # camera_source: device index / path / video file, or an already opened frame source;
+        # a list of those (or of CameraStreams) for several cameras
+        if isinstance(camera_source, (list, tuple)):
+            streams = [s if isinstance(s, CameraStream) else CameraStream(f"cam{i}", s)
+                       for i, s in enumerate(camera_source)]
+            for s in streams:
+                s.source = self._open_camera(s.source)
+            return MultiCamera(streams)
+        if hasattr(camera_source, "read"):
+            return camera_source
+        return CameraSource(camera_source).start()
+
+    def _load_detector(self, target_latency):
+        # several exported sizes: switch between them to keep inference within target_latency
+        if isinstance(self.model_path, (list, tuple)):
+            detector = ModelSet(self.model_path, target_latency, precision=self.precision)
+        else:
+            detector = NCNNRunner(self.model_path, precision=self.precision)
+        self.startup.timed("warmup", detector.warmup)
+        return detector
+
+    def read_frame(self, stop_event=None):
+        while True:
+            ret, frame = self.cap.read()
+            if ret:
+                break
+            # a read also fails on a plain timeout; a stalled camera is waited for, only the end of the stream ends the run
+            if getattr(self.cap, "ended", True) or self._stop_event.is_set() or (stop_event is not None and stop_event.is_set()):
+                print("Gagal membaca frame.")
+                return None
+            self.log.warning("kamera_tertunda")
+        return {"frame": frame, "frame_id": self.cap.last_frame_id, "frame_time": self.cap.last_frame_time,
+                "stream": self.cap.last_stream if self.multi_camera else 0}
+
+    def preprocess(self, item):
+        # cameras differ in resolution, each keeps its own letterbox buffer
+        cache = self.cap.streams[item["stream"]].letterbox_cache if self.multi_camera else None
+        item["input"] = self.detector.preprocess(item["frame"], cache)
+        # letterbox padding of this frame, postprocess may run while the next one is preprocessed
+        item["pad"] = cache["geom"][:2] if cache is not None else (self.detector.dw, self.detector.dh)
+        item["t_preprocess"] = time.monotonic()
+        return item
+
+    def infer(self, item):
+        item["output"] = self.detector.predict(item.pop("input"))
+        item["t_infer"] = time.monotonic()
+        return item
+
+    def perceive(self, item):
+        if self.adaptive is not None:
+            item["result"] = self.adaptive.process(item["frame"])
+        else:
+            item["result"] = self.roi.process(item["frame"], item["frame_time"])
+        item["t_infer"] = time.monotonic()
+        return item
+
+    @profiled("decide")
+    def decide(self, item):
+        frame = item["frame"]
+        if self.recorder is not None:
+            self.recorder.frame_id = item["frame_id"]
+        if "result" not in item:
+            item["result"] = self.detector.postprocess(frame, item.pop("output"), self.detect_thres, self.iou_thres, pad=item["pad"])
+        if self.screenshot_enabled:
+            self.capture.offer(frame, item["result"], item["frame_id"])
+        item["result"] = filter_scores(item["result"], self.confidence_thres)
+        item["variant"] = getattr(self.detector, "last_variant", None)
+        stream = item["stream"]
+        # persistent tracks + debounced decisions, a single missed frame does not flip behaviour
+        item["tracks"] = self.trackers[stream].update(item["result"], item["frame_time"])
+        if self.roi is not None:
+            self.roi.set_tracks(self.tracker.tracks)  # perceive runs on its own thread, it only sees this copy
+        self.stream_decisions[stream] = dict(self.decision_filters[stream].update(item["tracks"]))
+        if self.multi_camera:
+            # a camera that stopped delivering must not hold on to its last decision
+            for s in self.cap.streams:
+                if s.ended:
+                    self.stream_decisions.pop(s.index, None)
+            self.cap.mark_decision(item["frame_time"], stream)
+        else:
+            self.cap.mark_decision(item["frame_time"])
+        # {class_id: [cameras that see it]}, any camera can trigger a maneuver
+        self.scheduler.set_decision(merge_decisions(self.stream_decisions, self.stream_names))
+
+        if self.recorder is not None:
+            stamps = (item["frame_time"], item.get("t_preprocess", float("nan")), item.get("t_infer", float("nan")),
+                      time.monotonic())
+            self.recorder.frame(item["frame_id"], stamps, item["result"], stream)
+        if self._first_decision:
+            self._first_decision = False
+            self.startup.mark("first_decision")
+            print(f"Waktu startup:\n{self.startup.format()}")
+        return item
+
+    def control_policy(self, decision, now):
+        """Called by the scheduler every control tick: steady commands, or the maneuver to start."""
+        if decision.get(self.cylinder_id):
+            arah = self.rng.choice(("kiri", "kanan"))
+            self.log.info("silinder", arah=arah, kamera=",".join(decision[self.cylinder_id]))
+            self.robot_active = True
+            return dodge(arah, self.dodge_time)
+        if decision.get(self.gate_id):
+            self.log.info("gate", kamera=",".join(decision[self.gate_id]))
+            return slow_through_gate(self.gate_time)
+        if self.robot_active:
+            self.motor_control.move_forward()
+        return None
 
-    def run(self):
+    def build_pipeline(self, queue_size=1, policy=DROP_OLDEST):
+        """capture -> preprocess -> infer -> decide, the caller thread does the display."""
+        # the capture stage waits out camera stalls until the pipeline is stopped
+        pipeline = Pipeline(lambda: self.read_frame(pipeline.stop_event), output_size=queue_size,
+                            output_policy=DROP_OLDEST)
+        if self.adaptive is not None or self.roi is not None:
+            return (pipeline
+                    .add_stage("perceive", self.perceive, queue_size, policy)
+                    .add_stage("decide", self.decide, queue_size, policy))
+        return (pipeline
+                .add_stage("preprocess", self.preprocess, queue_size, policy)
+                .add_stage("infer", self.infer, queue_size, policy)
+                .add_stage("decide", self.decide, queue_size, policy))
+
+    def run(self, headless=False):
+        """Control loop until 'q', stop() or end of stream.
+
+        headless: no cv2 window and no key handling, frames only go to frame_bus.
+        """
         if self.cap is None:
             print("Kamera tidak tersedia.")
             return
 
-        print("Tekan 's' untuk AKTIF/NONAKTIFKAN screenshot otomatis.")
-        print("Tekan 'q' untuk keluar.")
+        if not headless:
+            print("Tekan 's' untuk AKTIF/NONAKTIFKAN screenshot otomatis.")
+            print("Tekan 'p' untuk AKTIF/NONAKTIFKAN profiler (overlay p50/p99).")
+            print("Tekan 'q' untuk keluar.")
 
-        self.motor_control.stop_all_motors()
-        time.sleep(3)
+        # arming was started in __init__, only what is left of the delay is waited here
+        self.startup.timed("arming_wait", self.motor_control.wait_armed)
 
+        pipeline = self.build_pipeline()
+        if self.autonomous:
+            self.scheduler.start()
+        last_time = time.time()
+        profile_lines, profile_time = [], 0.0
         try:
-            while True:
-                start_time = time.time()
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Gagal membaca frame.")
-                    break
-
-                im2 = self.detector.preprocess(frame)
-                y = self.detector.predict(im2)
-                r = self.detector.postprocess(frame, y, self.confidence_thres, self.iou_thres)
-
-                dimg = frame.copy()
-                box_got, score_got, class_id_got = r
-
-                gate_detected = False
-                cylinder_detected = False
-
-                for i in range(len(box_got)):
-                    box = box_got[i]
-                    score = score_got[i]
-                    class_id = class_id_got[i]
-                    class_name = self.detector.class_names[class_id]
-
-                    if class_name == "Gate" and score >= self.confidence_thres:
-                        gate_detected = True
-
-                    if class_name == "Cylinder" and score >= self.confidence_thres:
-                        cylinder_detected = True
-
-                if cylinder_detected:
-                    print("Silinder terdeteksi. Robot bergerak ke kiri atau kanan secara acak...")
-                    self.motor_control.move_down()
-                    if random.choice([True, False]):
-                        self.motor_control.move_left()
-                        arah = "kiri"
-                    else:
-                        self.motor_control.move_right()
-                        arah = "kanan"
-
-                    print(f"Robot bergerak ke {arah} ...")
-                    time.sleep(0)
-                    self.motor_control.stop_all_motors()
-                    self.robot_active = True
-
-                elif gate_detected:
-                    print("Gate terdeteksi. Robot bergerak lebih lambat...")
-                    self.motor_control.set_motor_throttle(5, 1000)
-                    self.motor_control.set_motor_throttle(6, 1000)
-
-                elif self.robot_active:
-                    self.motor_control.move_forward()
-
-                end_time = time.time()
-                fps = 1 / (end_time - start_time)
-                status = "Screenshot: ON" if self.screenshot_enabled else "Screenshot: OFF"
-                cv2.putText(dimg, f"FPS: {fps:.2f} | {status}", (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-
-                cv2.imshow("POLROV", dimg)
-
-                key = cv2.waitKey(1) & 0xFF
+            pipeline.start()
+            while pipeline.running and not self._stop_event.is_set():
+                item = pipeline.get(timeout=0.1)
+                if item is None:
+                    continue
+                self.frame_bus.publish(item)
+                if headless:
+                    continue
+
+                now = time.time()
+                fps = 1 / max(now - last_time, 1e-6)
+                last_time = now
+                if PROFILER.enabled and now - profile_time > 0.5:
+                    # merging the per-thread histograms is not free, refresh twice a second
+                    profile_lines, profile_time = PROFILER.format_lines(), now
+                key = self.show(item, fps, profile_lines if PROFILER.enabled else ())
                 if key == ord('q'):
                     break
                 elif key == ord('s'):
                     self.screenshot_enabled = not self.screenshot_enabled
                     print(f"[i] Screenshot sekarang {'AKTIF' if self.screenshot_enabled else 'NONAKTIF'}")
+                elif key == ord('p'):
+                    print(f"[i] Profiler sekarang {'AKTIF' if PROFILER.toggle(PROFILER.tracing) else 'NONAKTIF'}")
 
         except KeyboardInterrupt:
             print("Program dihentikan.")
         finally:
+            pipeline.stop()
+            self.scheduler.stop()
+            self.frame_bus.close()
+            print(f"Statistik pipeline:\n{pipeline.format_stats()}")
+            if PROFILER.summary():
+                print("Profil per tahap:\n  " + "\n  ".join(PROFILER.format_lines()))
+            if self.adaptive is not None:
+                print(f"Statistik inferensi adaptif: {self.adaptive.stats()}")
+            if self.roi is not None:
+                print(f"Statistik inferensi ROI: {self.roi.stats()}")
+            if isinstance(self.detector, ModelSet):
+                print(f"Statistik varian model: {self.detector.stats()}")
+            print(f"Statistik kontrol: {self.scheduler.stats()}")
             print("Menghentikan semua motor dan membersihkan...")
             self.motor_control.stop_all_motors()
+            self.motor_control.close()
+            print(f"Statistik PWM: {self.motor_control.write_stats()}")
+            self.capture.close()
+            print(f"Statistik capture: {self.capture.stats()}")
+            if self.recorder is not None:
+                self.recorder.close()
             if self.cap:
+                print(f"Statistik kamera: {self.cap.stats()}")
                 self.cap.release()
-            cv2.destroyAllWindows()
+            if not headless:
+                cv2.destroyAllWindows()
+
+    @profiled("display")
+    def show(self, item, fps, profile_lines=()):
+        """Annotated frame in the cv2 window, returns the key pressed (0xFF for none)."""
+        dimg = draw_detections(item["frame"].copy(), item["result"], self.detector.class_names)
+        status = "Screenshot: ON" if self.screenshot_enabled else "Screenshot: OFF"
+        if self.multi_camera:
+            status += f" | Kamera: {self.stream_names[item['stream']]}"
+        if item.get("variant"):
+            status += f" | Model: {item['variant']}"
+        cv2.putText(dimg, f"FPS: {fps:.2f} | {status}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        for i, line in enumerate(profile_lines):
+            cv2.putText(dimg, line, (10, 50 + 16 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
+
+        # one window per camera, frames of the cameras arrive interleaved
+        cv2.imshow(f"POLROV {self.stream_names[item['stream']]}" if self.multi_camera else "POLROV", dimg)
+        return cv2.waitKey(1) & 0xFF
+
+    def stop(self):
+        """Ask run() to finish, from any thread."""
+        self._stop_event.set()
 
     def move_forward(self):
         self.motor_control.move_forward()
@@ -137,6 +348,10 @@ class RobotControl:
         self.motor_control.stop_all_motors()
 
     def get_frame(self):
+        # while run() is active the capture belongs to the pipeline, reuse its latest frame
+        seq, item = self.frame_bus.latest()
+        if item is not None:
+            return item["frame"]
         if self.cap is not None:
             ret, frame = self.cap.read()
             if ret:
@@ -144,11 +359,55 @@ class RobotControl:
         return None
 
     def release_resources(self):
+        # scheduler and capture do not exist when the camera failed to open
+        if self.scheduler is not None:
+            self.scheduler.stop()
         self.stop_all_motors()
+        self.motor_control.close()
+        if self.capture is not None:
+            self.capture.close()
+        if self.recorder is not None:
+            self.recorder.close()
         if self.cap:
             self.cap.release()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    robot = RobotControl()
-    robot.run()
+    import argparse
+    ratelog.setup()
+    parser = argparse.ArgumentParser(description="POLROV: deteksi objek dan kontrol motor")
+    parser.add_argument("--headless", action="store_true", help="tanpa jendela tampilan (di wahana)")
+    parser.add_argument("--stream", type=int, default=None, metavar="PORT",
+                        help="kirim video beranotasi lewat HTTP MJPEG di port ini")
+    parser.add_argument("--stream-host", default="127.0.0.1",
+                        help="alamat server stream, tanpa autentikasi: 0.0.0.0 hanya di jaringan tether")
+    parser.add_argument("--capture", action="store_true", help="simpan contoh sulit sejak awal (tanpa menekan 's')")
+    parser.add_argument("--profile", action="store_true", help="aktifkan profiler sejak awal (SIGUSR1 untuk on/off)")
+    parser.add_argument("--trace", default=None, metavar="PATH", help="simpan span Chrome trace ke PATH saat keluar")
+    parser.add_argument("--int8", action="store_true", help="pakai model int8 (model-int8.ncnn.*, lihat quantize.py)")
+    parser.add_argument("--camera", action="append", default=[], metavar="SUMBER[@PRIORITAS[/FPS]]",
+                        help="indeks/path kamera atau file video, boleh berulang untuk beberapa kamera "
+                             "(mis. --camera 0@2 --camera 2@1/5)")
+    args = parser.parse_args()
+    if args.profile or args.trace:
+        PROFILER.enable(trace=args.trace is not None)
+    if hasattr(signal, "SIGUSR1"):
+        # headless on the vehicle: `kill -USR1 <pid>` toggles the profiler
+        signal.signal(signal.SIGUSR1, lambda signum, frame: PROFILER.toggle(args.trace is not None))
+    streams = [CameraStream(f"cam{i}", *parse_stream_spec(spec)) for i, spec in enumerate(args.camera)]
+    # a single camera only needs MultiCamera for its fps cap, priority has nothing to share
+    multi = len(streams) > 1 or any(s.max_fps for s in streams)
+    robot = RobotControl(camera_source=streams if multi else streams[0].source if streams else 0,
+                         capture=args.capture, precision="int8" if args.int8 else "fp32")
+    server = None
+    if args.stream is not None:
+        from stream_server import StreamServer
+        server = StreamServer(robot.frame_bus, robot.detector.class_names, host=args.stream_host,
+                              port=args.stream).start()
+    try:
+        robot.run(headless=args.headless)
+    finally:
+        if server is not None:
+            server.stop()
+        if args.trace:
+            print(f"{PROFILER.dump_chrome_trace(args.trace)} span -> {args.trace}")
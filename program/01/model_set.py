@@ -0,0 +1,120 @@
+import os
+import time
+from ncnn_runner import NCNNRunner
+
+
+class ModelSet:
+    """Several exported variants of the detector (e.g. 320/416/640 input, n/s) loaded side by side.
+
+    Drop-in for NCNNRunner in the preprocess -> predict -> postprocess
+    chain: preprocess picks the variant for the frame and tags its output,
+    predict and postprocess follow the tag, so stages may run on different
+    threads. The variant choice is the largest one whose recent inference
+    time fits target_latency.
+    """
+
+    def __init__(self, model_paths, target_latency=0.1, headroom=0.8, smoothing=0.2, cooldown=2.0, use_gpu=False,
+                 precision="fp32"):
+        runners = [NCNNRunner(p, use_gpu, precision=precision) for p in model_paths]
+        # cheapest first, by input area
+        order = sorted(range(len(runners)), key=lambda i: runners[i].model_input_shape[0] * runners[i].model_input_shape[1])
+        self.variants = [runners[i] for i in order]
+        self.names = [os.path.basename(os.path.normpath(model_paths[i])) for i in order]
+        self.class_names = self.variants[0].class_names
+        for name, v in zip(self.names, self.variants):
+            if v.class_names != self.class_names:
+                raise ValueError(f"variant {name} has different class names")
+        self.target_latency = target_latency
+        self.headroom = headroom    # switch up only if the bigger variant is predicted under headroom * target
+        self.smoothing = smoothing
+        self.cooldown = cooldown    # seconds before stepping back up to a variant that was too slow
+        self._blocked_until = [0.0] * len(self.variants)
+        self.latency = [None] * len(self.variants)  # EMA of predict time per variant, seconds
+        self.used = [0] * len(self.variants)
+        self.current = len(self.variants) - 1  # start with the most accurate, the controller steps down
+        self.last_variant = None
+
+    @classmethod
+    def from_dir(cls, path, **kwargs):
+        """All subdirectories of path that contain an ncnn export."""
+        paths = sorted(os.path.join(path, d) for d in os.listdir(path)
+                       if os.path.exists(os.path.join(path, d, "model.ncnn.param")))
+        return cls(paths, **kwargs)
+
+    @property
+    def model_input_shape(self):
+        return self.variants[self.current].model_input_shape
+
+    @property
+    def dw(self):
+        return self.variants[self.current].dw
+
+    @property
+    def dh(self):
+        return self.variants[self.current].dh
+
+    def warmup(self, runs=1):
+        # not counted in the latency EMA, the first runs are not representative
+        for v in self.variants:
+            v.warmup(runs)
+
+    def _area(self, i):
+        h, w = self.variants[i].model_input_shape
+        return h * w
+
+    def select(self):
+        i = self.current
+        now = self.latency[i]
+        if now is None:
+            return i
+        t = time.monotonic()
+        if now > self.target_latency and i > 0:
+            self._blocked_until[i] = t + self.cooldown
+            i -= 1
+        # the bigger variant's cost is extrapolated from the current one by input area,
+        # its own measurement may be stale from a throttled period
+        elif i + 1 < len(self.variants) and t >= self._blocked_until[i + 1]:
+            estimate = now * self._area(i + 1) / self._area(i)
+            if estimate < self.headroom * self.target_latency:
+                i += 1
+                # restart the EMA from the estimate, else the stale value steps straight back down
+                self.latency[i] = estimate
+        self.current = i
+        return i
+
+    def preprocess(self, im, cache=None):
+        i = self.select()
+        return i, self.variants[i].preprocess(im, cache)
+
+    def _record(self, i, dt):
+        a = self.smoothing
+        self.latency[i] = dt if self.latency[i] is None else (1 - a) * self.latency[i] + a * dt
+
+    def predict(self, tagged):
+        i, mat_in = tagged
+        t0 = time.perf_counter()
+        y = self.variants[i].predict(mat_in)
+        self._record(i, time.perf_counter() - t0)
+        return i, y
+
+    def postprocess(self, input_image, tagged, confidence_thres, iou_thres, pad=None):
+        i, y = tagged
+        self.used[i] += 1
+        self.last_variant = self.names[i]
+        return self.variants[i].postprocess(input_image, y, confidence_thres, iou_thres, pad)
+
+    def detect_crop(self, img, rect, input_size, confidence_thres, iou_thres, cache=None):
+        i = self.select()
+        t0 = time.perf_counter()
+        result = self.variants[i].detect_crop(img, rect, input_size, confidence_thres, iou_thres, cache)
+        # the crop runs at input_size, scaled to the variant's full input the EMA stays comparable with predict
+        self._record(i, (time.perf_counter() - t0) * self._area(i) / (input_size[0] * input_size[1]))
+        self.used[i] += 1
+        self.last_variant = self.names[i]
+        return result
+
+    def stats(self):
+        return {
+            name: {"input": v.model_input_shape, "frames": n, "latency_ms": 1000 * l if l is not None else None}
+            for name, v, n, l in zip(self.names, self.variants, self.used, self.latency)
+        }
@@ -1,15 +1,139 @@
-from adafruit_pca9685 import PCA9685
-import board
-import busio
 import random
+import struct
+import threading
 import time
+from contextlib import contextmanager
+from ratelog import RateLimitedLogger
+from profiler import profiled
+from thruster_allocation import ThrusterAllocator, THRUSTERS
+import numpy as np
+
+LED0_ON_L = 0x06  # first PWM register of the PCA9685, 4 bytes per channel
+
+log = RateLimitedLogger("polrov.motor")
+
+
+class ActuatorWorker:
+    """Thread that owns the PWM bus and applies queued channel updates.
+
+    The mailbox holds at most one value per channel: a newer command for a
+    channel replaces the older one that has not been written yet. When a
+    write fails, on_error(changed) is called with the values that did not
+    make it to the bus.
+    """
+
+    def __init__(self, write_fn, on_error=None):
+        self.write_fn = write_fn
+        self.on_error = on_error
+        self._mailbox = {}  # channel -> (duty_cycle, enqueue time)
+        self._cond = threading.Condition()
+        self._busy = False
+        self._stopped = False
+        self.replaced = 0
+        self.batches = 0
+        self.failures = 0
+        self.queue_latency_sum = 0.0
+        self.queue_latency_max = 0.0
+        self.write_time_sum = 0.0
+        self.write_time_max = 0.0
+        self._thread = threading.Thread(target=self._run, name="actuator", daemon=True)
+        self._thread.start()
+
+    def submit(self, changed):
+        now = time.monotonic()
+        with self._cond:
+            for ch, v in changed.items():
+                if ch in self._mailbox:
+                    self.replaced += 1
+                    # keep the original enqueue time so latency covers the whole wait
+                    self._mailbox[ch] = (v, self._mailbox[ch][1])
+                else:
+                    self._mailbox[ch] = (v, now)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._mailbox or self._stopped)
+                if not self._mailbox:
+                    return
+                mailbox, self._mailbox = self._mailbox, {}
+                self._busy = True
+            t0 = time.monotonic()
+            changed = {ch: v for ch, (v, _) in mailbox.items()}
+            failed = False
+            try:
+                self.write_fn(changed)
+            except Exception as e:
+                failed = True
+                log.warning("pwm_write_failed", error=repr(e))
+                if self.on_error is not None:
+                    self.on_error(changed)
+            t1 = time.monotonic()
+            with self._cond:
+                self._busy = False
+                self.failures += failed
+                self.batches += 1
+                latency = t0 - min(t for _, t in mailbox.values())
+                self.queue_latency_sum += latency
+                self.queue_latency_max = max(self.queue_latency_max, latency)
+                self.write_time_sum += t1 - t0
+                self.write_time_max = max(self.write_time_max, t1 - t0)
+                self._cond.notify_all()
+
+    def flush(self, timeout=1.0):
+        """Block until everything submitted so far is on the bus."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._mailbox and not self._busy, timeout)
+
+    def stop(self):
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+    def stats(self):
+        n = max(self.batches, 1)
+        return {
+            "batches": self.batches,
+            "replaced": self.replaced,
+            "failures": self.failures,
+            "queue_latency_avg_ms": 1000 * self.queue_latency_sum / n,
+            "queue_latency_max_ms": 1000 * self.queue_latency_max,
+            "write_time_avg_ms": 1000 * self.write_time_sum / n,
+            "write_time_max_ms": 1000 * self.write_time_max,
+        }
+
 
 class MotorControl:
-    def __init__(self):
-        i2c = busio.I2C(board.SCL, board.SDA)
-        self.pwm = PCA9685(i2c)
+    def __init__(self, pwm=None, block_writes=True, async_writes=False):
+        # pwm: any PCA9685-like driver (e.g. replay.SimulatedPCA9685), default is the real board
+        if pwm is None:
+            from adafruit_pca9685 import PCA9685
+            import board
+            import busio
+            i2c = busio.I2C(board.SCL, board.SDA)
+            pwm = PCA9685(i2c)
+        self.pwm = pwm
+        # also turns on register auto-increment (MODE1 AI), needed for block writes
         self.pwm.frequency = 50
 
+        self._duty = {}      # last committed duty_cycle, per channel
+        self._pending = {}   # requested but not yet committed
+        self._local = threading.local()  # per-thread batch() state, see batch()
+        self._lock = threading.RLock()
+        self._regs = None
+        if block_writes and hasattr(self.pwm, "i2c_device"):
+            self._regs = self._read_registers()
+        self.writes_issued = 0
+        self.writes_suppressed = 0
+        self.bus_transactions = 0
+        # async_writes: commits return immediately, the actuator thread does the I2C
+        self.actuator = ActuatorWorker(self._write, self._forget) if async_writes else None
+        self.armed_at = None
+        self.recorder = None  # flight_recorder.FlightRecorder, gets every committed write
+
         self.MOTOR_CHANNELS = {
             "motor_1": 1,
             "motor_2": 14,
@@ -24,62 +148,212 @@ class MotorControl:
         self.PWM_MEDIUM = 1300
         self.PWM_SLOW = 1000
 
+        # combined motions: wrench -> all six thrusters in one matrix product
+        self.allocator = ThrusterAllocator(pwm_min=self.PWM_MIN, pwm_max=self.PWM_MAX)
+        self.thruster_channels = np.array([self.MOTOR_CHANNELS[name] for name in THRUSTERS])
+
+    def _request(self, values):
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            batch.update(values)  # this thread is inside batch(), committed when it ends
+            return
+        with self._lock:
+            self._pending.update(values)
+            self.commit()
+
     def set_motor_throttle(self, channel, throttle_us):
         pwm_value = int((throttle_us / 20000) * 65535)
-        self.pwm.channels[channel].duty_cycle = pwm_value
+        self._request({channel: pwm_value})
+
+    def set_throttles(self, channels, throttles_us):
+        """Several channels at once, one commit (or none inside batch())."""
+        duty = (np.asarray(throttles_us, dtype=np.float64) / 20000 * 65535).astype(np.int64)
+        self._request(dict(zip(np.asarray(channels).tolist(), duty.tolist())))
+
+    def apply_wrench(self, wrench, now=None):
+        """Drive all thrusters for a (surge, sway, heave, yaw) or 6-DOF wrench in thrust units.
+
+        Output is slew-limited against what each thruster was last commanded.
+        """
+        batch = getattr(self._local, "batch", None) or {}
+        with self._lock:
+            current = [batch.get(ch, self._pending.get(ch, self._duty.get(ch))) for ch in self.thruster_channels.tolist()]
+            previous = None
+            if None not in current:
+                previous = np.array(current, dtype=np.float64) * 20000 / 65535
+            us = self.allocator.step(wrench, now, previous)
+            self.set_throttles(self.thruster_channels, us)
+        return us
+
+    def move(self, surge=0.0, sway=0.0, heave=0.0, yaw=0.0):
+        """Combined motion, e.g. move(surge=0.5, sway=0.3): forward while drifting left."""
+        return self.apply_wrench((surge, sway, heave, yaw))
+
+    @contextmanager
+    def batch(self):
+        """Collect throttle changes and push them with a single commit at the end.
+
+        The changes are collected per thread without holding the lock, so
+        other threads (actuator, scheduler) are not blocked by the body.
+        """
+        if getattr(self._local, "batch", None) is not None:
+            yield self  # nested: the outermost batch commits
+            return
+        self._local.batch = {}
+        try:
+            yield self
+        finally:
+            collected, self._local.batch = self._local.batch, None
+            with self._lock:
+                self._pending.update(collected)
+                self.commit()
+
+    def commit(self):
+        """Write every pending channel whose duty cycle differs from the last commit."""
+        with self._lock:
+            changed = {ch: v for ch, v in self._pending.items() if self._duty.get(ch) != v}
+            self.writes_suppressed += len(self._pending) - len(changed)
+            self._pending.clear()
+            if not changed:
+                return 0
+            self.writes_issued += len(changed)
+            if self.recorder is not None:
+                self.recorder.pwm(changed)
+            if self.actuator is not None:
+                # assumed written while queued, so repeats are suppressed; _forget() undoes it on failure
+                self._duty.update(changed)
+                self.actuator.submit(changed)
+            else:
+                self._write(changed)
+                self._duty.update(changed)
+            return len(changed)
+
+    def _forget(self, changed):
+        """A write failed: the chip may not hold these values, let the next identical command through."""
+        with self._lock:
+            for ch, v in changed.items():
+                if self._duty.get(ch) == v:
+                    del self._duty[ch]
+
+    @profiled("motor_write")
+    def _write(self, changed):
+        if self._regs is not None:
+            self._write_block(changed)
+        else:
+            for ch, v in changed.items():
+                self.pwm.channels[ch].duty_cycle = v
+            self.bus_transactions += len(changed)
+
+    def _read_registers(self):
+        regs = bytearray(64)
+        with self.pwm.i2c_device as i2c:
+            i2c.write_then_readinto(bytes([LED0_ON_L]), regs)
+        return regs
+
+    def _write_block(self, changed):
+        # same encoding as adafruit_pca9685 PWMChannel.duty_cycle
+        for ch, v in changed.items():
+            on, off = (0x1000, 0) if v == 0xFFFF else (0, (v + 1) >> 4)
+            struct.pack_into("<HH", self._regs, 4 * ch, on, off)
+        # one auto-increment write from the lowest to the highest changed channel,
+        # channels in between are rewritten with their cached registers
+        lo, hi = min(changed), max(changed) + 1
+        with self.pwm.i2c_device as i2c:
+            i2c.write(bytes([LED0_ON_L + 4 * lo]) + self._regs[4 * lo:4 * hi])
+        self.bus_transactions += 1
+
+    def write_stats(self):
+        stats = {
+            "issued": self.writes_issued,
+            "suppressed": self.writes_suppressed,
+            "bus_transactions": self.bus_transactions,
+        }
+        if self.actuator is not None:
+            stats.update(self.actuator.stats())
+        return stats
+
+    def arm(self, delay=3.0):
+        """Send neutral to every ESC and start the arming delay without waiting for it."""
+        self.stop_all_motors()
+        self.armed_at = time.monotonic() + delay
+
+    def wait_armed(self):
+        """Sleep for whatever is left of the arming delay, returns the time slept."""
+        if self.armed_at is None:
+            return 0.0
+        remaining = max(self.armed_at - time.monotonic(), 0.0)
+        time.sleep(remaining)
+        return remaining
+
+    def flush(self, timeout=1.0):
+        if self.actuator is not None:
+            return self.actuator.flush(timeout)
+        return True
+
+    def close(self):
+        """Wait for queued writes and stop the actuator thread."""
+        if self.actuator is not None:
+            self.actuator.stop()
+            self.actuator = None
 
     def move_forward(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
 
     def move_backward(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
 
     def move_left(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
 
     def move_right(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
 
     def move_up(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MIN)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MIN)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MIN)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MIN)
 
     def move_down(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MEDIUM)
 
     def stop_all_motors(self):
-        for ch in self.MOTOR_CHANNELS.values():
-            self.set_motor_throttle(ch, self.PWM_MIN)
+        with self.batch():
+            for ch in self.MOTOR_CHANNELS.values():
+                self.set_motor_throttle(ch, self.PWM_MIN)
 
     def move_based_on_confidence(self, cylinder_confidence, gate_confidence, Cylinder_CONFIDENCE_THRESHOLD, Gate_CONFIDENCE_THRESHOLD):
-        """Kontrol pergerakan robot berdasarkan confidence dari objek yang terdeteksi."""
+        """Kontrol pergerakan robot berdasarkan confidence dari objek yang terdeteksi.
+
+        Tidak memblokir: untuk silinder hanya mengembalikan arah menghindar
+        ("kiri"/"kanan"), pemanggil menjalankannya sebagai manuver, lihat
+        control_scheduler.confidence_policy. Selain itu None.
+        """
         if cylinder_confidence >= Cylinder_CONFIDENCE_THRESHOLD:
-            print(f"Cylinder terdeteksi (confidence {cylinder_confidence:.2f})")
-            print("Robot bergerak ke kiri atau kanan...")
-            if random.choice([True, False]):
-                self.move_left()
-                arah = "kiri"
-            else:
-                self.move_right()
-                arah = "kanan"
-            print(f"Robot bergerak ke {arah}")
-            time.sleep(2)  # Durasi gerakan
-            self.stop_all_motors()
+            arah = random.choice(["kiri", "kanan"])
+            log.info("silinder", confidence=f"{cylinder_confidence:.2f}", arah=arah)
+            return arah
 
         elif gate_confidence >= Gate_CONFIDENCE_THRESHOLD:
-            print(f"Gate terdeteksi (confidence {gate_confidence:.2f})")
+            log.info("gate", confidence=f"{gate_confidence:.2f}")
             # Gerakan ketika Gate terdeteksi
-            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MAX)
-            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MAX)
-            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_SLOW)
-            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_SLOW)
+            with self.batch():
+                self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MAX)
+                self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MAX)
+                self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_SLOW)
+                self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_SLOW)
 
         else:
-            print("Tidak ada objek yang terdeteksi, robot bergerak maju dan turun")
-            self.move_forward()
-            self.move_down()
+            log.info("tidak_ada_objek", aksi="maju_turun")
+            with self.batch():
+                self.move_forward()
+                self.move_down()
@@ -0,0 +1,164 @@
+import math
+import time
+
+
+def parse_stream_spec(spec):
+    """'SOURCE[@PRIORITY[/MAX_FPS]]' -> (source, priority, max_fps); digits become a device index."""
+    source, _, budget = spec.partition("@")
+    priority, _, max_fps = budget.partition("/")
+    source = int(source) if source.isdigit() else source
+    return source, float(priority) if priority else 1.0, float(max_fps) if max_fps else None
+
+
+class CameraStream:
+    """One camera of a MultiCamera: its source plus its share of the detector.
+
+    priority weights the round-robin (a stream with priority 2 is served
+    twice as often as one with 1 when both have frames), max_fps caps how
+    often it is served at all; frames over the cap are skipped, never queued.
+    """
+
+    def __init__(self, name, source, priority=1.0, max_fps=None):
+        self.name = name
+        self.source = source
+        self.priority = priority
+        self.max_fps = max_fps
+        self.index = None
+        self.pending = None      # (frame, t, frame_time) not handed to the detector yet
+        self.next_due = -math.inf
+        self.vt = 0.0            # virtual time of the weighted round-robin
+        self.served = 0
+        self.skipped = 0
+        self.ended = False
+        self.letterbox_cache = {}  # cameras differ in resolution, each keeps its own buffer
+
+    @property
+    def live(self):
+        # CameraSource grabs on its own thread and can be polled; recorded FrameSources are read on demand
+        return hasattr(self.source, "read_frame")
+
+    def poll(self):
+        """Refresh pending without blocking: the newest frame of a live camera, the next recorded one otherwise."""
+        src = self.source
+        while True:
+            if self.live:
+                frame = src.read_frame(timeout=0)
+                if frame is None:
+                    self.ended = src.ended
+                    return
+                if self.pending is not None:
+                    self.skipped += 1  # a newer frame arrived before the detector got to this one
+                t = frame_time = src.last_frame_time
+            else:
+                if self.pending is not None:
+                    return
+                ret, frame = src.read()
+                if not ret:
+                    self.ended = True
+                    return
+                # recorded frames are scheduled on the recording clock, replays stay deterministic
+                t, frame_time = src.clock, src.last_frame_time
+            self.pending = (frame, t, frame_time)
+            if t >= self.next_due - 1e-6:  # frame clocks are float sums, do not miss a slot by rounding
+                return
+            self.pending = None
+            self.skipped += 1
+
+    def stats(self):
+        return dict(self.source.stats(), served=self.served, skipped=self.skipped,
+                    priority=self.priority, max_fps=self.max_fps)
+
+
+class MultiCamera:
+    """Several cameras feeding one detector, same read()/stats() surface as CameraSource.
+
+    read() hands out one frame at a time: from live cameras the stream that
+    is furthest behind its weighted share, from recordings the frame that is
+    earliest on the recording clock. last_stream tells which camera the last
+    frame came from; frame ids count over all streams.
+    """
+
+    def __init__(self, streams, poll_interval=0.002):
+        self.streams = list(streams)
+        for i, s in enumerate(self.streams):
+            s.index = i
+            if not s.source.isOpened():
+                print(f"Kamera {s.name} tidak dapat dibuka, dilewati.")
+                s.ended = True
+        if len({s.live for s in self.streams}) > 1:
+            raise ValueError("cannot mix live cameras and recorded sources")
+        self.live = self.streams[0].live
+        self.poll_interval = poll_interval
+        self.fps = max(s.source.fps for s in self.streams)
+        self.last_frame_id = 0
+        self.last_frame_time = 0.0
+        self.last_stream = None
+        self.clock = 0.0
+
+    @property
+    def names(self):
+        return [s.name for s in self.streams]
+
+    def isOpened(self):
+        return any(not s.ended for s in self.streams)
+
+    @property
+    def ended(self):
+        """Every stream reached its end."""
+        return not self.isOpened()
+
+    def _pick(self, ready):
+        if self.live:
+            return min(ready, key=lambda s: (s.vt, -s.priority, s.index))
+        return min(ready, key=lambda s: (s.pending[1], -s.priority, s.index))
+
+    def read(self, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            for s in self.streams:
+                if not s.ended:
+                    s.poll()
+            ready = [s for s in self.streams if s.pending is not None]
+            if ready:
+                break
+            if not self.isOpened() or time.monotonic() >= deadline:
+                return False, None
+            time.sleep(self.poll_interval)
+        s = self._pick(ready)
+        frame, t, frame_time = s.pending
+        s.pending = None
+        s.served += 1
+        if s.max_fps:
+            # slots on a fixed grid keep the average at max_fps with jittery frame times; after a gap start over
+            period = 1.0 / s.max_fps
+            s.next_due = s.next_due + period if t - s.next_due < period else t + period
+        # a stream that was idle (over budget, no frames) resumes at the others' pace instead of bursting
+        floor = min(x.vt for x in self.streams if not x.ended or x is s)
+        s.vt = max(s.vt, floor) + 1.0 / s.priority
+        self.last_frame_id += 1
+        self.last_frame_time = frame_time
+        self.last_stream = s.index
+        self.clock = max(self.clock, t) if not self.live else t
+        return True, frame
+
+    def mark_decision(self, frame_time=None, stream=None):
+        s = self.streams[self.last_stream if stream is None else stream]
+        return s.source.mark_decision(frame_time)
+
+    def stats(self):
+        return {s.name: s.stats() for s in self.streams}
+
+    def release(self):
+        for s in self.streams:
+            s.source.release()
+
+
+def merge_decisions(decisions, names):
+    """{stream: {class_id: active}} -> {class_id: [names of the streams where it is active]}."""
+    merged = {}
+    for stream, active in decisions.items():
+        for class_id, on in active.items():
+            seen = merged.setdefault(class_id, [])
+            if on:
+                seen.append(names[stream])
+    return merged
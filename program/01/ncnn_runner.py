@@ -1,27 +1,174 @@
 import ncnn as pyncnn
-import yaml
 import os
 import sys
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import torch.nn as nn
-import torch
 import cv2
+from profiler import PROFILER, profiled
+
+# one detection per record, handy for logging / serialising postprocess output
+DETECTION_DTYPE = np.dtype([("box", np.float32, (4,)), ("score", np.float32), ("class_id", np.int32)])
+
+
+@profiled("nms")
+def nms(boxes, scores, iou_thres, class_ids=None, max_det=300):
+    """NMS over (n, 4) xywh boxes in OpenCV's C++ loop, class-aware when class_ids is given.
+
+    Returns at most max_det kept indices, sorted by descending score.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+    scores = np.ascontiguousarray(scores, dtype=np.float32)
+    if class_ids is None:
+        keep = cv2.dnn.NMSBoxes(boxes, scores, 0.0, iou_thres)
+    else:
+        # OpenCV offsets each class by the largest coordinate, which only separates the classes for boxes
+        # at >= 0; boxes may start left of / above the image, IoU does not change when all are moved
+        boxes = boxes.copy()
+        boxes[:, :2] -= min(float(boxes[:, :2].min()), 0.0)
+        keep = cv2.dnn.NMSBoxesBatched(boxes, scores, np.ascontiguousarray(class_ids, dtype=np.int32), 0.0, iou_thres)
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:max_det]
+
+
+def decode_output(output, confidence_thres, iou_thres, dw=0.0, dh=0.0, gain=1.0, max_det=300):
+    """Decode a raw YOLO head (1, 4 + C, N) into (boxes, scores, class_ids).
+
+    Boxes are left, top, width, height in original image coordinates.
+    """
+    pred = np.squeeze(output)  # (4 + C, N)
+    class_scores = pred[4:]
+    max_scores = class_scores.max(axis=0)
+    candidates = np.flatnonzero(max_scores >= confidence_thres)
+    if candidates.size == 0:
+        return (np.empty((0, 4), dtype=np.float32),
+                np.empty(0, dtype=np.float32),
+                np.empty(0, dtype=np.int32))
+
+    scores = max_scores[candidates].astype(np.float32)
+    class_ids = class_scores[:, candidates].argmax(axis=0).astype(np.int32)
+    cx, cy, w, h = pred[:4, candidates].astype(np.float32)
+    boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+
+    keep = nms(boxes, scores, iou_thres, class_ids, max_det)
+    boxes = boxes[keep]
+    # undo the letterbox: remove padding, then rescale
+    boxes[:, 0] -= dw
+    boxes[:, 1] -= dh
+    boxes *= gain
+    return boxes, scores[keep], class_ids[keep]
+
+
+def filter_scores(r, min_score):
+    """Keep the detections of a (boxes, scores, class_ids) result with score >= min_score."""
+    boxes, scores, class_ids = r
+    keep = scores >= min_score
+    return boxes[keep], scores[keep], class_ids[keep]
+
+
+def to_records(r):
+    """Pack a (boxes, scores, class_ids) result into a DETECTION_DTYPE array."""
+    box_got, score_got, class_id_got = r
+    rec = np.empty(len(score_got), dtype=DETECTION_DTYPE)
+    rec["box"] = box_got
+    rec["score"] = score_got
+    rec["class_id"] = class_id_got
+    return rec
+
+
+PROFILE_NAME = "ncnn_profile.yaml"  # written by ncnn_tune.py next to metadata.yaml
+
+# param/bin per precision; the int8 pair is written by quantize.py calibrate (ncnn2int8)
+MODEL_FILES = {
+    "fp32": ("model.ncnn.param", "model.ncnn.bin"),
+    "int8": ("model-int8.ncnn.param", "model-int8.ncnn.bin"),
+}
+
+
+def model_files(model_path, precision="fp32"):
+    param, bin_ = MODEL_FILES[precision]
+    return os.path.join(model_path, param), os.path.join(model_path, bin_)
+
+
+def profile_path(model_path, precision="fp32"):
+    if precision == "fp32":
+        return os.path.join(model_path, PROFILE_NAME)
+    stem, ext = os.path.splitext(PROFILE_NAME)
+    return os.path.join(model_path, f"{stem}-{precision}{ext}")
+
+
+def device_key():
+    """The machine a profile was tuned on; options tuned elsewhere are not reused."""
+    import platform
+    return {"machine": platform.machine(), "cpu_count": pyncnn.get_cpu_count(),
+            "big_cpu_count": pyncnn.get_big_cpu_count()}
+
+
+def load_profile(model_path, precision="fp32"):
+    """Tuned options of a model directory, None if it has not been tuned on this machine."""
+    path = profile_path(model_path, precision)
+    if not os.path.exists(path):
+        return None
+    import yaml
+    with open(path) as f:
+        profile = yaml.safe_load(f)
+    if profile.get("device") != device_key():
+        print(f"Profil {path} dibuat di perangkat lain ({profile.get('device')}), diabaikan")
+        return None
+    return profile
+
+
+def apply_options(net, options):
+    """Set ncnn.Option fields on net.opt, before load_param/load_model.
+
+    Besides the Option attributes (num_threads, lightmode, use_*), accepts
+    "allocator": "pool" for pooled blob/workspace allocators and
+    "powersave": 0/1/2 (all/little/big cores, process wide). Returns the
+    allocators, which must stay alive as long as the net.
+    """
+    allocators = []
+    for key, value in options.items():
+        if key == "allocator":
+            if value == "pool":
+                # the locked pool: extractors may run on several threads (predict_batch)
+                allocators = [pyncnn.PoolAllocator(), pyncnn.PoolAllocator()]
+                net.opt.blob_allocator, net.opt.workspace_allocator = allocators
+        elif key == "powersave":
+            pyncnn.set_cpu_powersave(int(value))
+        elif hasattr(net.opt, key):
+            setattr(net.opt, key, value)
+        else:
+            print(f"Opsi ncnn tidak dikenal di profil: {key}")
+    return allocators
+
 
 class NCNNRunner:
-    def __init__(self, model_path,use_gpu=False):
+    def __init__(self, model_path,use_gpu=False,use_torch=False,options=None,precision="fp32"):
         self.model_path = model_path
+        self.use_torch = use_torch  # legacy torch preprocessing
+        self.precision = precision  # "fp32" or "int8" (quantized export in the same directory)
         self.net = pyncnn.Net()
+        # options: ncnn settings for this net; by default the tuned profile of the model directory
+        if options is None:
+            profile = load_profile(model_path, precision)
+            options = profile["options"] if profile else {}
+        self.options = dict(options)
+        self._allocators = apply_options(self.net, self.options)
         self.net.opt.use_vulkan_compute = use_gpu
-        param_path = os.path.join(model_path,"model.ncnn.param")
+        if precision == "int8":
+            self.net.opt.use_int8_inference = True
+        param_path, model_bin = model_files(model_path, precision)
         # check if param file exists
         if not os.path.exists(param_path):
-            print("param file not found")
+            print(f"param file not found: {param_path}")
             sys.exit(1)
         self.net.load_param(param_path)
-        model_bin = os.path.join(model_path,"model.ncnn.bin")
         # check if bin file exists
         if not os.path.exists(model_bin):
-            print("bin file not found")
+            print(f"bin file not found: {model_bin}")
             sys.exit(1)
         self.net.load_model(model_bin)
         self.metadata =   os.path.join(model_path,"metadata.yaml")
@@ -29,12 +176,21 @@ class NCNNRunner:
         if not os.path.exists(self.metadata):
             print("metadata file not found")
             sys.exit(1)
+        import yaml  # only needed here, keeps module import cheap
         with open(self.metadata, 'r') as f:
             data = yaml.safe_load(f)
         self.model_input_shape = data["imgsz"]
         self.class_names = data["names"]
+        # BGR->RGB and 0-255 -> 0.0-1.0 are done by ncnn itself
+        self.norm_vals = [1 / 255.0, 1 / 255.0, 1 / 255.0]
+        self._letterbox_cache = {}
+        self._opt_lock = threading.Lock()
+        self.input_name = self.net.input_names()[0]
+        # WARNING: 'output_names' sorted as a temporary fix for https://github.com/pnnx/pnnx/issues/130
+        self.output_names = sorted(self.net.output_names())
     
     #   pre_transform
+    @profiled("pre_transform")
     def pre_transform(self,img):
         shape = img.shape[:2]  # current shape [height, width]
         new_shape = self.model_input_shape  # set this to the size you want
@@ -64,7 +220,54 @@ class NCNNRunner:
         self.ratio = ratio
 
         return img  #640 640 3 
-    def preprocess(self,im):
+
+    def letterbox(self, img, cache=None, new_shape=None):
+        """Letterbox img into a reused buffer, same geometry as pre_transform.
+
+        cache holds the buffer and geometry; pass a private dict when calling
+        from several threads, otherwise the runner's own one is used and
+        dw/dh/ratio are updated like pre_transform does. new_shape overrides
+        model_input_shape (e.g. a smaller input for crops).
+        """
+        c = self._letterbox_cache if cache is None else cache
+        new_shape = tuple(new_shape or self.model_input_shape)
+        shape = img.shape[:2]
+        if c.get("shape") != (shape, new_shape):
+            r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+            new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+            dw = (new_shape[1] - new_unpad[0]) / 2
+            dh = (new_shape[0] - new_unpad[1]) / 2
+            top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+            # padding is written once, every frame only refreshes the image area
+            c["buf"] = np.full((new_shape[0], new_shape[1], 3), 114, dtype=np.uint8)
+            c["roi"] = c["buf"][top:top + new_unpad[1], left:left + new_unpad[0]]
+            c["geom"] = (dw, dh, (r, r))
+            c["shape"] = (shape, new_shape)
+        if cache is None:
+            self.dw, self.dh, self.ratio = c["geom"]
+        roi = c["roi"]
+        if roi.shape[:2] != shape:
+            cv2.resize(img, (roi.shape[1], roi.shape[0]), dst=roi, interpolation=cv2.INTER_LINEAR)
+        else:
+            np.copyto(roi, img)
+        return c["buf"]
+
+    @profiled("preprocess")
+    def preprocess(self,im,cache=None):
+        if self.use_torch:
+            return self.preprocess_torch(im)
+        return self.to_mat(self.letterbox(im, cache))
+
+    def to_mat(self, img):
+        """Letterboxed BGR uint8 image -> normalized RGB ncnn.Mat."""
+        h, w = img.shape[:2]
+        mat_in = pyncnn.Mat.from_pixels(img, pyncnn.Mat.PixelType.PIXEL_BGR2RGB, w, h)
+        mat_in.substract_mean_normalize([], self.norm_vals)
+        return mat_in
+
+    def preprocess_torch(self,im):
+        import torch
+
         im2 = np.stack([self.pre_transform(im)])  # (h, w, c) to (1, h, w, c)Ã¯Â¼Å’1 Ã¯Â¼Å’640 Ã¯Â¼Å’640 Ã¯Â¼Å’3 
 
         im2 = im2[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW, (n, 3, h, w)   # 1,3,640,640
@@ -76,62 +279,119 @@ class NCNNRunner:
         return im2
 
 
-    def predict(self,img2):
-        b, ch, h, w = img2.shape  # batch, channel, height, width   1 3 640 640
-        mat_in = pyncnn.Mat(img2[0].cpu().numpy())  # im[0].shape  3,640,640
-        with self.net.create_extractor() as ex:
-            ex.input(self.net.input_names()[0], mat_in) # self.net.input_names()[0] == in0
-            # WARNING: 'output_names' sorted as a temporary fix for https://github.com/pnnx/pnnx/issues/130
-            y = [np.array(ex.extract(x)[1])[None] for x in sorted(self.net.output_names())]  # out0
+    def warmup(self, runs=1):
+        """Run the net on a blank input so the first real frame does not pay for layer setup and allocation."""
+        h, w = self.model_input_shape
+        blank = np.zeros((h, w, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.predict(self.preprocess(blank, {}))
 
-        
+    @profiled("predict")
+    def predict(self,img2):
+        if isinstance(img2, pyncnn.Mat):
+            mat_in = img2
+        else:
+            b, ch, h, w = img2.shape  # batch, channel, height, width   1 3 640 640
+            mat_in = pyncnn.Mat(img2[0].cpu().numpy())  # im[0].shape  3,640,640
+        with PROFILER.span("create_extractor"):
+            ex = self._create_extractor()
+        with ex:
+            y = self._extract(ex, mat_in)
         return y
 
-    def postprocess(self,input_image, output,confidence_thres,iou_thres):
-        print(f"Postprocessing shape: {len(output)} {output[0].shape}")
+    def _extract(self, ex, mat_in):
+        ex.input(self.input_name, mat_in) # in0
+        outputs = []
+        for x in self.output_names:
+            with PROFILER.span("extract"):
+                outputs.append(np.array(ex.extract(x)[1])[None])  # out0
+        return outputs
 
-        outputs = np.transpose(np.squeeze(output[0]))
-        rows = outputs.shape[0]
-        boxes, scores, class_ids = [], [], []
+    def _create_extractor(self, num_threads=None):
+        """Extractor with the net options, num_threads overriding the thread count for this one only."""
+        with self._opt_lock:
+            if num_threads is None:
+                return self.net.create_extractor()
+            # extractors copy the net options when they are created, the net keeps its own setting
+            saved = self.net.opt.num_threads
+            self.net.opt.num_threads = num_threads
+            try:
+                return self.net.create_extractor()
+            finally:
+                self.net.opt.num_threads = saved
 
-        input_image_height, input_image_width = input_image.shape[:2]
+    def _map_ordered(self, fn, items, num_workers, threads_per_extractor):
+        """fn(ex, cache, item) over items on a thread pool, yielding results in input order.
+
+        Each call gets a fresh extractor (they cache blobs and are single use)
+        and borrows a letterbox buffer from a pool of num_workers. At most
+        2 * num_workers items are in flight, so items can be a long generator.
+        """
+        num_workers = num_workers or os.cpu_count() or 1
+        pool = queue.Queue()
+        for _ in range(num_workers):
+            pool.put({})
+
+        def work(item):
+            cache = pool.get()
+            try:
+                with self._create_extractor(threads_per_extractor) as ex:
+                    return fn(ex, cache, item)
+            finally:
+                pool.put(cache)
+
+        with ThreadPoolExecutor(num_workers, thread_name_prefix="ncnn") as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(work, item))
+                if len(pending) >= 2 * num_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def predict_batch(self, inputs, num_workers=None, threads_per_extractor=1):
+        """predict() over a list of preprocessed inputs, outputs in the same order."""
+        def fn(ex, cache, mat_in):
+            return self._extract(ex, mat_in)
+        return list(self._map_ordered(fn, inputs, num_workers, threads_per_extractor))
+
+    def run_many(self, images, confidence_thres=0.5, iou_thres=0.45, num_workers=None, threads_per_extractor=1):
+        """Stream preprocess/predict/postprocess over images, yielding results in input order.
+
+        num_workers * threads_per_extractor should roughly match the core count.
+        """
+        def fn(ex, cache, im):
+            mat_in = self.to_mat(self.letterbox(im, cache))
+            y = self._extract(ex, mat_in)
+            return self.postprocess(im, y, confidence_thres, iou_thres, pad=cache["geom"][:2])
+        return self._map_ordered(fn, images, num_workers, threads_per_extractor)
+
+    @profiled("postprocess")
+    def postprocess(self,input_image, output,confidence_thres,iou_thres,pad=None):
+        # pad: (dw, dh) of the frame's letterbox, defaults to the last pre_transform
+        dw, dh = pad if pad is not None else (self.dw, self.dh)
         model_input_height, model_input_width = self.model_input_shape
-       
-        ratio = (input_image_width / model_input_width, input_image_height / model_input_height)
-        np.set_printoptions(suppress=True)
-        for i in range(rows):
-            #print(outputs[i])
-            #print("{:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f}".format(outputs[i]))
-            classes_scores = outputs[i][4:]
-            max_score = np.amax(classes_scores)
-            if max_score >= confidence_thres:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = outputs[i][0], outputs[i][1], outputs[i][2], outputs[i][3]
-                
-                left = (x - w / 2)
-                top = (y - h / 2)
-                width = (w)
-                height = (h)
-
-                boxes.append([left, top, width, height])
-                scores.append(max_score)
-                class_ids.append(class_id)
-        
-        indices = cv2.dnn.NMSBoxes(boxes, scores, confidence_thres, iou_thres)
-        #print(indices,type(indices))
-        boxes = np.array(boxes)
-        scores = np.array(scores)
-        class_ids = np.array(class_ids)
-
-        for b in boxes:
-            
-            b[0] -= self.dw
-            b[1] -= self.dh        
-        
-        box_got = boxes[indices]*np.max(ratio)
-        score_got = scores[indices]
-        class_id_got = class_ids[indices]
-        return box_got, score_got, class_id_got
+        input_image_height, input_image_width = input_image.shape[:2]
+        # letterbox scale back to the original frame (1 / r used in pre_transform)
+        gain = max(input_image_width / model_input_width, input_image_height / model_input_height)
+        return decode_output(output[0], confidence_thres, iou_thres, dw, dh, gain)
+
+    def detect_crop(self, img, rect, input_size, confidence_thres, iou_thres, cache=None):
+        """Run the net on img[rect] letterboxed to input_size (h, w), boxes in img coordinates.
+
+        rect is (x0, y0, x1, y1); the exported net must accept the smaller
+        input shape (ncnn YOLO exports do).
+        """
+        x0, y0, x1, y1 = rect
+        crop = img[y0:y1, x0:x1]
+        cache = {} if cache is None else cache
+        mat_in = self.to_mat(self.letterbox(crop, cache, input_size))
+        dw, dh, (r, _) = cache["geom"]
+        boxes, scores, class_ids = decode_output(self.predict(mat_in)[0], confidence_thres, iou_thres, dw, dh, 1 / r)
+        boxes[:, 0] += x0
+        boxes[:, 1] += y0
+        return boxes, scores, class_ids
+
     def show(self, input_image, r):
         
         dimg = input_image.copy()
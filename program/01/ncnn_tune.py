@@ -0,0 +1,141 @@
+import argparse
+import sys
+import time
+import numpy as np
+import ncnn as pyncnn
+from ncnn_runner import NCNNRunner, device_key, profile_path
+
+# fp32 everywhere: the reference every candidate's outputs are compared against
+REFERENCE = {
+    "use_fp16_packed": False, "use_fp16_storage": False, "use_fp16_arithmetic": False,
+    "use_bf16_storage": False,
+}
+
+
+def search_space():
+    """Option groups tried one after another; each entry is a list of alternatives."""
+    cpus = pyncnn.get_cpu_count()
+    threads = sorted({n for n in (1, 2, 4, pyncnn.get_big_cpu_count(), cpus) if 1 <= n <= cpus})
+    space = [("num_threads", [{"num_threads": n} for n in threads])]
+    if pyncnn.get_little_cpu_count() > 0:
+        # big.LITTLE: all cores, little only, big only
+        space.append(("powersave", [{"powersave": n} for n in (0, 1, 2)]))
+    space += [
+        ("lightmode", [{"lightmode": True}, {"lightmode": False}]),
+        ("packing", [{"use_packing_layout": True}, {"use_packing_layout": False}]),
+        ("fp16", [{"use_fp16_packed": False, "use_fp16_storage": False, "use_fp16_arithmetic": False},
+                  {"use_fp16_packed": True, "use_fp16_storage": True, "use_fp16_arithmetic": False},
+                  {"use_fp16_packed": True, "use_fp16_storage": True, "use_fp16_arithmetic": True}]),
+        ("winograd", [{"use_winograd_convolution": True}, {"use_winograd_convolution": False}]),
+        ("sgemm", [{"use_sgemm_convolution": True}, {"use_sgemm_convolution": False}]),
+        ("allocator", [{"allocator": "default"}, {"allocator": "pool"}]),
+    ]
+    return space
+
+
+def deviation(outputs, reference, score_floor=0.25):
+    """(max score deviation, max box deviation in input pixels) of raw heads against the reference.
+
+    Boxes are only compared for anchors the reference scores at least
+    score_floor, elsewhere the regression output is noise nobody decodes.
+    """
+    score_dev = box_dev = 0.0
+    for y, ref in zip(outputs, reference):
+        y, ref = y[0], ref[0]  # (4 + classes, anchors)
+        score_dev = max(score_dev, float(np.abs(y[4:] - ref[4:]).max()))
+        keep = ref[4:].max(axis=0) >= score_floor
+        if keep.any():
+            box_dev = max(box_dev, float(np.abs(y[:4, keep] - ref[:4, keep]).max()))
+    return score_dev, box_dev
+
+
+def measure(model_path, options, frames, repeats=3, precision="fp32"):
+    """Median predict latency (s) and head outputs for frames under options."""
+    runner = NCNNRunner(model_path, options=options, precision=precision)
+    inputs = [runner.preprocess(f, {}) for f in frames]
+    runner.warmup(2)
+    outputs = [runner.predict(x)[0] for x in inputs]
+    times = []
+    for _ in range(repeats):
+        for x in inputs:
+            t0 = time.perf_counter()
+            runner.predict(x)
+            times.append(time.perf_counter() - t0)
+    if "powersave" in options:
+        pyncnn.set_cpu_powersave(0)  # process wide, do not leak into the next candidate
+    return float(np.median(times)), outputs
+
+
+def tune(model_path, frames, score_tol=0.01, box_tol=1.0, repeats=3, precision="fp32", log=print):
+    """Greedy search over search_space(): per group keep the fastest alternative within tolerance.
+
+    Returns the profile dict (options plus what was measured). For int8 the
+    reference is the int8 net without fp16, quantization error itself is
+    judged by quantize.py compare.
+    """
+    base_ms, reference = measure(model_path, REFERENCE, frames, repeats, precision)
+    log(f"referensi {precision} tanpa fp16: {1000 * base_ms:.2f} ms")
+    best = dict(REFERENCE)
+    best_ms = base_ms
+    best_dev = (0.0, 0.0)
+    tried = 0
+    for group, alternatives in search_space():
+        for alt in alternatives:
+            candidate = {**best, **alt}
+            if candidate == best:
+                continue
+            latency, outputs = measure(model_path, candidate, frames, repeats, precision)
+            dev = deviation(outputs, reference)
+            tried += 1
+            ok = dev[0] <= score_tol and dev[1] <= box_tol
+            log(f"{group:<10} {alt}: {1000 * latency:.2f} ms  dev skor {dev[0]:.4f} box {dev[1]:.2f} px"
+                + ("" if ok else "  (di luar toleransi)"))
+            if ok and latency < best_ms:
+                best, best_ms, best_dev = candidate, latency, dev
+    return {
+        "device": device_key(),
+        "precision": precision,
+        "options": best,
+        "latency_ms": 1000 * best_ms,
+        "reference_ms": 1000 * base_ms,
+        "score_dev": best_dev[0],
+        "box_dev_px": best_dev[1],
+        "tolerance": {"score": score_tol, "box_px": box_tol},
+        "frames": len(frames),
+        "candidates": tried,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_profile(model_path, profile):
+    import yaml
+    path = profile_path(model_path, profile["precision"])
+    with open(path, "w") as f:
+        yaml.safe_dump(profile, f, sort_keys=False)
+    return path
+
+
+if __name__ == '__main__':
+    from benchmark import load_frames
+
+    parser = argparse.ArgumentParser(description="Cari opsi ncnn tercepat untuk model ini di perangkat ini")
+    parser.add_argument("--model", default="obstacle_ncnn_model")
+    parser.add_argument("--clip", default="synthetic:20", help="file video, folder gambar atau synthetic[:N]")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--precision", choices=("fp32", "int8"), default="fp32")
+    parser.add_argument("--score-tol", type=float, default=0.01, help="selisih skor maksimum terhadap fp32")
+    parser.add_argument("--box-tol", type=float, default=1.0, help="selisih box maksimum terhadap fp32 (piksel input)")
+    parser.add_argument("--dry-run", action="store_true", help="jangan simpan profil")
+    args = parser.parse_args()
+
+    frames = load_frames(args.clip, args.frames)
+    if not frames:
+        print(f"Tidak ada frame dari {args.clip}")
+        sys.exit(1)
+    profile = tune(args.model, frames, args.score_tol, args.box_tol, args.repeats, args.precision)
+    print(f"Terbaik: {profile['options']}")
+    print(f"{profile['reference_ms']:.2f} ms -> {profile['latency_ms']:.2f} ms "
+          f"(dev skor {profile['score_dev']:.4f}, box {profile['box_dev_px']:.2f} px)")
+    if not args.dry_run:
+        print(f"Profil disimpan ke {save_profile(args.model, profile)}")
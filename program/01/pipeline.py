@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+
+DROP_OLDEST = "drop_oldest"  # a full queue discards its oldest item, the producer never waits
+BLOCK = "block"              # a full queue makes the producer wait (backpressure)
+END = object()               # end of stream marker, passed down the stages after the last item
+
+
+class BoundedQueue:
+    def __init__(self, maxsize=1, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"unknown queue policy: {policy}")
+        self.q = queue.Queue(maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def put(self, item, stop_event, block=False):
+        # block: wait for room whatever the policy (END must not push out the last item)
+        if self.policy == DROP_OLDEST and not block:
+            while True:
+                try:
+                    self.q.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self.q.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while not stop_event.is_set():
+            try:
+                self.q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, timeout):
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self.q.qsize()
+
+
+class Stage:
+    def __init__(self, name, fn, queue_size=1, policy=DROP_OLDEST):
+        self.name = name
+        self.fn = fn
+        self.input = BoundedQueue(queue_size, policy)
+        self.processed = 0
+        self.busy = 0.0
+        self.thread = None
+
+
+class Pipeline:
+    """Runs a source and a chain of stages, each on its own worker thread.
+
+    Stages are connected by bounded queues. A stage function takes the item
+    produced by the previous stage and returns the item for the next one,
+    or None to drop it. The source is called with no argument and returns
+    None at end of stream. Items leaving the last stage are collected with
+    get(), typically on the main thread (display, key handling).
+
+    At end of stream the stages finish what is queued before they exit;
+    running turns False once get() has returned the last item. stop()
+    ends the run right away, except after end of stream, where it first
+    lets the stages drain.
+    """
+
+    def __init__(self, source, source_name="capture", output_size=1, output_policy=DROP_OLDEST):
+        self.source = Stage(source_name, source)
+        self.stages = []
+        self.output = BoundedQueue(output_size, output_policy)
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()  # end of stream reached the output
+        self.error = None
+        self.start_time = None
+
+    def add_stage(self, name, fn, queue_size=1, policy=DROP_OLDEST):
+        self.stages.append(Stage(name, fn, queue_size, policy))
+        return self
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set() and not self.finished.is_set()
+
+    def _next_queue(self, index):
+        return self.stages[index].input if index < len(self.stages) else self.output
+
+    def _run_source(self):
+        stage = self.source
+        out = self._next_queue(0)
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                item = stage.fn()
+                stage.busy += time.perf_counter() - t0
+                if item is None:
+                    out.put(END, self.stop_event, block=True)
+                    return
+                stage.processed += 1
+                out.put(item, self.stop_event)
+        except Exception as e:
+            self.error = e
+            print(f"Stage '{stage.name}' gagal: {e!r}")
+            self.stop_event.set()
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        out = self._next_queue(index + 1)
+        try:
+            while not self.stop_event.is_set():
+                item = stage.input.get(timeout=0.1)
+                if item is None:
+                    continue
+                if item is END:
+                    out.put(END, self.stop_event, block=True)
+                    return
+                t0 = time.perf_counter()
+                item = stage.fn(item)
+                stage.busy += time.perf_counter() - t0
+                stage.processed += 1
+                if item is not None:
+                    out.put(item, self.stop_event)
+        except Exception as e:
+            self.error = e
+            print(f"Stage '{stage.name}' gagal: {e!r}")
+            self.stop_event.set()
+
+    def start(self):
+        self.stop_event.clear()
+        self.finished.clear()
+        self.start_time = time.perf_counter()
+        for i, stage in enumerate(self.stages):
+            stage.thread = threading.Thread(target=self._run_stage, args=(i,), name=f"stage-{stage.name}", daemon=True)
+            stage.thread.start()
+        self.source.thread = threading.Thread(target=self._run_source, name=f"stage-{self.source.name}", daemon=True)
+        self.source.thread.start()
+        return self
+
+    def get(self, timeout=1.0):
+        item = self.output.get(timeout)
+        if item is END:
+            self.finished.set()
+            return None
+        return item
+
+    def stop(self, drain_timeout=2.0):
+        source = self.source.thread
+        if source is not None and not source.is_alive() and not self.stop_event.is_set():
+            # end of stream: let the stages finish the items they still hold
+            deadline = time.monotonic() + drain_timeout
+            for stage in self.stages:
+                if stage.thread is not None:
+                    stage.thread.join(timeout=max(deadline - time.monotonic(), 0.0))
+        self.stop_event.set()
+        for stage in [self.source] + self.stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout=2.0)
+                stage.thread = None
+
+    def stats(self):
+        """Per-stage processed count, throughput (items/s), occupancy (busy fraction) and queue state."""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9) if self.start_time else 1e-9
+        result = []
+        for stage in [self.source] + self.stages:
+            result.append({
+                "stage": stage.name,
+                "processed": stage.processed,
+                "throughput": stage.processed / elapsed,
+                "occupancy": stage.busy / elapsed,
+                "queue": stage.input.qsize() if stage is not self.source else 0,
+                "dropped": stage.input.dropped if stage is not self.source else 0,
+            })
+        return result
+
+    def format_stats(self):
+        return "\n".join(
+            f"  {s['stage']:<11} {s['processed']:>6} item  {s['throughput']:6.1f}/s  busy {100 * s['occupancy']:5.1f}%  "
+            f"queue {s['queue']}  dropped {s['dropped']}"
+            for s in self.stats()
+        )
@@ -0,0 +1,181 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram (0.1 ms bins up to max_ms), memory stays constant."""
+
+    def __init__(self, max_ms=2000.0, bin_ms=0.1):
+        self.bin_ms = bin_ms
+        self.counts = np.zeros(int(max_ms / bin_ms) + 1, dtype=np.int64)
+        self.total = 0.0
+        self.n = 0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[min(int(ms / self.bin_ms), len(self.counts) - 1)] += 1
+        self.total += ms
+        self.n += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.n += other.n
+        return self
+
+    def percentile(self, q):
+        if self.n == 0:
+            return 0.0
+        idx = np.searchsorted(np.cumsum(self.counts), q / 100 * self.n)
+        return float((idx + 0.5) * self.bin_ms)
+
+    def summary(self):
+        return {
+            "mean_ms": self.total / self.n if self.n else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "t0")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.t0, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Per-stage latency histograms and optional Chrome trace spans, toggled at runtime.
+
+    Every thread writes into its own histograms, so recording takes no
+    lock; summary() merges them when asked. While disabled, span() hands
+    out a shared no-op context manager and profiled() functions call
+    straight through after one attribute check.
+    """
+
+    def __init__(self, max_ms=1000.0, bin_ms=0.1, max_events=200000):
+        self.enabled = False
+        self.tracing = False
+        self.max_ms = max_ms
+        self.bin_ms = bin_ms
+        self.events = deque(maxlen=max_events)  # (name, tid, start ns, end ns), appends are atomic
+        self._local = threading.local()
+        self._tables = []  # one {name: LatencyHistogram} per thread that recorded something
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+
+    def enable(self, trace=False):
+        self.tracing = trace
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.tracing = False
+
+    def toggle(self, trace=False):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable(trace)
+        return self.enabled
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def record(self, name, start_ns, end_ns):
+        table = getattr(self._local, "table", None)
+        if table is None:
+            table = self._local.table = {}
+            with self._lock:
+                self._tables.append((threading.current_thread().name, table))
+        hist = table.get(name)
+        if hist is None:
+            hist = table[name] = LatencyHistogram(self.max_ms, self.bin_ms)
+        hist.add((end_ns - start_ns) * 1e-9)
+        if self.tracing:
+            self.events.append((name, threading.get_ident(), start_ns, end_ns))
+
+    def reset(self):
+        with self._lock:
+            for _, table in self._tables:
+                table.clear()
+        self.events.clear()
+
+    def summary(self):
+        """{stage: {"n", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}} merged over threads."""
+        merged = {}
+        with self._lock:
+            tables = [table for _, table in self._tables]
+        for table in tables:
+            for name, hist in list(table.items()):
+                if name not in merged:
+                    merged[name] = LatencyHistogram(self.max_ms, self.bin_ms)
+                merged[name].merge(hist)
+        return {name: dict(n=h.n, **h.summary()) for name, h in sorted(merged.items())}
+
+    def format_lines(self):
+        return [f"{name}: p50 {s['p50_ms']:.1f} ms  p99 {s['p99_ms']:.1f} ms  (n={s['n']})"
+                for name, s in self.summary().items()]
+
+    def chrome_trace(self):
+        """Recorded spans as a Chrome trace-event document (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - self._t0) / 1000, "dur": (end - start) / 1000}
+                  for name, tid, start, end in list(self.events)]
+        names = {ident: t.name for t in threading.enumerate() for ident in [t.ident]}
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": names[tid]}}
+                   for tid in {e["tid"] for e in events} if tid in names]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        return len(self.events)
+
+
+PROFILER = Profiler()
+
+
+def profiled(name):
+    """Decorator: time every call under `name` while PROFILER is enabled."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                PROFILER.record(name, t0, time.perf_counter_ns())
+        return inner
+    return wrap
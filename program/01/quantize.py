@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+import cv2
+from ncnn_runner import NCNNRunner, model_files
+from capture_writer import dhash
+from evaluate import box_iou
+from benchmark import summarize
+from replay import open_source
+
+
+def require_recorded(specs):
+    """Raise ValueError for synthetic sources: neither int8 ranges nor fp32/int8 agreement mean anything on noise."""
+    synthetic = [spec for spec in specs if str(spec).startswith("synthetic")]
+    if synthetic:
+        raise ValueError(f"needs recorded footage, not {', '.join(synthetic)}")
+
+
+def calibration_frames(specs, count=200, min_distance=6, max_scan=5000):
+    """Up to count mutually different frames from the given sources (video, image folder, captures).
+
+    Near-duplicates (dHash within min_distance bits of a kept frame) are
+    skipped so long stretches of the same view do not dominate the
+    activation ranges; what is left is thinned evenly to count. Synthetic
+    noise is refused: int8 ranges calibrated on it do not fit real footage.
+    """
+    require_recorded(specs)
+    frames, hashes = [], []
+    for spec in specs:
+        source = open_source(spec)
+        scanned = 0
+        while scanned < max_scan:
+            ret, frame = source.read()
+            if not ret:
+                break
+            scanned += 1
+            h = dhash(frame)
+            if any(bin(h ^ k).count("1") <= min_distance for k in hashes[-256:]):
+                continue
+            hashes.append(h)
+            frames.append(frame)
+        source.release()
+    if len(frames) > count:
+        frames = [frames[i] for i in np.linspace(0, len(frames) - 1, count).astype(int)]
+    return frames
+
+
+def write_calibration_set(runner, frames, out_dir):
+    """Letterbox frames exactly like inference and save them with an image list for ncnn2table."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i, frame in enumerate(frames):
+        path = os.path.abspath(os.path.join(out_dir, f"calib_{i:05d}.png"))
+        cv2.imwrite(path, runner.letterbox(frame, {}))
+        paths.append(path)
+    list_path = os.path.join(out_dir, "imagelist.txt")
+    with open(list_path, "w") as f:
+        f.write("\n".join(paths) + "\n")
+    return list_path
+
+
+def find_tool(name, tools_dir=None):
+    if tools_dir:
+        path = os.path.join(tools_dir, name)
+        return path if os.path.exists(path) else None
+    return shutil.which(name)
+
+
+def calibrate(model_path, list_path, tools_dir=None, method="kl", threads=None):
+    """ncnn2table on the calibration list, then ncnn2int8; returns the int8 (param, bin)."""
+    runner = NCNNRunner(model_path, options={})
+    h, w = runner.model_input_shape
+    param, bin_ = model_files(model_path, "fp32")
+    int8_param, int8_bin = model_files(model_path, "int8")
+    table = os.path.join(model_path, "model.table")
+    # images are already letterboxed to the input size, so ncnn2table's resize is a no-op;
+    # pixel/mean/norm match NCNNRunner.to_mat (BGR file -> RGB, 0-255 -> 0-1)
+    commands = [
+        [find_tool("ncnn2table", tools_dir) or "ncnn2table", param, bin_, list_path, table,
+         "mean=[0,0,0]", f"norm=[{1 / 255:.8f},{1 / 255:.8f},{1 / 255:.8f}]", f"shape=[{w},{h},3]",
+         "pixel=RGB", f"thread={threads or os.cpu_count() or 1}", f"method={method}"],
+        [find_tool("ncnn2int8", tools_dir) or "ncnn2int8", param, bin_, int8_param, int8_bin, table],
+    ]
+    for cmd in commands:
+        if not os.path.exists(cmd[0]) and shutil.which(cmd[0]) is None:
+            print(f"{cmd[0]} tidak ditemukan (build ncnn dengan NCNN_BUILD_TOOLS=ON, atau --tools DIR). "
+                  f"Jalankan manual:\n  " + "\n  ".join(" ".join(c) for c in commands))
+            return None
+        print(" ".join(cmd))
+        subprocess.run(cmd, check=True)
+    return int8_param, int8_bin
+
+
+def rss_mb():
+    """Current resident memory of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_detections(runner, frame, conf, iou):
+    cache = {}
+    mat_in = runner.preprocess(frame, cache)
+    t0 = time.perf_counter()
+    y = runner.predict(mat_in)
+    elapsed = time.perf_counter() - t0
+    return runner.postprocess(frame, y, conf, iou, pad=cache["geom"][:2]), elapsed
+
+
+def class_deviation(reference, candidate, class_id, match_iou=0.5):
+    """Per-class agreement of candidate detections with the reference, frame by frame.
+
+    Detections are matched greedily in reference score order at IoU >=
+    match_iou; score and box deviations are over matched pairs, box
+    deviation is the largest corner offset in frame pixels.
+    """
+    n_ref = n_cand = matched = 0
+    score_dev, ious, box_dev = [], [], []
+    for (rb, rs, rc), (cb, cs, cc) in zip(reference, candidate):
+        rb, rs = rb[rc == class_id], rs[rc == class_id]
+        cb, cs = cb[cc == class_id], cs[cc == class_id]
+        n_ref += len(rs)
+        n_cand += len(cs)
+        if not len(rs) or not len(cs):
+            continue
+        r_xyxy = np.concatenate([rb[:, :2], rb[:, :2] + rb[:, 2:]], axis=1)
+        c_xyxy = np.concatenate([cb[:, :2], cb[:, :2] + cb[:, 2:]], axis=1)
+        iou = box_iou(r_xyxy, c_xyxy)
+        taken = np.zeros(len(cs), dtype=bool)
+        for i in np.argsort(-rs, kind="stable"):
+            candidates = np.where(taken, 0, iou[i])
+            j = int(np.argmax(candidates))
+            if candidates[j] < match_iou:
+                continue
+            taken[j] = True
+            matched += 1
+            score_dev.append(abs(float(cs[j] - rs[i])))
+            ious.append(float(iou[i, j]))
+            box_dev.append(float(np.abs(c_xyxy[j] - r_xyxy[i]).max()))
+    return {
+        "fp32": n_ref,
+        "int8": n_cand,
+        "matched": matched,
+        "missed": n_ref - matched,
+        "extra": n_cand - matched,
+        "agreement": matched / n_ref if n_ref else None,
+        "score_dev_mean": float(np.mean(score_dev)) if score_dev else 0.0,
+        "score_dev_max": float(np.max(score_dev)) if score_dev else 0.0,
+        "iou_mean": float(np.mean(ious)) if ious else None,
+        "box_dev_px_mean": float(np.mean(box_dev)) if box_dev else 0.0,
+        "box_dev_px_max": float(np.max(box_dev)) if box_dev else 0.0,
+    }
+
+
+def compare(model_path, frames, conf=0.5, iou=0.45, match_iou=0.5):
+    """fp32 vs int8 on the same frames: latency, memory and per-class detection deviation.
+
+    Both nets stay loaded and run interleaved per frame, so the memory
+    deltas do not reuse each other's freed pages and both see the same
+    thermal state.
+    """
+    runners, memory = {}, {}
+    for precision in ("fp32", "int8"):
+        before = rss_mb()
+        runners[precision] = NCNNRunner(model_path, precision=precision)
+        runners[precision].warmup(2)
+        memory[precision] = {
+            "rss_mb": rss_mb() - before,
+            "model_mb": sum(os.path.getsize(p) for p in model_files(model_path, precision)) / 2 ** 20,
+        }
+    detections = {p: [] for p in runners}
+    times = {p: [] for p in runners}
+    for frame in frames:
+        for precision, runner in runners.items():
+            r, elapsed = run_detections(runner, frame, conf, iou)
+            detections[precision].append(r)
+            times[precision].append(elapsed)
+    latency = {p: summarize(t) for p, t in times.items()}
+    names = runners["fp32"].class_names
+    names = names if isinstance(names, dict) else dict(enumerate(names))
+    return {
+        "frames": len(frames),
+        "latency": latency,
+        "speedup": latency["fp32"]["mean_ms"] / latency["int8"]["mean_ms"],
+        "memory": memory,
+        "classes": {name: class_deviation(detections["fp32"], detections["int8"], int(c), match_iou)
+                    for c, name in sorted(names.items())},
+        "options": {p: r.options for p, r in runners.items()},
+    }
+
+
+def verdict(report, min_agreement=0.95, max_score_dev=0.05, max_box_dev=8.0):
+    """Reasons the int8 model is not safe to deploy, empty when it is."""
+    problems = []
+    for name, d in report["classes"].items():
+        if d["fp32"] == 0:
+            problems.append(f"{name}: tidak ada deteksi fp32 di set frame, deviasi tidak teruji")
+            continue
+        if d["agreement"] < min_agreement:
+            problems.append(f"{name}: hanya {100 * d['agreement']:.1f}% deteksi fp32 ditemukan int8")
+        if d["score_dev_mean"] > max_score_dev:
+            problems.append(f"{name}: deviasi skor rata-rata {d['score_dev_mean']:.3f}")
+        if d["box_dev_px_mean"] > max_box_dev:
+            problems.append(f"{name}: deviasi box rata-rata {d['box_dev_px_mean']:.1f} px")
+    return problems
+
+
+def print_report(report):
+    for p in ("fp32", "int8"):
+        lat, mem = report["latency"][p], report["memory"][p]
+        print(f"{p}: predict p50 {lat['p50_ms']:.2f} ms  p95 {lat['p95_ms']:.2f} ms  "
+              f"RSS +{mem['rss_mb']:.1f} MB  file {mem['model_mb']:.1f} MB")
+    print(f"speedup int8: {report['speedup']:.2f}x pada {report['frames']} frame")
+    for name, d in report["classes"].items():
+        agreement = "-" if d["agreement"] is None else f"{100 * d['agreement']:.1f}%"
+        iou = "-" if d["iou_mean"] is None else f"{d['iou_mean']:.3f}"
+        print(f"{name:<10} fp32 {d['fp32']:4d}  int8 {d['int8']:4d}  cocok {agreement:>6}  "
+              f"hilang {d['missed']}  tambahan {d['extra']}  skor dev {d['score_dev_mean']:.3f}/{d['score_dev_max']:.3f}  "
+              f"IoU {iou}  box dev {d['box_dev_px_mean']:.1f}/{d['box_dev_px_max']:.1f} px")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Kuantisasi int8: kalibrasi dari rekaman sendiri dan perbandingan fp32 vs int8")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("calibrate", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("--model", default="obstacle_ncnn_model")
+        p.add_argument("--clip", action="append", required=True,
+                       help="file video atau folder gambar rekaman sendiri (mis. screenshots/images), boleh berulang")
+    calib = sub.choices["calibrate"]
+    calib.add_argument("--count", type=int, default=200, help="jumlah frame kalibrasi")
+    calib.add_argument("--min-distance", type=int, default=6, help="jarak dHash minimum antar frame kalibrasi (bit)")
+    calib.add_argument("--out", default="calibration", help="folder frame kalibrasi + imagelist.txt")
+    calib.add_argument("--method", choices=("kl", "aciq", "eq"), default="kl")
+    calib.add_argument("--tools", default=None, help="folder ncnn2table/ncnn2int8 (default: PATH)")
+    comp = sub.choices["compare"]
+    comp.add_argument("--frames", type=int, default=200)
+    comp.add_argument("--conf", type=float, default=0.5)
+    comp.add_argument("--iou", type=float, default=0.45)
+    comp.add_argument("--min-agreement", type=float, default=0.95)
+    comp.add_argument("--max-score-dev", type=float, default=0.05)
+    comp.add_argument("--max-box-dev", type=float, default=8.0, help="piksel frame")
+    comp.add_argument("--report", default="quantize_report.json")
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        try:
+            frames = calibration_frames(args.clip, args.count, args.min_distance)
+        except ValueError as e:
+            print(f"Kalibrasi butuh rekaman asli: {e}")
+            sys.exit(1)
+        if not frames:
+            print("Tidak ada frame kalibrasi")
+            sys.exit(1)
+        list_path = write_calibration_set(NCNNRunner(args.model, options={}), frames, args.out)
+        print(f"{len(frames)} frame kalibrasi -> {list_path}")
+        written = calibrate(args.model, list_path, args.tools, args.method)
+        if written is None:
+            sys.exit(1)
+        print(f"Model int8 disimpan: {', '.join(written)}")
+    else:
+        if not all(os.path.exists(p) for p in model_files(args.model, "int8")):
+            print(f"Model int8 belum ada di {args.model}, jalankan dulu: python quantize.py calibrate --clip <rekaman>")
+            sys.exit(1)
+        try:
+            require_recorded(args.clip)
+        except ValueError as e:
+            print(f"Perbandingan butuh rekaman asli: {e}")
+            sys.exit(1)
+        from benchmark import load_frames
+        frames = [f for clip in args.clip for f in load_frames(clip, args.frames)]
+        if not frames:
+            print("Tidak ada frame untuk perbandingan")
+            sys.exit(1)
+        report = compare(args.model, frames, args.conf, args.iou)
+        print_report(report)
+        problems = verdict(report, args.min_agreement, args.max_score_dev, args.max_box_dev)
+        report["safe"] = not problems
+        report["problems"] = problems
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Laporan disimpan ke {args.report}")
+        for problem in problems:
+            print(f"TIDAK AMAN {problem}")
+        if problems:
+            sys.exit(1)
+        print("int8 aman dipakai")
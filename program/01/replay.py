@@ -0,0 +1,295 @@
+import csv
+import glob
+import os
+import random
+import sys
+import time
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """Base for recorded frame sources, same read()/stats() surface as CameraSource.
+
+    With paced=True frames are released at `fps`, otherwise as fast as the
+    consumer reads them.
+    """
+
+    def __init__(self, fps=30.0, paced=False):
+        self.fps = fps
+        self.paced = paced
+        self.last_frame_id = 0
+        self.last_frame_time = 0.0
+        self.delivered = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self._next_time = None
+
+    def isOpened(self):
+        return True
+
+    def _read(self):
+        raise NotImplementedError
+
+    def read(self):
+        if self.paced:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now
+            elif self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += 1.0 / self.fps
+        frame = self._read()
+        if frame is None:
+            return False, None
+        self.delivered += 1
+        self.last_frame_id += 1
+        self.last_frame_time = time.monotonic()
+        return True, frame
+
+    @property
+    def clock(self):
+        """Time of the last frame on the recording's clock."""
+        return self.last_frame_id / self.fps
+
+    def mark_decision(self, frame_time=None):
+        if frame_time is None:
+            frame_time = self.last_frame_time
+        latency = time.monotonic() - frame_time
+        self.latency_count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        return latency
+
+    def stats(self):
+        return {
+            "grabbed": self.delivered,
+            "delivered": self.delivered,
+            "dropped": 0,
+            "latency_avg_ms": 1000 * self.latency_sum / self.latency_count if self.latency_count else 0.0,
+            "latency_max_ms": 1000 * self.latency_max,
+        }
+
+    def release(self):
+        pass
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path, paced=False, loop=False):
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(self.cap.get(cv2.CAP_PROP_FPS) or 30.0, paced)
+        self.path = path
+        self.loop = loop
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource(FrameSource):
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path, fps=30.0, paced=False, loop=False):
+        super().__init__(fps, paced)
+        self.files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(self.EXTENSIONS))
+        self.loop = loop
+        self.index = 0
+
+    def isOpened(self):
+        return len(self.files) > 0
+
+    def _read(self):
+        while self.index < len(self.files) or (self.loop and self.files):
+            if self.index >= len(self.files):
+                self.index = 0
+            path = self.files[self.index]
+            self.index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return frame
+            print(f"Gagal membaca gambar: {path}")
+        return None
+
+
+class SyntheticSource(FrameSource):
+    """Seeded generator: noisy water-coloured background with moving boxes."""
+
+    def __init__(self, num_frames=300, width=640, height=480, num_objects=2, fps=30.0, paced=False, seed=0):
+        super().__init__(fps, paced)
+        self.num_frames = num_frames
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.pos = self.rng.uniform((0, 0), (width - 80, height - 80), (num_objects, 2))
+        self.vel = self.rng.uniform(-6, 6, (num_objects, 2))
+        self.count = 0
+
+    def _read(self):
+        if self.count >= self.num_frames:
+            return None
+        self.count += 1
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[:] = (90, 70, 20)
+        noise = self.rng.integers(0, 25, (self.height, self.width, 1), dtype=np.uint8)
+        frame += noise
+        self.pos += self.vel
+        limit = np.array([self.width - 80, self.height - 80])
+        bounce = (self.pos < 0) | (self.pos > limit)
+        self.vel[bounce] *= -1
+        self.pos = np.clip(self.pos, 0, limit)
+        for i, (x, y) in enumerate(self.pos.astype(int)):
+            color = (0, 140, 255) if i % 2 == 0 else (0, 0, 200)
+            cv2.rectangle(frame, (x, y), (x + 80, y + 80), color, 4 if i % 2 == 0 else -1)
+        return frame
+
+
+def open_source(spec, paced=False, seed=0):
+    """video file, image directory or 'synthetic[:N]'"""
+    if spec.startswith("synthetic"):
+        n = int(spec.split(":")[1]) if ":" in spec else 300
+        return SyntheticSource(num_frames=n, paced=paced, seed=seed)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, paced=paced)
+    return VideoFileSource(spec, paced=paced)
+
+
+class SimulatedChannel:
+    def __init__(self, pwm, index):
+        self._pwm = pwm
+        self.index = index
+        self._duty_cycle = 0
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        self._duty_cycle = value
+        self._pwm.trace.append((self._pwm.frame_id, time.monotonic() - self._pwm.start_time, self.index, value))
+
+
+class SimulatedPCA9685:
+    """Stand-in for adafruit_pca9685.PCA9685 that records every duty_cycle write.
+
+    trace rows are (frame_id, t, channel, duty_cycle); frame_id is whatever
+    the caller last assigned to .frame_id.
+    """
+
+    def __init__(self, num_channels=16):
+        self.channels = [SimulatedChannel(self, i) for i in range(num_channels)]
+        self.frequency = 50
+        self.frame_id = 0
+        self.start_time = time.monotonic()
+        self.trace = []
+
+    def save_trace(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame_id", "t", "channel", "duty_cycle"])
+            for frame_id, t, channel, value in self.trace:
+                writer.writerow([frame_id, f"{t:.6f}", channel, value])
+
+
+def run_replay(robot, max_frames=None):
+    """Run detection + decision on every frame of robot.cap, in order, on this thread.
+
+    The control scheduler is ticked by hand on the recording's clock
+    (frame_id / fps, the latest stream's clock with several sources), so
+    maneuvers span the same frames on every run.
+    """
+    pwm = robot.motor_control.pwm
+    frames = 0
+    next_tick = 0.0
+    start = time.perf_counter()
+    while max_frames is None or frames < max_frames:
+        item = robot.read_frame()
+        if item is None:
+            break
+        if isinstance(pwm, SimulatedPCA9685):
+            pwm.frame_id = item["frame_id"]
+        if robot.adaptive is not None or robot.roi is not None:
+            robot.decide(robot.perceive(item))
+        else:
+            robot.decide(robot.infer(robot.preprocess(item)))
+        # every control tick that falls before this frame's time on the recording clock
+        t = robot.cap.clock
+        while next_tick <= t:
+            robot.scheduler.tick(next_tick)
+            next_tick += robot.scheduler.period
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return frames, elapsed
+
+
+if __name__ == '__main__':
+    import argparse
+    import ratelog
+    ratelog.setup()
+    from main import RobotControl
+    from motor_control import MotorControl
+    from multi_camera import CameraStream, MultiCamera, parse_stream_spec
+
+    parser = argparse.ArgumentParser(description="Jalankan loop deteksi + keputusan tanpa hardware")
+    parser.add_argument("source", nargs="+", metavar="SUMBER[@PRIORITAS[/FPS]]",
+                        help="file video, folder gambar, atau synthetic[:N]; beberapa sumber = beberapa kamera")
+    parser.add_argument("--model", default="obstacle_ncnn_model", help="folder model, atau beberapa dipisah koma")
+    parser.add_argument("--target-latency", type=float, default=0.1, help="batas waktu inferensi (s) untuk pemilihan varian")
+    parser.add_argument("--paced", action="store_true", help="ikuti FPS rekaman")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--trace", default="motor_trace.csv")
+    parser.add_argument("--adaptive", action="store_true", help="deteksi tiap N frame + optical flow")
+    parser.add_argument("--roi", action="store_true", help="inferensi pada crop di sekitar objek yang dilacak")
+    parser.add_argument("--capture", action="store_true", help="simpan contoh sulit + label YOLO ke screenshots/")
+    parser.add_argument("--record", default=None, help="file flight recorder (mis. replay.rec)")
+    parser.add_argument("--precision", choices=("fp32", "int8"), default="fp32")
+    parser.add_argument("--profile", default=None, metavar="TRACE",
+                        help="aktifkan profiler, cetak p50/p99 per tahap dan simpan Chrome trace ke TRACE")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    streams = []
+    for i, spec in enumerate(args.source):
+        path, priority, max_fps = parse_stream_spec(spec)
+        stream_source = open_source(str(path), paced=args.paced, seed=args.seed + i)
+        if not stream_source.isOpened():
+            print(f"Sumber tidak dapat dibuka: {path}")
+            sys.exit(1)
+        streams.append(CameraStream(f"cam{i}", stream_source, priority, max_fps))
+    # a single source only needs MultiCamera for its fps cap, priority has nothing to share
+    source = MultiCamera(streams) if len(streams) > 1 or streams[0].max_fps else streams[0].source
+    pwm = SimulatedPCA9685()
+    model = args.model.split(",") if "," in args.model else args.model
+    robot = RobotControl(model, camera_source=source, motor_control=MotorControl(pwm), seed=args.seed,
+                         adaptive=args.adaptive, roi=args.roi, target_latency=args.target_latency,
+                         arm_delay=0, capture=args.capture, record=args.record,
+                         precision=args.precision)
+    if args.profile:
+        from profiler import PROFILER
+        PROFILER.enable(trace=True)
+    frames, elapsed = run_replay(robot, args.max_frames)
+    source.release()
+    robot.capture.close()
+    if robot.recorder is not None:
+        robot.recorder.close()
+    if args.capture:
+        print(f"Statistik capture: {robot.capture.stats()}")
+    if isinstance(source, MultiCamera):
+        print(f"Statistik kamera: {source.stats()}")
+    if args.profile:
+        print("Profil per tahap:\n  " + "\n  ".join(PROFILER.format_lines()))
+        print(f"{PROFILER.dump_chrome_trace(args.profile)} span -> {args.profile}")
+    pwm.save_trace(args.trace)
+    print(f"{frames} frame dalam {elapsed:.2f} s ({frames / max(elapsed, 1e-9):.1f} FPS), "
+          f"{len(pwm.trace)} penulisan PWM -> {args.trace}")
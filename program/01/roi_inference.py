@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+
+
+class RoiDetector:
+    """Runs the detector on a crop around the predicted track positions.
+
+    The crop is the union of all predicted boxes grown by `margin` (relative
+    to box size), letterboxed to roi_size instead of the full model input.
+    A full-frame pass still runs every full_every frames, when there is
+    nothing to track, or when the crop would cover most of the frame, so
+    new objects are still found.
+
+    The tracks come from the decide stage on another thread: set_tracks()
+    stores a copy under a lock and process() predicts that copy forward to
+    the frame time, which also covers the frames decide is behind.
+    """
+
+    def __init__(self, detector, confidence_thres=0.8, iou_thres=0.45, roi_size=320, margin=0.5,
+                 full_every=10, max_area_fraction=0.6):
+        self.detector = detector
+        self.confidence_thres = confidence_thres
+        self.iou_thres = iou_thres
+        self.roi_size = (roi_size, roi_size)
+        self.margin = margin
+        self.full_every = full_every
+        self.max_area_fraction = max_area_fraction
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._tracks = np.zeros((0, 7), dtype=np.float64)  # x, y, w, h, vx, vy, last_time
+        self.frames = 0
+        self.full_passes = 0
+        self.roi_passes = 0
+        self.last_rect = None
+
+    def roi_rect(self, boxes, frame_shape):
+        """(x0, y0, x1, y1) around (n, 4) ltwh boxes, or None if a full pass is better."""
+        if len(boxes) == 0:
+            return None
+        h, w = frame_shape[:2]
+        grow = boxes[:, 2:] * self.margin
+        x0, y0 = np.min(boxes[:, :2] - grow, axis=0)
+        x1, y1 = np.max(boxes[:, :2] + boxes[:, 2:] + grow, axis=0)
+        x0, y0 = int(max(x0, 0)), int(max(y0, 0))
+        x1, y1 = int(min(x1, w)), int(min(y1, h))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        if (x1 - x0) * (y1 - y0) > self.max_area_fraction * w * h:
+            return None
+        return x0, y0, x1, y1
+
+    def set_tracks(self, tracks):
+        """Snapshot of tracker tracks, called by whoever updates the tracker."""
+        snapshot = np.array([[*tr.box, *tr.velocity, tr.last_time] for tr in tracks], dtype=np.float64).reshape(-1, 7)
+        with self._lock:
+            self._tracks = snapshot
+
+    def process(self, frame, t):
+        """Detections for frame given the last track snapshot (predicted to time t)."""
+        self.frames += 1
+        with self._lock:
+            tracks = self._tracks
+        rect = None
+        if len(tracks) and self.frames % self.full_every != 0:
+            predicted = tracks[:, :4].copy()
+            predicted[:, :2] += tracks[:, 4:6] * (t - tracks[:, 6:7])
+            rect = self.roi_rect(predicted, frame.shape)
+        self.last_rect = rect
+        if rect is None:
+            self.full_passes += 1
+            y = self.detector.predict(self.detector.preprocess(frame))
+            return self.detector.postprocess(frame, y, self.confidence_thres, self.iou_thres)
+        self.roi_passes += 1
+        return self.detector.detect_crop(frame, rect, self.roi_size, self.confidence_thres, self.iou_thres, self._cache)
+
+    def stats(self):
+        return {"frames": self.frames, "full": self.full_passes, "roi": self.roi_passes}
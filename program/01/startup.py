@@ -0,0 +1,34 @@
+import threading
+import time
+
+
+class StartupTimer:
+    """Start/end of each startup phase, relative to t0 (process start if given)."""
+
+    def __init__(self, t0=None):
+        self.t0 = time.monotonic() if t0 is None else t0
+        self.phases = {}  # name -> (start, end) seconds since t0
+        self._lock = threading.Lock()
+
+    def timed(self, name, fn, *args, **kwargs):
+        """Call fn and record how long it took under name, safe from several threads."""
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                self.phases[name] = (start - self.t0, end - self.t0)
+
+    def mark(self, name, since=None):
+        """Record an instant, or the span from `since` (seconds after t0) until now."""
+        now = time.monotonic() - self.t0
+        with self._lock:
+            self.phases[name] = (now if since is None else since, now)
+        return now
+
+    def format(self):
+        rows = sorted(self.phases.items(), key=lambda kv: kv[1])
+        width = max((len(name) for name in self.phases), default=0)
+        return "\n".join(f"  {name:<{width}}  {1000 * s:8.1f} -> {1000 * e:8.1f} ms  ({1000 * (e - s):.1f} ms)"
+                         for name, (s, e) in rows)
@@ -0,0 +1,345 @@
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2
+from frame_bus import draw_detections, fit_size
+from profiler import PROFILER
+
+BOUNDARY = "polrovframe"
+
+INDEX_HTML = """<!doctype html>
+<html><head><title>POLROV</title></head>
+<body style="margin:0;background:#000">
+<img src="/stream.mjpg" style="max-width:100%">
+<pre id="det" style="color:#0f0"></pre>
+<script>
+setInterval(() => fetch("/detections.json").then(r => r.json())
+  .then(d => document.getElementById("det").textContent = JSON.stringify(d, null, 1)), 500);
+</script>
+</body></html>
+"""
+
+
+class EncodedFrame:
+    """Annotated, downscaled frame plus its metadata; JPEG bytes are cached per quality.
+
+    Every client asking for the same quality shares one encode.
+    """
+
+    def __init__(self, seq, image, meta):
+        self.seq = seq
+        self.image = image
+        self.meta = meta
+        self.meta_json = json.dumps(meta)
+        self._jpeg = {}
+        self._lock = threading.Lock()
+
+    def jpeg(self, quality):
+        with self._lock:
+            data = self._jpeg.get(quality)
+            if data is None:
+                ok, buf = cv2.imencode(".jpg", self.image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                data = buf.tobytes()
+                self._jpeg[quality] = data
+            return data
+
+
+class StreamClient:
+    """Per-client rate/quality controller, driven by how long each frame takes to send.
+
+    A send that blocks for more than half the frame interval means the
+    socket buffer is full (tether or client too slow): quality steps down
+    first, then frame rate. A long run of fast sends steps back up.
+    """
+
+    def __init__(self, address, qualities, max_fps, min_fps=1.0, quality_index=0, max_kbps=None):
+        self.address = address
+        self.qualities = qualities
+        self.quality_index = min(quality_index, len(qualities) - 1)
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.fps = max_fps
+        self.max_kbps = max_kbps
+        self.interval = 1.0 / max_fps
+        self.sent = 0
+        self.bytes_sent = 0
+        self.send_time = 0.0  # EMA, seconds
+        self._slow = 0
+        self._fast = 0
+
+    @property
+    def quality(self):
+        return self.qualities[self.quality_index]
+
+    def update(self, send_time, size):
+        self.sent += 1
+        self.bytes_sent += size
+        self.send_time = 0.8 * self.send_time + 0.2 * send_time if self.sent > 1 else send_time
+        budget = 0.5 / self.fps
+        if send_time > budget:
+            self._slow += 1
+            self._fast = 0
+            if self._slow >= 2:
+                self._slow = 0
+                if self.quality_index + 1 < len(self.qualities):
+                    self.quality_index += 1
+                else:
+                    self.fps = max(self.fps * 0.75, self.min_fps)
+        elif send_time < 0.25 * budget:
+            self._slow = 0
+            self._fast += 1
+            if self._fast >= 30:
+                self._fast = 0
+                if self.fps < self.max_fps:
+                    self.fps = min(self.fps * 1.25, self.max_fps)
+                elif self.quality_index > 0:
+                    self.quality_index -= 1
+        self.interval = 1.0 / self.fps
+        if self.max_kbps:
+            # hard bandwidth cap on top of the adaptive rate
+            self.interval = max(self.interval, size * 8 / (self.max_kbps * 1000))
+
+    def stats(self):
+        return {
+            "address": self.address,
+            "fps": round(self.fps, 2),
+            "quality": self.quality,
+            "sent": self.sent,
+            "kbytes_sent": self.bytes_sent // 1024,
+            "send_ms": 1000 * self.send_time,
+        }
+
+
+class StreamServer:
+    """HTTP server publishing annotated frames from a FrameBus.
+
+    Endpoints: / (viewer page), /stream.mjpg (multipart MJPEG, detections of
+    each frame in an X-Detections part header), /snapshot.jpg,
+    /detections.json, /stats.json, /profile.json (per-stage p50/p99; a
+    POST with enable=1/0 switches the profiler, GET never changes state)
+    and /trace.json (Chrome trace).
+    /stream.mjpg accepts fps, quality and kbps query parameters as the
+    starting point for the client, clamped to what the server allows.
+
+    There is no authentication, so the default host is 127.0.0.1; bind
+    0.0.0.0 only on a trusted link (the tether).
+
+    Annotation, resize and the first JPEG encode run on one subscriber
+    thread, each client is served by its own handler thread, so nothing
+    here runs on the control loop.
+    """
+
+    def __init__(self, frame_bus, class_names, host="127.0.0.1", port=8080, max_fps=15, max_size=(640, 480),
+                 qualities=(80, 60, 40, 25)):
+        self.frame_bus = frame_bus
+        self.class_names = class_names
+        self.host = host
+        self.port = port
+        self.max_fps = max_fps
+        self.max_size = max_size
+        self.qualities = tuple(qualities)
+        self.encoded = 0
+        self.clients = []
+        self._cond = threading.Condition()
+        self._frame = None
+        self._stopped = False
+        self._httpd = None
+        self._thread = None
+        self._subscriber = None
+
+    def _encode(self, item):
+        frame = item["frame"]
+        size = fit_size(frame.shape, self.max_size)
+        image = cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if size != frame.shape[1::-1] else frame.copy()
+        boxes, scores, class_ids = item["result"]
+        draw_detections(image, item["result"], self.class_names, size[0] / frame.shape[1])
+        meta = {
+            "frame_id": item.get("frame_id"),
+            "frame_time": item.get("frame_time"),
+            "variant": item.get("variant"),
+            "detections": [
+                {"class": self.class_names[int(c)], "score": round(float(s), 4), "box": [round(float(v), 1) for v in b]}
+                for b, s, c in zip(boxes, scores, class_ids)
+            ],
+        }
+        encoded = EncodedFrame(self.encoded + 1, image, meta)
+        # encode every quality a client currently uses, client threads then only copy bytes
+        with self._cond:
+            qualities = {c.quality for c in self.clients} or {self.qualities[0]}
+        for q in qualities:
+            encoded.jpeg(q)
+        with self._cond:
+            self._frame = encoded
+            self.encoded += 1
+            self._cond.notify_all()
+        return encoded
+
+    def wait_frame(self, after_seq, timeout=1.0):
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopped or (self._frame is not None and self._frame.seq > after_seq),
+                                timeout)
+            if self._frame is None or self._frame.seq <= after_seq:
+                return None
+            return self._frame
+
+    @property
+    def latest(self):
+        return self._frame
+
+    def start(self):
+        self._subscriber = self.frame_bus.subscribe(self._encode, max_fps=self.max_fps)
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]  # port=0 picks a free one
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stream-server", daemon=True)
+        self._thread.start()
+        print(f"Streaming di http://{self.host}:{self.port}/")
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        if self._subscriber is not None:
+            self._subscriber.close()
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def add_client(self, client):
+        with self._cond:
+            self.clients.append(client)
+
+    def remove_client(self, client):
+        with self._cond:
+            self.clients.remove(client)
+
+    def stats(self):
+        with self._cond:
+            clients = [c.stats() for c in self.clients]
+        return {"encoded": self.encoded, "clients": clients}
+
+
+def _query_number(query, name, default, lo, hi):
+    """Numeric query parameter clamped to [lo, hi]; ValueError if it is not a finite number."""
+    if name not in query:
+        return default
+    value = float(query[name][0])
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be finite")
+    return min(max(value, lo), hi)
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/":
+                self._send(INDEX_HTML.encode(), "text/html; charset=utf-8")
+            elif url.path == "/stream.mjpg":
+                self._stream(parse_qs(url.query))
+            elif url.path == "/snapshot.jpg":
+                frame = server.latest
+                if frame is None:
+                    self._send(b"no frame yet", "text/plain", 503)
+                else:
+                    self._send(frame.jpeg(server.qualities[0]), "image/jpeg")
+            elif url.path == "/detections.json":
+                frame = server.latest
+                self._send((frame.meta_json if frame is not None else "null").encode(), "application/json")
+            elif url.path == "/profile.json":
+                self._send_profile()
+            elif url.path == "/trace.json":
+                self._send(json.dumps(PROFILER.chrome_trace()).encode(), "application/json")
+            elif url.path == "/stats.json":
+                self._send(json.dumps(server.stats()).encode(), "application/json")
+            else:
+                self._send(b"not found", "text/plain", 404)
+
+        def do_POST(self):
+            # state changes only on POST: a prefetch or crawler following a link must not toggle the profiler
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("latin-1")) if length else {}
+            if url.path != "/profile.json":
+                self._send(b"not found", "text/plain", 404)
+                return
+            query = {**parse_qs(url.query), **form}
+            if "enable" in query:
+                if query["enable"][0] == "1":
+                    PROFILER.enable(trace=query.get("trace", ["0"])[0] == "1")
+                else:
+                    PROFILER.disable()
+            self._send_profile()
+
+        def _send_profile(self):
+            body = {"enabled": PROFILER.enabled, "tracing": PROFILER.tracing, "stages": PROFILER.summary()}
+            self._send(json.dumps(body).encode(), "application/json")
+
+        def _stream(self, query):
+            try:
+                fps = _query_number(query, "fps", server.max_fps, 1.0, server.max_fps)
+                quality = _query_number(query, "quality", server.qualities[0], 1, 100)
+                kbps = _query_number(query, "kbps", None, 8.0, math.inf)
+            except ValueError as e:
+                self._send(f"bad query: {e}".encode(), "text/plain", 400)
+                return
+            # nearest tier at or below the requested quality
+            index = next((i for i, q in enumerate(server.qualities) if q <= quality), len(server.qualities) - 1)
+            client = StreamClient(f"{self.client_address[0]}:{self.client_address[1]}", server.qualities, fps,
+                                  quality_index=index, max_kbps=kbps)
+            self.connection.settimeout(5.0)  # a dead client must not hold its thread forever
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            server.add_client(client)
+            seq = 0
+            next_time = time.monotonic()
+            try:
+                while not server.stopped:
+                    now = time.monotonic()
+                    if now < next_time:
+                        time.sleep(next_time - now)
+                    frame = server.wait_frame(seq)
+                    if frame is None:
+                        continue
+                    seq = frame.seq
+                    data = frame.jpeg(client.quality)
+                    t0 = time.monotonic()
+                    self.wfile.write(
+                        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                        f"X-Frame-Id: {frame.meta['frame_id']}\r\nX-Detections: {frame.meta_json}\r\n\r\n".encode())
+                    self.wfile.write(data)
+                    self.wfile.write(b"\r\n")
+                    self.wfile.flush()
+                    client.update(time.monotonic() - t0, len(data))
+                    next_time = t0 + client.interval
+            except (BrokenPipeError, ConnectionResetError, TimeoutError, OSError):
+                pass
+            finally:
+                server.remove_client(client)
+
+    return Handler
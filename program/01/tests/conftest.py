@@ -0,0 +1,28 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# the program modules are plain scripts imported by bare name, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1x1 convolution 3 -> 6 channels on a 640x640 input, reshaped to a (6, 400) YOLO-like head:
+# 4 box rows + Gate/Cylinder scores; enough to run the whole NCNNRunner path without the real export
+TINY_PARAM = """7767517
+3 3
+Input            in0      0 1 in0
+Convolution      conv     1 1 in0 c0 0=6 1=1 3=32 5=1 6=18
+Reshape          out0     1 1 c0 out0 0=400 1=6
+"""
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    rng = np.random.default_rng(0)
+    (tmp_path / "model.ncnn.param").write_text(TINY_PARAM)
+    weights = np.concatenate([np.zeros(1, np.uint32).view(np.float32),  # fp32 weight tag
+                              rng.uniform(-1, 1, 18).astype(np.float32),
+                              rng.uniform(0, 1, 6).astype(np.float32)])
+    (tmp_path / "model.ncnn.bin").write_bytes(weights.tobytes())
+    (tmp_path / "metadata.yaml").write_text("imgsz:\n- 640\n- 640\nnames:\n  0: Gate\n  1: Cylinder\n")
+    return str(tmp_path)
@@ -0,0 +1,33 @@
+import numpy as np
+from adaptive_inference import AdaptiveDetector
+
+
+class StaticDetector:
+    """Detector stub: one confident box on every call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def preprocess(self, frame):
+        return frame
+
+    def predict(self, x):
+        self.calls += 1
+        return x
+
+    def postprocess(self, frame, y, confidence_thres, iou_thres):
+        return (np.array([[200.0, 150.0, 120.0, 120.0]], dtype=np.float32),
+                np.array([0.9], dtype=np.float32), np.array([0], dtype=np.int32))
+
+
+def test_tracked_scores_do_not_compound():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    detector = StaticDetector()
+    adaptive = AdaptiveDetector(detector, min_interval=20, max_interval=20, latency_budget=10.0, min_quality=0.0)
+    adaptive.process(frame)
+    scores = [adaptive.process(frame)[1][0] for _ in range(10)]
+    assert detector.calls == 1  # every later frame came from the tracker
+    # the same static frame tracks equally well every time, so the score stays put
+    np.testing.assert_allclose(scores, scores[0])
+    assert scores[0] > 0.8
@@ -0,0 +1,38 @@
+from benchmark import compare
+
+
+def report(**results):
+    return {"results": results}
+
+
+def stage(frames=1000, mean_ms=10.0, p99_ms=20.0, fps=100.0, peak_rss_mb=100.0):
+    return {"frames": frames, "mean_ms": mean_ms, "p99_ms": p99_ms, "fps": fps, "peak_rss_mb": peak_rss_mb}
+
+
+def test_regressions_beyond_threshold_in_the_worse_direction():
+    base = report(predict=stage())
+    assert compare(report(predict=stage(mean_ms=10.9, fps=92.0)), base, 0.10) == []
+    found = {key: change for _, key, _, _, change in
+             compare(report(predict=stage(mean_ms=12.0, fps=80.0)), base, 0.10)}
+    assert set(found) == {"mean_ms", "fps"}
+    assert found["fps"] < 0 and found["mean_ms"] > 0
+    # faster is never a regression
+    assert compare(report(predict=stage(mean_ms=5.0, p99_ms=8.0, fps=200.0)), base, 0.10) == []
+
+
+def test_peak_rss_is_not_gated():
+    base = report(predict=stage(), decision_loop={"frames": 100, "sustained_fps": 30.0, "peak_rss_mb": 95.0})
+    current = report(predict=stage(peak_rss_mb=144.0),
+                     decision_loop={"frames": 100, "sustained_fps": 30.0, "peak_rss_mb": 144.0})
+    assert compare(current, base, 0.10) == []
+
+
+def test_p99_needs_enough_frames():
+    base = report(predict=stage(frames=20))
+    assert compare(report(predict=stage(frames=20, p99_ms=40.0)), base, 0.10) == []
+    base = report(predict=stage(frames=1000))
+    assert [key for _, key, _, _, _ in compare(report(predict=stage(p99_ms=40.0)), base, 0.10)] == ["p99_ms"]
+
+
+def test_benchmarks_missing_from_the_baseline_are_skipped():
+    assert compare(report(new_stage=stage(mean_ms=99.0)), report(predict=stage()), 0.10) == []
@@ -0,0 +1,96 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from camera_source import CameraSource
+
+
+@pytest.fixture
+def clip(tmp_path):
+    """30 frames at 30 fps; frame i is filled with 8 * i, so the content tells the index."""
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), 8 * i, np.uint8))
+    writer.release()
+    return path
+
+
+def index_of(frame):
+    return int(round(float(frame.mean()) / 8))
+
+
+def read_all(cam, delay=0.0):
+    seen = []
+    while True:
+        ret, frame = cam.read(timeout=2.0)
+        if not ret:
+            return seen
+        seen.append((cam.last_frame_id, cam.last_frame_time, index_of(frame)))
+        time.sleep(delay)
+
+
+def test_file_is_read_to_the_end(clip):
+    cam = CameraSource(clip, realtime=False).start()
+    assert cam.isOpened() and cam.fps == pytest.approx(30.0)
+    seen = read_all(cam)
+    cam.release()
+    ids = [i for i, _, _ in seen]
+    assert ids == sorted(set(ids))
+    # the frame handed out is the one grabbed under that id
+    assert all(index == i - 1 for i, _, index in seen)
+    assert cam.grabbed == 30 and cam.delivered + cam.dropped == 30
+    assert cam.ended
+
+
+def test_slow_reader_gets_the_newest_frame(clip):
+    cam = CameraSource(clip).start()  # paced at the file's 30 fps like a live camera
+    seen = read_all(cam, delay=0.1)
+    cam.release()
+    assert cam.dropped > 0 and cam.delivered == len(seen) < 30
+    times = [t for _, t, _ in seen]
+    assert times == sorted(times)
+    assert all(index == i - 1 for i, _, index in seen)
+    assert cam.stats()["dropped"] == cam.dropped
+
+
+class StallingCapture:
+    """VideoCapture stand-in: one frame, a stall longer than the read timeout, one more frame, end."""
+
+    def __init__(self, *args):
+        self.reads = 0
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 30.0
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        self.reads += 1
+        if self.reads == 2:
+            time.sleep(0.5)
+        if self.reads > 2:
+            return False, None
+        return True, np.full((48, 64, 3), self.reads, np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_stall_is_a_timeout_not_the_end(monkeypatch):
+    monkeypatch.setattr(cv2, "VideoCapture", StallingCapture)
+    cam = CameraSource(0, realtime=False).start()
+    ret, frame = cam.read(timeout=1.0)
+    assert ret and frame[0, 0, 0] == 1
+    # the grabber is stuck longer than the timeout: the read fails, but the stream has not ended
+    ret, frame = cam.read(timeout=0.1)
+    assert not ret and not cam.ended
+    ret, frame = cam.read(timeout=1.0)
+    assert ret and frame[0, 0, 0] == 2
+    ret, frame = cam.read(timeout=1.0)
+    assert not ret and cam.ended
+    cam.release()
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from capture_writer import CaptureWriter, yolo_labels
+
+
+def hard_example(i):
+    frame = np.full((48, 64, 3), i, np.uint8)
+    result = (np.array([[1.0, 2.0, 10.0, 10.0]], np.float32), np.array([0.7], np.float32), np.array([0], np.int32))
+    return frame, result
+
+
+def test_close_does_not_hang_when_the_workers_are_stuck(tmp_path):
+    writer = CaptureWriter(str(tmp_path), num_workers=1, queue_size=2, min_interval=0.0)
+    release = threading.Event()
+    writer._save = lambda *job: release.wait(10.0)  # a disk that stopped answering
+    for i in range(4):
+        writer.offer(*hard_example(i))
+    t0 = time.monotonic()
+    writer.close(timeout=0.3)
+    assert time.monotonic() - t0 < 1.0
+    assert writer.dropped >= 2
+    release.set()
+
+
+def textured(seed):
+    return np.random.default_rng(seed).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+
+
+def offer_all(writer, frames):
+    result = hard_example(0)[1]
+    for i, frame in enumerate(frames):
+        assert writer.offer(frame, result, frame_id=i)
+    writer.close()
+
+
+def test_yolo_labels_are_normalized_and_clipped_to_the_frame():
+    boxes = np.array([[16, 12, 32, 24], [-10, -5, 30, 25], [60, 40, 20, 20], [100, 10, 5, 5]], np.float32)
+    lines = yolo_labels((boxes, np.ones(4, np.float32), np.array([1, 0, 1, 0])), 64, 48)
+    assert len(lines) == 3  # the box entirely outside is left out
+    values = [[float(v) for v in line.split()] for line in lines]
+    assert values[0] == pytest.approx([1, 0.5, 0.5, 0.5, 0.5], abs=1e-6)
+    assert values[1] == pytest.approx([0, 10 / 64, 10 / 48, 20 / 64, 20 / 48], abs=1e-6)
+    assert values[2] == pytest.approx([1, 62 / 64, 44 / 48, 4 / 64, 8 / 48], abs=1e-6)
+    assert all(0.0 <= v <= 1.0 for line in values for v in line[1:])
+
+
+def test_near_duplicates_are_not_saved(tmp_path):
+    writer = CaptureWriter(str(tmp_path), num_workers=1, min_interval=0.0)
+    frame = textured(0)
+    nudged = np.clip(frame.astype(np.int16) + 2, 0, 255).astype(np.uint8)  # same view, slightly brighter
+    offer_all(writer, [frame, nudged, textured(1)])
+    assert writer.saved == 2 and writer.duplicates == 1
+    assert len(os.listdir(tmp_path / "images")) == len(os.listdir(tmp_path / "labels")) == 2
+
+
+def test_disk_cap_evicts_the_oldest_samples(tmp_path):
+    probe = CaptureWriter(str(tmp_path / "probe"), num_workers=1, min_interval=0.0)
+    offer_all(probe, [textured(0)])
+    sample = probe.disk_bytes
+    writer = CaptureWriter(str(tmp_path / "cap"), num_workers=1, min_interval=0.0, max_bytes=int(2.5 * sample))
+    offer_all(writer, [textured(i) for i in range(5)])
+    assert writer.saved == 5 and writer.deleted == 3
+    assert writer.disk_bytes <= writer.max_bytes
+    kept = sorted(os.listdir(tmp_path / "cap" / "images"))
+    assert [name.rsplit("_", 1)[1] for name in kept] == ["3.jpg", "4.jpg"]
+    assert sorted(os.listdir(tmp_path / "cap" / "labels")) == [n[:-4] + ".txt" for n in kept]
+    # a later run counts what is already on disk against the cap
+    again = CaptureWriter(str(tmp_path / "cap"), num_workers=1, min_interval=0.0, max_bytes=int(2.5 * sample))
+    assert again.disk_bytes == writer.disk_bytes
+    again.close()
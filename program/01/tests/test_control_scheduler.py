@@ -0,0 +1,22 @@
+from control_scheduler import ControlScheduler, confidence_policy
+from motor_control import MotorControl
+from replay import SimulatedPCA9685
+
+
+def test_dodge_runs_to_the_end_on_scheduler_ticks():
+    mc = MotorControl(SimulatedPCA9685())
+    mc.stop_all_motors()
+    stopped = [mc.pwm.channels[ch].duty_cycle for ch in mc.MOTOR_CHANNELS.values()]
+    scheduler = ControlScheduler(mc, confidence_policy(mc, 0.8, 0.8, dodge_time=0.1))
+    scheduler.set_decision({"cylinder": 0.9})
+    scheduler.tick(0.0)
+    assert scheduler.maneuver is not None and scheduler.maneuver.step == "menghindar"
+    assert [mc.pwm.channels[ch].duty_cycle for ch in mc.MOTOR_CHANNELS.values()] != stopped
+    # perception sees nothing anymore, the ticks alone finish the dodge
+    scheduler.set_decision({})
+    for i in range(1, 10):
+        scheduler.tick(0.02 * i)
+    assert scheduler.maneuver is None and scheduler.maneuvers == 1
+    # sideways thrusters are off again, forward/down (the no-object command) does not use them
+    sideways = [mc.MOTOR_CHANNELS["motor_1"], mc.MOTOR_CHANNELS["motor_2"]]
+    assert [mc.pwm.channels[ch].duty_cycle for ch in sideways] == [stopped[0]] * 2
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+import pytest
+from evaluate import IOU_THRESHOLDS, Accumulator, average_precision, evaluate, find_samples, match
+
+GT = np.array([[100, 100, 200, 200]], np.float32)
+
+
+def evaluated(det_boxes, det_scores, det_cls=None, gt_boxes=GT, gt_cls=None):
+    det_boxes = np.array(det_boxes, np.float32).reshape(-1, 4)
+    det_scores = np.array(det_scores, np.float32)
+    det_cls = np.zeros(len(det_scores), np.int32) if det_cls is None else np.array(det_cls, np.int32)
+    gt_cls = np.zeros(len(gt_boxes), np.int32) if gt_cls is None else np.array(gt_cls, np.int32)
+    tp = match(det_boxes, det_scores, det_cls, gt_boxes, gt_cls)
+    acc = Accumulator(2)
+    acc.add((det_cls, det_scores, tp, gt_cls, (0.0, 0.0, 0.0)))
+    return tp, acc
+
+
+def test_perfect_detection_scores_one():
+    _, acc = evaluated([[100, 100, 200, 200]], [0.9])
+    m = acc.class_metrics(0, 0.5)
+    assert m["mAP50"] == pytest.approx(1.0) and m["mAP50-95"] == pytest.approx(1.0)
+    assert m["precision"] == pytest.approx(1.0) and m["recall"] == pytest.approx(1.0)
+
+
+def test_higher_scored_false_positive_halves_the_precision():
+    _, acc = evaluated([[400, 400, 450, 450], [100, 100, 200, 200]], [0.9, 0.8])
+    m = acc.class_metrics(0, 0.5)
+    assert m["mAP50"] == pytest.approx(0.5) and m["mAP50-95"] == pytest.approx(0.5)
+    assert m["recall"] == pytest.approx(1.0)
+
+
+def test_greedy_matching_per_iou_threshold():
+    # IoU 0.82 with the ground truth: the higher score takes it up to that threshold, the exact duplicate is a FP there
+    tp, _ = evaluated([[100, 100, 182, 200], [100, 100, 200, 200]], [0.9, 0.5])
+    assert tp[0].tolist() == (IOU_THRESHOLDS <= 0.82).tolist()
+    # where the better-scored box is too loose the second one takes the ground truth
+    assert tp[1].tolist() == (IOU_THRESHOLDS > 0.82).tolist()
+    # a detection never matches a ground truth of another class
+    tp, _ = evaluated([[100, 100, 200, 200]], [0.9], det_cls=[1])
+    assert not tp.any()
+
+
+def test_missed_ground_truth_caps_the_recall():
+    gt = np.array([[100, 100, 200, 200], [300, 300, 400, 400]], np.float32)
+    _, acc = evaluated([[100, 100, 200, 200]], [0.9], gt_boxes=gt)
+    m = acc.class_metrics(0, 0.5)
+    assert m["instances"] == 2 and m["recall"] == pytest.approx(0.5)
+    assert m["mAP50"] == pytest.approx(51 / 101)  # recall levels 0 .. 0.5 at precision 1, the rest zero
+
+
+def test_average_precision_is_interpolated():
+    recall = np.array([0.0, 0.5, 0.5, 1.0])
+    precision = np.array([0.0, 1.0, 0.5, 0.75])
+    # precision is the best one at any recall >= r: 1.0 up to 0.5, 0.75 above
+    assert average_precision(recall, precision) == pytest.approx((51 * 1.0 + 50 * 0.75) / 101)
+
+
+def test_worker_pool_matches_a_single_process(tiny_model, tmp_path):
+    rng = np.random.default_rng(1)
+    for i in range(6):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), rng.integers(0, 255, (240, 320, 3), dtype=np.uint8))
+        (tmp_path / f"{i}.txt").write_text(f"{i % 2} 0.5 0.5 0.4 0.3\n")
+    samples = find_samples(str(tmp_path))
+    assert len(samples) == 6
+    single = evaluate(tiny_model, samples, 2, conf=0.01, iou_thres=0.6, workers=1)
+    pooled = evaluate(tiny_model, samples, 2, conf=0.01, iou_thres=0.6, workers=2)
+    assert single.images == pooled.images == 6
+    assert (single.tp + single.fp).sum() > 0
+    np.testing.assert_array_equal(single.tp, pooled.tp)
+    np.testing.assert_array_equal(single.fp, pooled.fp)
+    np.testing.assert_array_equal(single.n_gt, pooled.n_gt)
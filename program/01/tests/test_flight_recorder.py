@@ -0,0 +1,98 @@
+import csv
+import sys
+import numpy as np
+import pytest
+from flight_recorder import (FlightRecorder, KIND_FRAME, KIND_PWM, KIND_SESSION, MAX_DETECTIONS, read_records,
+                             save_columnar, save_csv, to_columns)
+
+
+def detections(n, offset=0.0):
+    boxes = np.arange(4 * n, dtype=np.float32).reshape(n, 4) + offset
+    scores = np.linspace(0.1, 0.9, n, dtype=np.float32)
+    return boxes, scores, np.arange(n, dtype=np.int32) % 2
+
+
+def stamps(i):
+    return (i, i + 0.1, i + 0.2, i + 0.3)
+
+
+def test_ring_wraps_and_reads_oldest_first(tmp_path):
+    path = str(tmp_path / "flight.rec")
+    rec = FlightRecorder(path, capacity=8)
+    for i in range(1, 13):
+        rec.frame(i, stamps(i), detections(1))
+    rec.close()
+    records = read_records(path)
+    # session record + 12 frames through 8 slots: the newest 8 frames remain, in order
+    assert len(records) == 8 and rec.count == 13
+    assert (records["kind"] == KIND_FRAME).all()
+    assert records["frame_id"].tolist() == list(range(5, 13))
+    assert (np.diff(records["t"]) >= 0).all()
+    np.testing.assert_allclose(records["stamps"][0], stamps(5))
+
+
+def test_reopening_appends_after_the_existing_records(tmp_path):
+    path = str(tmp_path / "flight.rec")
+    FlightRecorder(path, capacity=16).frame(1, stamps(1), detections(0))
+    rec = FlightRecorder(path, capacity=16)
+    rec.pwm({5: 1500, 10: 1400})
+    rec.close()
+    kinds = read_records(path)["kind"].tolist()
+    assert kinds == [KIND_SESSION, KIND_FRAME, KIND_SESSION, KIND_PWM, KIND_PWM]
+    # a different layout starts over
+    FlightRecorder(path, capacity=32).close()
+    assert read_records(path)["kind"].tolist() == [KIND_SESSION]
+
+
+def test_keeps_the_highest_scored_detections(tmp_path):
+    path = str(tmp_path / "flight.rec")
+    rec = FlightRecorder(path, capacity=8)
+    boxes, scores, class_ids = detections(MAX_DETECTIONS + 3)
+    rec.frame(7, stamps(7), (boxes, scores, class_ids))
+    rec.close()
+    det = to_columns(read_records(path))["detections"]
+    assert len(det["score"]) == MAX_DETECTIONS
+    np.testing.assert_allclose(det["score"], np.sort(scores)[::-1][:MAX_DETECTIONS])
+    assert (det["frame_id"] == 7).all()
+
+
+def recorded_tables(tmp_path):
+    path = str(tmp_path / "flight.rec")
+    rec = FlightRecorder(path, capacity=64)
+    for i in range(1, 4):
+        rec.frame_id = i
+        rec.frame(i, stamps(i), detections(i), stream=i % 2)
+        rec.pwm({5: 1500 + i, 10: 1500 - i})
+    rec.close()
+    return to_columns(read_records(path))
+
+
+def test_csv_round_trip(tmp_path):
+    tables = recorded_tables(tmp_path)
+    paths = save_csv(tables, str(tmp_path / "out"))
+    assert len(paths) == len(tables)
+    for name, path in zip(tables, paths):
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == list(tables[name])
+        for col, values in zip(rows[0], zip(*rows[1:])):
+            np.testing.assert_allclose(np.array(values, float), tables[name][col].astype(float), rtol=1e-6)
+    assert len(tables["detections"]["score"]) == 1 + 2 + 3
+    assert tables["pwm"]["duty_cycle"].tolist() == [1501, 1499, 1502, 1498, 1503, 1497]
+
+
+def test_columnar_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)  # the npz fallback
+    tables = recorded_tables(tmp_path)
+    [path] = save_columnar(tables, str(tmp_path / "out"))
+    with np.load(path) as data:
+        for name, cols in tables.items():
+            for col, values in cols.items():
+                np.testing.assert_array_equal(data[f"{name}/{col}"], values)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.rec"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        read_records(str(path))
@@ -0,0 +1,35 @@
+import time
+from frame_bus import FrameBus
+
+
+def test_slow_subscriber_gets_the_newest_item_at_its_own_rate():
+    bus = FrameBus()
+    seen = []
+
+    def slow(item):
+        seen.append(item)
+        time.sleep(0.03)  # annotation + resize on a slow display
+        return item * 10
+
+    sub = bus.subscribe(slow, max_fps=10)
+    longest = 0.0
+    start = time.monotonic()
+    for i in range(1, 201):
+        t0 = time.perf_counter()
+        bus.publish(i)
+        longest = max(longest, time.perf_counter() - t0)
+        time.sleep(0.002)
+    elapsed = time.monotonic() - start
+    # the publisher never waits for the subscriber
+    assert longest < 0.01
+    # at most max_fps transforms per second, the rest skipped, in publish order
+    assert 1 <= len(seen) <= elapsed * 10 + 2
+    assert seen == sorted(seen) and sub.skipped > 0
+    deadline = time.monotonic() + 2.0
+    while sub.latest()[0] != 200 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # once publishing stops the newest item comes through, older ones never queue up behind it
+    assert sub.latest() == (200, 2000)
+    assert sub.processed + sub.skipped == 200
+    bus.close()
+    sub.close()
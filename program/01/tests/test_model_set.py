@@ -0,0 +1,43 @@
+import shutil
+import time
+import numpy as np
+from model_set import ModelSet
+
+
+def two_variants(tiny_model, tmp_path, **kwargs):
+    paths = []
+    for name in ("a", "b"):
+        paths.append(str(tmp_path / name))
+        shutil.copytree(tiny_model, paths[-1])
+    return ModelSet(paths, **kwargs)
+
+
+def test_detect_crop_feeds_the_latency_controller(tiny_model, tmp_path):
+    models = two_variants(tiny_model, tmp_path, target_latency=0.01, cooldown=60.0)
+    empty = (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+    def slow_crop(*args):
+        time.sleep(0.02)
+        return empty
+
+    for v in models.variants:
+        v.detect_crop = slow_crop
+    frame = np.zeros((480, 640, 3), np.uint8)
+    models.detect_crop(frame, (0, 0, 320, 320), (640, 640), 0.5, 0.45)
+    assert models.latency[1] >= 0.02 and models.used == [0, 1]
+    # over budget: the next crop steps down to the cheaper variant, like predict would
+    models.detect_crop(frame, (0, 0, 320, 320), (640, 640), 0.5, 0.45)
+    assert models.used == [1, 1] and models.last_variant == "a"
+
+
+def test_step_up_after_throttle_stays_on_the_larger_variant(tiny_model, tmp_path):
+    models = two_variants(tiny_model, tmp_path, target_latency=0.1, cooldown=0.0)
+    # both tiny copies have the same input area, so the estimate equals the cheap variant's time
+    models.latency = [None, 0.5]    # throttled on the larger variant
+    assert models.select() == 0
+    models._record(0, 0.02)
+    assert models.select() == 1
+    assert models.latency[1] == 0.02
+    for _ in range(5):
+        models._record(1, 0.03)
+        assert models.select() == 1
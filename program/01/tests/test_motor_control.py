@@ -0,0 +1,79 @@
+import threading
+from motor_control import MotorControl
+from replay import SimulatedPCA9685, SimulatedChannel
+
+
+class FlakyChannel(SimulatedChannel):
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if self._pwm.failures:
+            self._pwm.failures -= 1
+            raise OSError("I2C write failed")
+        self._duty_cycle = value
+
+
+class FlakyPCA9685(SimulatedPCA9685):
+    """Simulated board whose next `failures` writes raise like a dropped I2C transfer."""
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.channels = [FlakyChannel(self, i) for i in range(len(self.channels))]
+
+
+def test_failed_async_write_is_retried():
+    pwm = FlakyPCA9685(failures=1)
+    mc = MotorControl(pwm, async_writes=True)
+    mc.set_motor_throttle(5, 1300)
+    mc.flush()
+    assert pwm.channels[5].duty_cycle == 0  # the write failed
+    mc.set_motor_throttle(5, 1300)  # identical command must not be suppressed
+    mc.flush()
+    assert pwm.channels[5].duty_cycle == int(1300 / 20000 * 65535)
+    assert mc.write_stats()["failures"] == 1
+    mc.close()
+
+
+def test_failed_sync_write_is_retried():
+    pwm = FlakyPCA9685(failures=1)
+    mc = MotorControl(pwm)
+    try:
+        mc.set_motor_throttle(5, 1300)
+    except OSError:
+        pass
+    mc.set_motor_throttle(5, 1300)
+    assert pwm.channels[5].duty_cycle == int(1300 / 20000 * 65535)
+
+
+def test_batch_commits_once_and_does_not_hold_the_lock():
+    pwm = SimulatedPCA9685()
+    mc = MotorControl(pwm)
+    other_done = threading.Event()
+    with mc.batch():
+        mc.move_forward()
+        mc.move_down()
+        assert pwm.trace == []  # nothing written inside the batch
+        # another thread can still command the motors while the body runs
+        t = threading.Thread(target=lambda: (mc.set_motor_throttle(1, 1000), other_done.set()))
+        t.start()
+        t.join(timeout=1.0)
+        assert other_done.is_set()
+    assert {row[2] for row in pwm.trace} == {1, 3, 12, 5, 10}
+
+
+def test_move_helpers_write_both_thrusters_in_one_transfer():
+    mc = MotorControl(SimulatedPCA9685())
+    writes = []
+    write = mc._write
+    mc._write = lambda changed: (writes.append(dict(changed)), write(changed))
+    for move in (mc.move_forward, mc.move_backward, mc.move_left, mc.move_right, mc.move_up, mc.move_down):
+        with mc.batch():
+            for ch in mc.MOTOR_CHANNELS.values():
+                mc.set_motor_throttle(ch, mc.PWM_SLOW)  # differs from every value the helpers set
+        writes.clear()
+        move()
+        assert len(writes) == 1 and len(writes[0]) == 2, move.__name__
@@ -0,0 +1,34 @@
+from multi_camera import CameraStream, MultiCamera, parse_stream_spec
+from replay import SyntheticSource
+
+
+def read_all(cam):
+    served = []
+    while True:
+        ret, frame = cam.read(timeout=0)
+        if not ret:
+            return served
+        served.append((cam.last_stream, cam.clock, cam.last_frame_id))
+
+
+def test_parse_stream_spec():
+    assert parse_stream_spec("0") == (0, 1.0, None)
+    assert parse_stream_spec("clip.avi@2/5") == ("clip.avi", 2.0, 5.0)
+
+
+def test_recorded_streams_are_tagged_ordered_and_capped():
+    # front at 30 fps uncapped, bottom at 30 fps capped to 10: one frame in three
+    cam = MultiCamera([CameraStream("front", SyntheticSource(30, seed=0)),
+                       CameraStream("bottom", SyntheticSource(30, seed=1), max_fps=10.0)])
+    served = read_all(cam)
+    streams = [s for s, _, _ in served]
+    assert streams.count(0) == 30 and streams.count(1) == 10
+    # merged in recording-clock order, frame ids count over both streams
+    clocks = [t for _, t, _ in served]
+    assert clocks == sorted(clocks)
+    assert [i for _, _, i in served] == list(range(1, 41))
+    bottom = [t for s, t, _ in served if s == 1]
+    assert all(abs(b - a - 0.1) < 1e-6 for a, b in zip(bottom, bottom[1:]))
+    stats = cam.stats()
+    assert stats["bottom"]["served"] == 10 and stats["bottom"]["skipped"] == 20
+    assert cam.names == ["front", "bottom"] and not cam.isOpened()
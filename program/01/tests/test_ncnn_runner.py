@@ -0,0 +1,16 @@
+import numpy as np
+from ncnn_runner import NCNNRunner
+
+
+def frames(n=4):
+    rng = np.random.default_rng(1)
+    return [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def test_predict_batch_keeps_the_net_thread_count(tiny_model):
+    runner = NCNNRunner(tiny_model, options={"num_threads": 3})
+    inputs = [runner.preprocess(f, {}) for f in frames()]
+    batch = runner.predict_batch(inputs, num_workers=2, threads_per_extractor=1)
+    assert runner.net.opt.num_threads == 3
+    for x, y in zip(inputs, batch):
+        np.testing.assert_array_equal(runner.predict(x)[0], y[0])
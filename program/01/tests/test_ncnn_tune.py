@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import ncnn_tune
+from ncnn_runner import NCNNRunner, device_key, load_profile, profile_path
+from ncnn_tune import REFERENCE, deviation, save_profile, tune
+
+
+def frames(n=2):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (240, 320, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def test_deviation_compares_boxes_only_where_the_reference_scores():
+    ref = np.zeros((1, 6, 3), np.float32)
+    ref[0, 4, 0] = 0.9
+    y = ref.copy()
+    y[0, :4, 1] += 50.0    # box noise on an anchor nobody decodes
+    y[0, 5, 2] += 0.02
+    assert deviation([y], [ref]) == pytest.approx((0.02, 0.0))
+    y[0, 0, 0] += 3.0
+    assert deviation([y], [ref]) == pytest.approx((0.02, 3.0))
+
+
+def test_greedy_search_keeps_the_fastest_option_within_tolerance(tiny_model, monkeypatch):
+    monkeypatch.setattr(ncnn_tune, "search_space", lambda: [
+        ("lightmode", [{"lightmode": True}, {"lightmode": False}]),
+        ("winograd", [{"use_winograd_convolution": True}, {"use_winograd_convolution": False}]),
+    ])
+    real_measure = ncnn_tune.measure
+    tried = []
+
+    def measure(model_path, options, frames, repeats=3, precision="fp32"):
+        _, outputs = real_measure(model_path, options, frames, 1, precision)
+        tried.append(dict(options))
+        if options.get("lightmode") is False:
+            # fastest by far, but its scores are off by more than score_tol
+            outputs = [y.copy() for y in outputs]
+            for y in outputs:
+                y[0, 4:] += 0.05
+            return 0.001, outputs
+        if options.get("use_winograd_convolution") is False:
+            return 0.005, outputs
+        return 0.010, outputs
+
+    monkeypatch.setattr(ncnn_tune, "measure", measure)
+    profile = tune(tiny_model, frames(), score_tol=0.01, log=lambda *a: None)
+    assert profile["options"] == {**REFERENCE, "use_winograd_convolution": False}
+    assert profile["latency_ms"] == pytest.approx(5.0) and profile["reference_ms"] == pytest.approx(10.0)
+    assert profile["candidates"] == 4 and len(tried) == 5
+    # the rejected option is not carried into the next group
+    assert all(t.get("lightmode") is not False for t in tried[3:])
+    assert profile["score_dev"] <= 0.01
+
+
+def test_profile_round_trip_is_keyed_by_device(tiny_model, capsys):
+    profile = {"device": device_key(), "precision": "fp32",
+               "options": {"num_threads": 1, "lightmode": False, "allocator": "pool"}, "latency_ms": 1.0}
+    assert save_profile(tiny_model, profile) == profile_path(tiny_model)
+    assert load_profile(tiny_model) == profile
+    runner = NCNNRunner(tiny_model)
+    assert runner.options == profile["options"]
+    assert runner.net.opt.num_threads == 1 and runner.net.opt.lightmode is False
+    assert len(runner._allocators) == 2
+    # a profile tuned for int8 is kept apart
+    save_profile(tiny_model, dict(profile, precision="int8", options={"num_threads": 2}))
+    assert load_profile(tiny_model)["options"] == profile["options"]
+    # tuned on another machine: ignored, the runner falls back to the defaults
+    save_profile(tiny_model, dict(profile, device=dict(device_key(), machine="other")))
+    assert load_profile(tiny_model) is None
+    assert NCNNRunner(tiny_model).options == {}
+    assert "perangkat lain" in capsys.readouterr().out
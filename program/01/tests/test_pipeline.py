@@ -0,0 +1,55 @@
+import time
+from pipeline import Pipeline, BLOCK, DROP_OLDEST
+
+
+def counter(n):
+    items = iter(range(n))
+    return lambda: next(items, None)
+
+
+def slow(item, delay=0.01):
+    time.sleep(delay)
+    return item
+
+
+def collect(pipeline, timeout=5.0):
+    out = []
+    deadline = time.monotonic() + timeout
+    while pipeline.running and time.monotonic() < deadline:
+        item = pipeline.get(timeout=0.1)
+        if item is not None:
+            out.append(item)
+    return out
+
+
+def test_end_of_stream_delivers_every_queued_item():
+    pipeline = (Pipeline(counter(20), output_size=4, output_policy=BLOCK)
+                .add_stage("a", slow, 4, BLOCK)
+                .add_stage("b", slow, 4, BLOCK)).start()
+    out = collect(pipeline)
+    pipeline.stop()
+    assert out == list(range(20))
+    assert pipeline.finished.is_set() and pipeline.error is None
+
+
+def test_end_of_stream_keeps_the_last_item_with_drop_oldest():
+    pipeline = Pipeline(counter(20)).add_stage("a", slow, 1, DROP_OLDEST).start()
+    out = collect(pipeline)
+    pipeline.stop()
+    assert out[-1] == 19 and out == sorted(out)
+
+
+def test_stop_after_end_of_stream_drains_the_stages():
+    pipeline = Pipeline(counter(5), output_size=8, output_policy=BLOCK).add_stage("a", slow, 8, BLOCK).start()
+    pipeline.source.thread.join(timeout=1.0)  # everything is queued, nothing read yet
+    pipeline.stop()
+    assert pipeline.stages[0].processed == 5
+    assert [pipeline.get(timeout=0.1) for _ in range(5)] == list(range(5))
+
+
+def test_stop_while_running_returns_promptly():
+    pipeline = Pipeline(lambda: slow(1)).add_stage("a", slow).start()
+    time.sleep(0.05)
+    t0 = time.monotonic()
+    pipeline.stop()
+    assert time.monotonic() - t0 < 1.0 and not pipeline.running
@@ -0,0 +1,58 @@
+import numpy as np
+from bench_postprocess import postprocess_loop, synthetic_output
+from bench_preprocess import preprocess_reference
+from ncnn_runner import NCNNRunner, decode_output, nms
+
+
+def by_score(boxes, scores):
+    order = np.argsort(-scores, kind="stable")
+    return np.asarray(boxes)[order], np.asarray(scores)[order]
+
+
+def test_vectorized_decoder_matches_the_loop_per_class():
+    for seed in range(3):
+        output = synthetic_output(num_classes=2, seed=seed)
+        boxes, scores, class_ids = decode_output(output, 0.5, 0.45, 4.0, 140.0, 1.5)
+        for k in range(2):
+            # the loop decoder runs class-agnostic NMS, give it the anchors of one class at a time
+            single = output.copy()
+            mine = output[0, 4:].argmax(axis=0) == k
+            single[0, 4:] = 0.0
+            single[0, 4 + k] = np.where(mine, output[0, 4 + k], 0.0)
+            ref_boxes, ref_scores, _ = postprocess_loop(single, 0.5, 0.45, 4.0, 140.0, 1.5)
+            got_boxes, got_scores = by_score(boxes[class_ids == k], scores[class_ids == k])
+            ref_boxes, ref_scores = by_score(ref_boxes, ref_scores)
+            np.testing.assert_allclose(got_scores, ref_scores, rtol=0, atol=1e-6)
+            np.testing.assert_allclose(got_boxes, ref_boxes, rtol=0, atol=1e-3)
+
+
+def test_torch_free_preprocess_matches_the_reference(tiny_model):
+    runner = NCNNRunner(tiny_model)
+    rng = np.random.default_rng(0)
+    for shape in ((480, 640, 3), (720, 1280, 3), (481, 333, 3)):
+        im = rng.integers(0, 256, shape, dtype=np.uint8)
+        ref = preprocess_reference(runner, im)[0]
+        geom = (runner.dw, runner.dh, runner.ratio)
+        out = np.array(runner.preprocess(im))
+        assert (runner.dw, runner.dh, runner.ratio) == geom
+        assert out.shape == ref.shape
+        np.testing.assert_allclose(out, ref, rtol=0, atol=1e-6)
+
+
+def test_class_aware_nms_with_negative_coordinates():
+    # a class 1 box left of / above the image, shifted by the class offset, must not land on a class 0 box
+    boxes = np.array([[80.0, 80.0, 20.0, 20.0], [-21.0, -21.0, 20.0, 20.0]], np.float32)
+    scores = np.array([0.9, 0.8], np.float32)
+    assert sorted(nms(boxes, scores, 0.45, np.array([0, 1]))) == [0, 1]
+    # same class still suppresses
+    assert list(nms(boxes + [[0, 0, 0, 0], [101, 101, 0, 0]], scores, 0.45, np.array([0, 0]))) == [0]
+
+
+def test_nms_keeps_at_most_max_det():
+    rng = np.random.default_rng(0)
+    boxes = np.concatenate([rng.uniform(0, 5000, (1000, 2)), np.full((1000, 2), 10.0)], axis=1).astype(np.float32)
+    scores = rng.uniform(0.01, 1.0, 1000).astype(np.float32)
+    keep = nms(boxes, scores, 0.45, np.zeros(1000, np.int32), max_det=300)
+    assert len(keep) == 300
+    # the highest scores survive the cap
+    assert (np.diff(scores[keep]) <= 0).all() and scores[keep[0]] == scores.max()
@@ -0,0 +1,102 @@
+import json
+import threading
+import pytest
+from profiler import PROFILER, LatencyHistogram, Profiler, _NULL_SPAN, profiled
+
+
+def test_histogram_percentiles():
+    hist = LatencyHistogram(max_ms=100.0, bin_ms=1.0)
+    for ms in range(1, 101):
+        hist.add(ms / 1000 - 1e-6)  # inside bin ms - 1
+    s = hist.summary()
+    assert s["mean_ms"] == pytest.approx(50.5, abs=0.01)
+    assert s["p50_ms"] == pytest.approx(49.5) and s["p99_ms"] == pytest.approx(98.5)
+    # over the range lands in the last bin instead of growing it
+    hist.add(10.0)
+    assert hist.counts[-1] == 1 and len(hist.counts) == 101
+    assert LatencyHistogram().summary()["p99_ms"] == 0.0
+
+
+def test_histogram_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for _ in range(3):
+        a.add(0.001)
+    b.add(0.010)
+    a.merge(b)
+    assert a.n == 4 and a.summary()["mean_ms"] == pytest.approx(3.25)
+    assert a.percentile(100) == pytest.approx(10.05)
+
+
+def test_disabled_spans_record_nothing():
+    prof = Profiler()
+    assert prof.span("stage") is _NULL_SPAN
+    with prof.span("stage"):
+        pass
+    assert prof.summary() == {}
+
+
+def record_on_threads(prof, names):
+    def work(count):
+        for _ in range(count):
+            with prof.span("stage"):
+                pass
+    threads = [threading.Thread(target=work, args=(i + 1,), name=name) for i, name in enumerate(names)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_per_thread_tables_are_merged():
+    prof = Profiler()
+    prof.enable()
+    record_on_threads(prof, ["w1", "w2", "w3"])
+    assert [name for name, _ in prof._tables] == ["w1", "w2", "w3"]
+    assert prof.summary()["stage"]["n"] == 1 + 2 + 3
+    prof.reset()
+    assert prof.summary() == {}
+
+
+def test_chrome_trace_is_valid_json_with_complete_events():
+    prof = Profiler()
+    prof.enable(trace=True)
+    done = threading.Event()
+    hold = threading.Event()
+
+    def worker():
+        with prof.span("infer"):
+            pass
+        done.set()
+        hold.wait(5)   # alive while the trace is taken, so its name is known
+
+    t = threading.Thread(target=worker, name="stage-infer")
+    t.start()
+    done.wait(5)
+    with prof.span("decide"):
+        pass
+    doc = json.loads(json.dumps(prof.chrome_trace()))
+    hold.set()
+    t.join()
+    spans = [e for e in doc["traceEvents"] if e["ph"] == "X"]
+    assert sorted(e["name"] for e in spans) == ["decide", "infer"]
+    assert len({e["tid"] for e in spans}) == 2
+    assert all(e["dur"] >= 0 and e["ts"] >= 0 for e in spans)
+    names = {e["tid"]: e["args"]["name"] for e in doc["traceEvents"] if e["ph"] == "M"}
+    assert names[t.ident] == "stage-infer"
+    assert names[threading.get_ident()] == threading.current_thread().name
+
+
+def test_profiled_calls_through_when_disabled():
+    @profiled("test.fn")
+    def fn(x):
+        return x * 2
+
+    PROFILER.reset()
+    assert fn(2) == 4 and "test.fn" not in PROFILER.summary()
+    PROFILER.enable()
+    try:
+        assert fn(3) == 6
+        assert PROFILER.summary()["test.fn"]["n"] == 1
+    finally:
+        PROFILER.disable()
+        PROFILER.reset()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from quantize import class_deviation, require_recorded, verdict
+
+
+def result(*dets):
+    """(left, top, width, height, score, class_id) tuples -> postprocess result."""
+    dets = np.array(dets, np.float32).reshape(-1, 6)
+    return dets[:, :4], dets[:, 4], dets[:, 5].astype(np.int32)
+
+
+def test_counts_matched_missed_and_extra_per_class():
+    reference = [result((10, 10, 50, 50, 0.9, 0), (200, 200, 40, 40, 0.8, 0), (10, 10, 50, 50, 0.7, 1)),
+                 result((300, 300, 30, 30, 0.6, 0))]
+    candidate = [result((12, 10, 50, 50, 0.85, 0), (400, 10, 40, 40, 0.6, 0), (10, 10, 50, 50, 0.7, 1)),
+                 result()]
+    d = class_deviation(reference, candidate, 0)
+    assert (d["fp32"], d["int8"], d["matched"], d["missed"], d["extra"]) == (3, 2, 1, 2, 1)
+    assert d["agreement"] == pytest.approx(1 / 3)
+    assert d["score_dev_mean"] == pytest.approx(0.05) and d["box_dev_px_max"] == pytest.approx(2.0)
+    assert d["iou_mean"] == pytest.approx(48 * 50 / (52 * 50))
+    # class 1 matches exactly, class 0 detections do not count for it
+    d = class_deviation(reference, candidate, 1)
+    assert (d["fp32"], d["int8"], d["matched"], d["agreement"]) == (1, 1, 1, 1.0)
+    assert d["score_dev_max"] == 0.0 and d["box_dev_px_max"] == 0.0
+
+
+def test_no_reference_detections():
+    d = class_deviation([result()], [result((10, 10, 50, 50, 0.9, 0))], 0)
+    assert d["agreement"] is None and d["iou_mean"] is None and d["extra"] == 1
+
+
+def report(**classes):
+    base = {"fp32": 10, "agreement": 1.0, "score_dev_mean": 0.01, "box_dev_px_mean": 1.0}
+    return {"classes": {name: dict(base, **d) for name, d in classes.items()}}
+
+
+def test_verdict_thresholds():
+    assert verdict(report(Gate={}, Cylinder={})) == []
+    problems = verdict(report(Gate={"agreement": 0.9}, Cylinder={"score_dev_mean": 0.08, "box_dev_px_mean": 9.0}))
+    assert len(problems) == 3
+    assert problems[0].startswith("Gate: hanya 90.0%")
+    assert [p.split(":")[0] for p in problems[1:]] == ["Cylinder", "Cylinder"]
+    # exactly at the threshold still passes
+    assert verdict(report(Gate={"agreement": 0.95, "score_dev_mean": 0.05, "box_dev_px_mean": 8.0})) == []
+
+
+def test_verdict_fails_untested_classes():
+    [problem] = verdict(report(Gate={}, Cylinder={"fp32": 0, "agreement": None}))
+    assert problem.startswith("Cylinder") and "tidak teruji" in problem
+
+
+def test_synthetic_sources_are_refused():
+    require_recorded(["clip.avi", "screenshots/images"])
+    with pytest.raises(ValueError):
+        require_recorded(["clip.avi", "synthetic:200"])
@@ -0,0 +1,27 @@
+from main import RobotControl
+from motor_control import MotorControl
+from replay import SimulatedPCA9685, open_source, run_replay
+
+
+def replay_trace(model, seed, frames=40):
+    pwm = SimulatedPCA9685()
+    robot = RobotControl(model, confidence_thres=0.3, camera_source=open_source(f"synthetic:{frames}", seed=seed),
+                         motor_control=MotorControl(pwm), seed=seed, arm_delay=0, record=None)
+    try:
+        assert run_replay(robot)[0] == frames
+    finally:
+        robot.release_resources()
+        robot.frame_bus.close()
+    # wall-clock time differs between runs, frame, channel and value must not
+    return [(frame_id, channel, value) for frame_id, _, channel, value in pwm.trace]
+
+
+def test_same_source_and_seed_give_the_same_trace(tiny_model, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = replay_trace(tiny_model, seed=3)
+    assert first == replay_trace(tiny_model, seed=3)
+    # the run starts like a live one: neutral on every thruster before the first frame
+    mc = MotorControl(SimulatedPCA9685())
+    neutral = {ch for ch in mc.MOTOR_CHANNELS.values()}
+    assert {ch for frame_id, ch, value in first if frame_id == 0} >= neutral
+    assert first[0][0] == 0
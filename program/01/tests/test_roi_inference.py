@@ -0,0 +1,33 @@
+import numpy as np
+from roi_inference import RoiDetector
+from tracker import MultiObjectTracker
+
+EMPTY = (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+
+class CropDetector:
+    """Detector stub recording which crop it was asked for."""
+
+    def __init__(self):
+        self.rects = []
+
+    def detect_crop(self, frame, rect, size, confidence_thres, iou_thres, cache):
+        self.rects.append(rect)
+        return EMPTY
+
+
+def test_roi_follows_the_snapshot_predicted_to_the_frame_time():
+    tracker = MultiObjectTracker()
+    for t in (0.0, 0.1):
+        # 100 px/s to the right
+        tracker.update((np.array([[100 + 100 * t, 100, 50, 50]], np.float32), np.array([0.9], np.float32),
+                        np.array([0], np.int32)), t)
+    detector = CropDetector()
+    roi = RoiDetector(detector, margin=0.0)
+    roi.set_tracks(tracker.tracks)
+    tr = tracker.tracks[0]
+    expected_x = tr.box[0] + tr.velocity[0] * (0.5 - tr.last_time)
+    assert tr.velocity[0] > 0
+    roi.process(np.zeros((480, 640, 3), np.uint8), 0.5)
+    x0, y0, x1, y1 = detector.rects[-1]
+    assert abs(x0 - expected_x) <= 1 and (y0, y1) == (100, 150)
@@ -0,0 +1,85 @@
+import json
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from frame_bus import FrameBus
+from stream_server import StreamServer, BOUNDARY
+
+
+@pytest.fixture
+def server():
+    bus = FrameBus()
+    srv = StreamServer(bus, {0: "Gate", 1: "Cylinder"}, port=0).start()
+    item = {"frame": np.zeros((480, 640, 3), np.uint8), "frame_id": 7, "frame_time": 1.0, "variant": None,
+            "result": (np.array([[10.0, 20.0, 30.0, 40.0]], np.float32), np.array([0.9], np.float32),
+                       np.array([1], np.int32))}
+    deadline = time.monotonic() + 5.0
+    while srv.latest is None and time.monotonic() < deadline:
+        bus.publish(item)
+        time.sleep(0.02)
+    yield srv
+    srv.stop()
+    bus.close()
+
+
+def get(srv, path):
+    return urllib.request.urlopen(f"http://127.0.0.1:{srv.port}{path}", timeout=5.0)
+
+
+def test_binds_localhost_by_default(server):
+    assert server.host == "127.0.0.1"
+    assert server._httpd.server_address[0] == "127.0.0.1"
+
+
+def test_snapshot_and_detections(server):
+    with get(server, "/snapshot.jpg") as r:
+        assert r.headers["Content-Type"] == "image/jpeg"
+        assert r.read()[:2] == b"\xff\xd8"
+    with get(server, "/detections.json") as r:
+        meta = json.load(r)
+    assert meta["frame_id"] == 7
+    assert meta["detections"] == [{"class": "Cylinder", "score": 0.9, "box": [10.0, 20.0, 30.0, 40.0]}]
+
+
+def test_mjpeg_stream_sends_a_frame(server):
+    with get(server, "/stream.mjpg?fps=0&quality=500") as r:
+        assert r.headers["Content-Type"] == f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+        head = r.readline()
+        assert head.strip() == f"--{BOUNDARY}".encode()
+        headers = {}
+        while True:
+            line = r.readline().strip()
+            if not line:
+                break
+            key, _, value = line.decode().partition(": ")
+            headers[key] = value
+        assert headers["X-Frame-Id"] == "7"
+        assert r.read(int(headers["Content-Length"]))[:2] == b"\xff\xd8"
+        # fps=0 and quality=500 are clamped instead of failing
+        client = server.stats()["clients"][0]
+        assert client["fps"] == 1.0 and client["quality"] == server.qualities[0]
+
+
+@pytest.mark.parametrize("query", ["fps=abc", "quality=x", "kbps=nan", "fps=inf"])
+def test_bad_stream_parameters_are_rejected(server, query):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        get(server, f"/stream.mjpg?{query}")
+    assert e.value.code == 400
+    e.value.close()
+
+
+def test_profiler_is_switched_by_post_only(server):
+    from profiler import PROFILER
+    url = f"http://127.0.0.1:{server.port}/profile.json"
+    try:
+        with get(server, "/profile.json?enable=1") as r:
+            assert json.load(r)["enabled"] is False and not PROFILER.enabled
+        with urllib.request.urlopen(urllib.request.Request(url, data=b"enable=1&trace=1"), timeout=5.0) as r:
+            state = json.load(r)
+        assert state["enabled"] and state["tracing"] and PROFILER.enabled
+        with urllib.request.urlopen(urllib.request.Request(url + "?enable=0", data=b""), timeout=5.0) as r:
+            assert json.load(r)["enabled"] is False
+    finally:
+        PROFILER.disable()
@@ -0,0 +1,30 @@
+import numpy as np
+from motor_control import MotorControl
+from replay import SimulatedPCA9685
+from thruster_allocation import ThrusterAllocator, THRUSTERS
+
+
+def test_allocation_achieves_the_wrench():
+    alloc = ThrusterAllocator()
+    wrench = np.array([[0.3, 0.2, 0.4, 0.1]])
+    full = np.zeros((1, 6))
+    full[:, [0, 1, 2, 5]] = wrench
+    np.testing.assert_allclose(alloc.achieved(alloc.thrust(wrench)), full, atol=1e-9)
+
+
+def test_first_move_after_stop_moves():
+    mc = MotorControl(SimulatedPCA9685())
+    mc.stop_all_motors()
+    us = mc.move(surge=0.8)
+    rear = [THRUSTERS.index("motor_5"), THRUSTERS.index("motor_6")]
+    assert np.all(us[rear] > mc.PWM_MIN)
+    assert np.all(us[rear] <= mc.PWM_MIN + mc.allocator.slew_us_per_s * mc.allocator.nominal_dt + 1e-6)
+
+
+def test_repeated_steps_reach_the_target():
+    alloc = ThrusterAllocator()
+    target = alloc.pulse_widths((0.8, 0.0, 0.0, 0.0))[0]
+    us = None
+    for i in range(50):
+        us = alloc.step((0.8, 0.0, 0.0, 0.0), now=i * 0.02, previous_us=np.full(6, 700.0) if us is None else None)
+    np.testing.assert_allclose(us, target)
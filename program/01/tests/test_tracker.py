@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+import numpy as np
+from tracker import DecisionFilter, MultiObjectTracker
+
+
+def result(*dets):
+    """(left, top, width, height, score, class_id) tuples -> postprocess result."""
+    dets = np.array(dets, np.float32).reshape(-1, 6)
+    return dets[:, :4], dets[:, 4], dets[:, 5].astype(np.int32)
+
+
+def test_track_keeps_its_id_while_matched():
+    tracker = MultiObjectTracker()
+    assert tracker.update(result((100, 100, 50, 50, 0.9, 0)), t=0.0) == []  # not confirmed after one hit
+    confirmed = tracker.update(result((104, 100, 50, 50, 0.9, 0)), t=0.1)
+    assert [tr.id for tr in confirmed] == [1]
+    for k in range(2, 6):
+        confirmed = tracker.update(result((100 + 4 * k, 100, 50, 50, 0.9, 0)), t=0.1 * k)
+        assert [tr.id for tr in confirmed] == [1]
+    assert confirmed[0].hits == 6 and confirmed[0].velocity[0] > 0
+
+
+def test_detections_do_not_match_tracks_of_another_class():
+    tracker = MultiObjectTracker()
+    tracker.update(result((100, 100, 50, 50, 0.9, 0)), t=0.0)
+    tracker.update(result((100, 100, 50, 50, 0.9, 1)), t=0.1)
+    assert [(tr.id, tr.class_id, tr.misses) for tr in tracker.tracks] == [(1, 0, 1), (2, 1, 0)]
+
+
+def tracks(conf, class_id=0):
+    return [SimpleNamespace(class_id=class_id, confidence=conf)] if conf is not None else []
+
+
+def run(filter_, confs):
+    return [filter_.update(tracks(c))[0] for c in confs]
+
+
+def test_turns_on_after_two_frames_and_off_after_three():
+    decisions = DecisionFilter((0,), on_thres=0.8, off_thres=0.6)
+    assert run(decisions, [0.9, None, 0.9]) == [False, False, False]  # the streak must be consecutive
+    assert run(decisions, [0.9]) == [True]
+    assert run(decisions, [None, None, 0.9, None, None]) == [True] * 5  # a hit resets the off count
+    assert run(decisions, [None]) == [False]
+
+
+def test_releases_below_three_quarters_of_the_threshold():
+    conf = 0.8
+    decisions = DecisionFilter((0, 1), on_thres=conf, off_thres=0.75 * conf)
+    run(decisions, [0.85, 0.85])
+    # between off_thres and on_thres: stays on, would not have turned on
+    assert run(decisions, [0.61] * 10) == [True] * 10
+    assert run(decisions, [0.59, 0.59, 0.59]) == [True, True, False]
+    assert run(decisions, [0.61] * 3) == [False] * 3
+    # the other class is decided on its own tracks only
+    assert decisions.update(tracks(0.9, class_id=1)) == {0: False, 1: False}
+    assert decisions.update(tracks(0.9, class_id=1)) == {0: False, 1: True}
@@ -0,0 +1,141 @@
+import time
+import numpy as np
+
+DOF = ("surge", "sway", "heave", "roll", "pitch", "yaw")
+DOF4 = ("surge", "sway", "heave", "yaw")
+
+# thrusters in MOTOR_CHANNELS order
+THRUSTERS = ("motor_1", "motor_2", "motor_3", "motor_4", "motor_5", "motor_6")
+
+# Effect of each thruster at full thrust on the body, one column per thruster.
+# Signs follow the existing one-axis moves: forward = 5+6, backward = 1+2,
+# left = 1+5, right = 2+6, down = 3+4 (surge forward, sway left and heave
+# down are positive). The horizontal four sit at 45 degrees, hence 1/sqrt(2);
+# the yaw signs assume 5/2 and 6/1 are diagonal pairs. The vertical pair
+# only pushes down (up is buoyancy) and has no pitch authority.
+_H = 1 / np.sqrt(2)
+THRUSTER_MATRIX = np.array([
+    # m1   m2   m3    m4   m5   m6
+    [-_H, -_H, 0.0, 0.0, _H, _H],     # surge
+    [_H, -_H, 0.0, 0.0, _H, -_H],     # sway
+    [0.0, 0.0, 1.0, 1.0, 0.0, 0.0],   # heave
+    [0.0, 0.0, 0.5, -0.5, 0.0, 0.0],  # roll
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],   # pitch
+    [_H, -_H, 0.0, 0.0, -_H, _H],     # yaw
+])
+
+# thrust directions that produce no net wrench; adding them lifts negative
+# (impossible, the ESCs are one-directional) thrust without changing the motion
+BALANCE = np.array([
+    [1.0, 1.0, 0.0, 0.0, 1.0, 1.0],   # horizontal four pull against each other
+])
+
+
+class ThrusterAllocator:
+    """Maps a desired body wrench to the six thruster pulse widths in one matrix product.
+
+    Thrust per thruster is 0..1 of its range (pwm_min..pwm_max us). The
+    allocation is the least-squares solution, lifted along the balance
+    directions until no thruster needs negative thrust, clipped at 0 where
+    that is not enough (e.g. heave up), and scaled down uniformly if any
+    thruster would exceed 1 so the direction of motion is kept. Slew
+    limiting is stateful and applied per call of step(); the first call
+    after a reset has no previous time and moves by one nominal_dt.
+
+    All wrench arguments accept a single (dof,) vector or an (n, dof)
+    batch; dof is 6 (DOF) or 4 (DOF4).
+    """
+
+    def __init__(self, matrix=THRUSTER_MATRIX, balance=BALANCE, pwm_min=700, pwm_max=2000, slew_us_per_s=4000.0,
+                 nominal_dt=0.02):
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.balance = np.asarray(balance, dtype=np.float64).reshape(-1, self.matrix.shape[1])
+        if not np.allclose(self.matrix @ self.balance.T, 0.0):
+            raise ValueError("balance directions must not change the wrench")
+        self.pinv = np.linalg.pinv(self.matrix)  # (thrusters, 6)
+        self.dof4 = [DOF.index(d) for d in DOF4]
+        self.pwm_min = pwm_min
+        self.pwm_max = pwm_max
+        self.slew_us_per_s = slew_us_per_s
+        self.nominal_dt = nominal_dt  # one control tick at 50 Hz
+        self.last_us = None
+        self.last_time = None
+        self.saturated = 0
+
+    def _full(self, wrench):
+        w = np.atleast_2d(np.asarray(wrench, dtype=np.float64))
+        if w.shape[1] == len(DOF):
+            return w
+        if w.shape[1] == len(DOF4):
+            full = np.zeros((len(w), len(DOF)))
+            full[:, self.dof4] = w
+            return full
+        raise ValueError(f"wrench must have {len(DOF)} or {len(DOF4)} components, got {w.shape[1]}")
+
+    def thrust(self, wrench):
+        """Thrust fractions (n, thrusters) in [0, 1] for (n, dof) wrenches."""
+        u = self._full(wrench) @ self.pinv.T
+        for b in self.balance:
+            on = b > 0
+            # smallest lift that makes every thruster of this group non-negative
+            lift = np.max(np.where(on, -u / np.where(on, b, 1.0), -np.inf), axis=1)
+            u += np.maximum(lift, 0.0)[:, None] * b
+        u = np.maximum(u, 0.0)
+        peak = u.max(axis=1, keepdims=True)
+        return u / np.maximum(peak, 1.0)
+
+    def pulse_widths(self, wrench):
+        """Thruster pulse widths in us, (n, thrusters) float."""
+        return self.pwm_min + self.thrust(wrench) * (self.pwm_max - self.pwm_min)
+
+    def achieved(self, thrust):
+        """Wrench produced by (n, thrusters) thrust fractions, for checking saturation offline."""
+        return np.atleast_2d(thrust) @ self.matrix.T
+
+    def slew(self, target_us, previous_us, dt):
+        """Move from previous_us towards target_us by at most slew_us_per_s * dt per thruster."""
+        if previous_us is None or self.slew_us_per_s is None:
+            return target_us
+        step = self.slew_us_per_s * dt
+        return previous_us + np.clip(target_us - previous_us, -step, step)
+
+    def step(self, wrench, now=None, previous_us=None):
+        """Pulse widths for one control tick, slew-limited against the previous tick.
+
+        previous_us overrides the allocator's own last output, e.g. with what
+        the thrusters were actually last commanded.
+        """
+        now = time.monotonic() if now is None else now
+        thrust = self.thrust(wrench)[0]
+        if thrust.max() >= 1.0:
+            self.saturated += 1
+        target = self.pwm_min + thrust * (self.pwm_max - self.pwm_min)
+        dt = self.nominal_dt if self.last_time is None else now - self.last_time
+        us = self.slew(target, self.last_us if previous_us is None else previous_us, dt)
+        self.last_us, self.last_time = us, now
+        return us
+
+    def reset(self, us=None):
+        """Forget the slew state, optionally starting from known pulse widths (e.g. all stopped)."""
+        self.last_us = None if us is None else np.asarray(us, dtype=np.float64)
+        self.last_time = None
+
+    def simulate(self, wrenches, dt):
+        """Offline run of whole trajectories.
+
+        wrenches: (steps, dof) or (steps, batch, dof) sampled every dt
+        seconds. Returns pulse widths of the same leading shape with the
+        thruster axis last. Allocation is computed for all steps at once,
+        slew limiting walks the time axis vectorized over the batch.
+        """
+        w = np.asarray(wrenches, dtype=np.float64)
+        squeeze = w.ndim == 2
+        if squeeze:
+            w = w[:, None, :]
+        steps, batch, dof = w.shape
+        target = self.pulse_widths(w.reshape(-1, dof)).reshape(steps, batch, -1)
+        out = np.empty_like(target)
+        prev = np.full(target.shape[1:], float(self.pwm_min))
+        for i in range(steps):
+            prev = out[i] = self.slew(target[i], prev, dt)
+        return out[:, 0] if squeeze else out
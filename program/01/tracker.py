@@ -0,0 +1,146 @@
+import itertools
+from collections import deque
+import numpy as np
+
+
+def class_index(class_names, name):
+    """Index of `name` in the model's class names (dict or list), -1 if the model lacks it."""
+    items = class_names.items() if isinstance(class_names, dict) else enumerate(class_names)
+    for i, n in items:
+        if n == name:
+            return int(i)
+    return -1
+
+
+def iou_ltwh(a, b):
+    """IoU matrix between (n, 4) and (m, 4) left, top, width, height boxes."""
+    a1, a2 = a[:, None, :2], a[:, None, :2] + a[:, None, 2:]
+    b1, b2 = b[None, :, :2], b[None, :, :2] + b[None, :, 2:]
+    wh = np.clip(np.minimum(a2, b2) - np.maximum(a1, b1), 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - inter
+    return inter / (union + 1e-9)
+
+
+class Track:
+    def __init__(self, track_id, class_id, box, score, t, history):
+        self.id = track_id
+        self.class_id = class_id
+        self.box = np.array(box, dtype=np.float32)
+        self.velocity = np.zeros(2, dtype=np.float32)  # px/s of the top-left corner
+        self.scores = deque([float(score)], maxlen=history)
+        self.age = 1
+        self.hits = 1
+        self.misses = 0
+        self.last_time = t
+
+    @property
+    def confidence(self):
+        return sum(self.scores) / len(self.scores)
+
+    def predict(self, t):
+        return self.box[:2] + self.velocity * (t - self.last_time)
+
+    def __repr__(self):
+        return f"Track(id={self.id}, class_id={self.class_id}, conf={self.confidence:.2f}, age={self.age})"
+
+
+class MultiObjectTracker:
+    """IoU tracker with constant-velocity prediction and persistent track ids.
+
+    update() takes a (boxes, scores, class_ids) result from postprocess and
+    the frame timestamp; detections only match tracks of the same class.
+    """
+
+    def __init__(self, iou_thres=0.3, max_misses=5, min_hits=2, history=5, velocity_smoothing=0.5):
+        self.iou_thres = iou_thres
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.history = history
+        self.velocity_smoothing = velocity_smoothing
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._frames = 0
+
+    def update(self, result, t=None):
+        self._frames += 1
+        t = float(self._frames) if t is None else t
+        boxes, scores, class_ids = result
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        matched_tracks, matched_dets = set(), set()
+        if self.tracks and len(boxes):
+            predicted = np.array([np.concatenate([tr.predict(t), tr.box[2:]]) for tr in self.tracks], dtype=np.float32)
+            iou = iou_ltwh(predicted, boxes)
+            track_cls = np.array([tr.class_id for tr in self.tracks])
+            iou[track_cls[:, None] != np.asarray(class_ids)[None, :]] = 0
+            # greedy assignment, best overlap first
+            for flat in np.argsort(-iou, axis=None):
+                i, j = divmod(int(flat), iou.shape[1])
+                if iou[i, j] < self.iou_thres:
+                    break
+                if i in matched_tracks or j in matched_dets:
+                    continue
+                matched_tracks.add(i)
+                matched_dets.add(j)
+                self._update_track(self.tracks[i], boxes[j], scores[j], t)
+
+        for i, tr in enumerate(self.tracks):
+            if i not in matched_tracks:
+                tr.misses += 1
+                tr.age += 1
+                tr.scores.append(0.0)  # a miss pulls the smoothed confidence down
+        self.tracks = [tr for tr in self.tracks if tr.misses <= self.max_misses]
+        for j in range(len(boxes)):
+            if j not in matched_dets:
+                self.tracks.append(Track(next(self._ids), int(class_ids[j]), boxes[j], scores[j], t, self.history))
+        return self.confirmed()
+
+    def _update_track(self, tr, box, score, t):
+        dt = t - tr.last_time
+        if dt > 0:
+            v = (box[:2] - tr.box[:2]) / dt
+            a = self.velocity_smoothing
+            tr.velocity = a * tr.velocity + (1 - a) * v
+        tr.box = np.array(box, dtype=np.float32)
+        tr.scores.append(float(score))
+        tr.age += 1
+        tr.hits += 1
+        tr.misses = 0
+        tr.last_time = t
+
+    def confirmed(self):
+        return [tr for tr in self.tracks if tr.hits >= self.min_hits]
+
+
+class DecisionFilter:
+    """Debounced on/off decision per class index with hysteresis.
+
+    A class turns on after on_frames consecutive updates where its best
+    confirmed track confidence is >= on_thres, and turns off only after
+    off_frames consecutive updates below off_thres (or with no track).
+    """
+
+    def __init__(self, class_ids, on_thres=0.8, off_thres=0.6, on_frames=2, off_frames=3):
+        self.on_thres = on_thres
+        self.off_thres = off_thres
+        self.on_frames = on_frames
+        self.off_frames = off_frames
+        self.active = {c: False for c in class_ids}
+        self._count = {c: 0 for c in class_ids}
+
+    def update(self, tracks):
+        best = {c: 0.0 for c in self.active}
+        for tr in tracks:
+            if tr.class_id in best:
+                best[tr.class_id] = max(best[tr.class_id], tr.confidence)
+        for c, conf in best.items():
+            if self.active[c]:
+                self._count[c] = self._count[c] + 1 if conf < self.off_thres else 0
+                if self._count[c] >= self.off_frames:
+                    self.active[c], self._count[c] = False, 0
+            else:
+                self._count[c] = self._count[c] + 1 if conf >= self.on_thres else 0
+                if self._count[c] >= self.on_frames:
+                    self.active[c], self._count[c] = True, 0
+        return self.active
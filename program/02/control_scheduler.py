@@ -0,0 +1,182 @@
+import threading
+import time
+from profiler import LatencyHistogram
+
+
+class Maneuver:
+    """Timed sequence of motor steps, advanced by tick() without ever sleeping.
+
+    steps are (label, action, duration): action(motor_control) is applied
+    on every tick while the step is current (MotorControl skips unchanged
+    channels, so repeating it is free), and every step gets at least one
+    tick even with duration 0. Deadlines follow each other exactly, a late
+    tick does not stretch the maneuver.
+    """
+
+    def __init__(self, name, steps, priority=1, interruptible=False):
+        self.name = name
+        self.steps = steps
+        self.priority = priority            # a higher-priority maneuver may replace an interruptible one
+        self.interruptible = interruptible
+        self.index = None
+        self.deadline = None
+
+    @property
+    def step(self):
+        return self.steps[self.index][0] if self.index is not None and self.index < len(self.steps) else None
+
+    @property
+    def done(self):
+        return self.index is not None and self.index >= len(self.steps)
+
+    def tick(self, motor_control, now):
+        """Apply the current step at time now, False once the maneuver has finished."""
+        if self.index is None:
+            self.index = 0
+            self.deadline = now + self.steps[0][2]
+        elif now >= self.deadline:
+            self.index += 1
+            if self.index >= len(self.steps):
+                return False
+            self.deadline += self.steps[self.index][2]
+        self.steps[self.index][1](motor_control)
+        return True
+
+
+def dodge(direction, duration=2.0, descend=True):
+    """Sideways (and down) for duration, then stop; direction is 'kiri' or 'kanan'."""
+    def move(mc):
+        if descend:
+            mc.move_down()
+        if direction == "kiri":
+            mc.move_left()
+        else:
+            mc.move_right()
+    return Maneuver(f"dodge_{direction}", [("menghindar", move, duration),
+                                           ("stop", lambda mc: mc.stop_all_motors(), 0.0)], priority=2)
+
+
+def descend(duration=1.0):
+    return Maneuver("descend", [("turun", lambda mc: mc.move_down(), duration),
+                                ("stop", lambda mc: mc.stop_all_motors(), 0.0)], priority=2)
+
+
+def slow_through_gate(duration=1.0, throttle_us=1000):
+    """Rear thrusters slow for duration, so the robot keeps going through after the gate leaves the view."""
+    def slow(mc):
+        mc.set_motor_throttle(mc.MOTOR_CHANNELS["motor_5"], throttle_us)
+        mc.set_motor_throttle(mc.MOTOR_CHANNELS["motor_6"], throttle_us)
+    return Maneuver("slow_through_gate", [("lambat", slow, duration)], priority=1, interruptible=True)
+
+
+def confidence_policy(motor_control, cylinder_thres, gate_thres, dodge_time=2.0):
+    """ControlScheduler policy around MotorControl.move_based_on_confidence.
+
+    The decision is {"cylinder": confidence, "gate": confidence}; a cylinder
+    starts a dodge that the scheduler keeps ticking to the end.
+    """
+    def policy(decision, now):
+        arah = motor_control.move_based_on_confidence(decision.get("cylinder", 0.0), decision.get("gate", 0.0),
+                                                      cylinder_thres, gate_thres)
+        return dodge(arah, dodge_time, descend=False) if arah else None
+    return policy
+
+
+class ControlScheduler:
+    """Ticks thruster updates at a fixed rate, independent of the camera/inference rate.
+
+    Perception hands in its latest decision with set_decision(); every
+    tick calls policy(decision, now), which applies steady commands and may
+    return a Maneuver to start. A running maneuver is ticked until it
+    finishes and is only replaced when it is interruptible and the policy
+    asks for a higher priority one. Each tick ends in a single
+    MotorControl commit.
+
+    start() runs the ticks on a thread; tick(now) can also be driven by
+    hand, e.g. with a simulated clock for replay.
+    """
+
+    def __init__(self, motor_control, policy, rate_hz=50.0):
+        self.motor_control = motor_control
+        self.policy = policy
+        self.period = 1.0 / rate_hz
+        self.maneuver = None
+        self._decision = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.ticks = 0
+        self.overruns = 0     # ticks skipped because a tick ran late by more than a period
+        self.maneuvers = 0
+        self.jitter = LatencyHistogram(max_ms=100.0, bin_ms=0.01)
+        self.jitter_max = 0.0
+        self.tick_time = LatencyHistogram(max_ms=100.0, bin_ms=0.01)
+
+    def set_decision(self, decision):
+        with self._lock:
+            self._decision = decision
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            decision = self._decision
+        mc = self.motor_control
+        with mc.batch():
+            m = self.maneuver
+            if m is None or m.interruptible:
+                wanted = self.policy(decision, now)
+                if wanted is not None and (m is None or wanted.priority > m.priority):
+                    self.maneuver = m = wanted
+                    self.maneuvers += 1
+            if m is not None and not m.tick(mc, now):
+                self.maneuver = None
+        self.ticks += 1
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now < next_time:
+                self._stop.wait(next_time - now)
+                continue
+            late = now - next_time
+            self.jitter.add(late)
+            self.jitter_max = max(self.jitter_max, late)
+            try:
+                self.tick(now)
+            except Exception as e:
+                print(f"Gagal menjalankan tick kontrol: {e!r}")
+            self.tick_time.add(time.monotonic() - now)
+            next_time += self.period
+            behind = time.monotonic() - next_time
+            if behind > self.period:
+                # do not burst to catch up, drop the missed ticks
+                skipped = int(behind / self.period)
+                self.overruns += skipped
+                next_time += skipped * self.period
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="control", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def stats(self):
+        jitter = self.jitter.summary()
+        return {
+            "rate_hz": 1.0 / self.period,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "maneuvers": self.maneuvers,
+            "jitter_mean_ms": jitter["mean_ms"],
+            "jitter_p50_ms": jitter["p50_ms"],
+            "jitter_p99_ms": jitter["p99_ms"],
+            "jitter_max_ms": 1000 * self.jitter_max,
+            "tick_mean_ms": self.tick_time.summary()["mean_ms"],
+        }
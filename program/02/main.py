@@ -1,8 +1,18 @@
+import time
+START_TIME = time.monotonic()  # before the heavy imports, the startup breakdown starts here
+from concurrent.futures import ThreadPoolExecutor
 from motor_control import MotorControl
 from run_ncnn import NCNNRunner
+from camera_source import CameraSource
+from pipeline import Pipeline
+from tracker import MultiObjectTracker, DecisionFilter, class_index
+from control_scheduler import ControlScheduler, dodge, slow_through_gate
+from startup import StartupTimer
+from flight_recorder import FlightRecorder, DEFAULT_PATH as DEFAULT_RECORD
+from ratelog import RateLimitedLogger
+import ratelog
 import cv2
 import os
-import time
 import random
 
 class RobotControl:
@@ -43,14 +53,33 @@ class RobotControl:
     def stop_all_motors(self):
         self.motor_control.stop_all_motors()
 
-    def run_realtime_multiobj(self, model_path="obstacle_ncnn_model", confidence_thres=0.8, iou_thres=0.45, save_threshold=0.6):
-        cap = cv2.VideoCapture(0)
+    def run_realtime_multiobj(self, model_path="obstacle_ncnn_model", confidence_thres=0.8, iou_thres=0.45, save_threshold=0.6, camera_source=0,
+                              dodge_time=2.0, gate_time=1.0, control_rate=50.0, arm_delay=3.0,
+                              record=DEFAULT_RECORD):
+        startup = StartupTimer(START_TIME)
+        log = RateLimitedLogger("polrov.decide")
+        # ring file of frames, detections and PWM writes; survives a crash of the process
+        recorder = FlightRecorder(record) if record else None
+        startup.mark("imports", since=0.0)
+        motor_control = self.motor_control
+        # neutral to the ESCs first: the arming delay runs while the camera opens and the model loads
+        startup.timed("motors", motor_control.stop_all_motors)
+        armed_at = time.monotonic() + arm_delay
+        if self.cap.isOpened():
+            self.cap.release()  # the grabber thread opens the device itself
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as pool:
+            camera = pool.submit(startup.timed, "camera", lambda: CameraSource(camera_source).start())
+            model = pool.submit(startup.timed, "model", NCNNRunner, model_path)
+            cap = camera.result()
+            detector = model.result()
         if not cap.isOpened():
             print("Tidak dapat membuka kamera.")
+            motor_control.stop_all_motors()
+            if recorder is not None:
+                recorder.close()
             return
-
-        detector = NCNNRunner(model_path)
-        motor_control = MotorControl()
+        motor_control.recorder = recorder
+        startup.timed("warmup", detector.warmup)
 
         output_dir = "screenshots"
         os.makedirs(output_dir, exist_ok=True)
@@ -58,66 +87,91 @@ class RobotControl:
         screenshot_enabled = False
         print("Tekan 's' untuk AKTIF/NONAKTIFKAN screenshot otomatis.")
         print("Tekan 'q' untuk keluar.")
-        
-        motor_control.stop_all_motors()
-        time.sleep(3)
+
+        startup.timed("arming", time.sleep, max(armed_at - time.monotonic(), 0.0))
+        first_decision = True
 
         robot_active = True
-        try:
+        gate_id = class_index(detector.class_names, "Gate")
+        cylinder_id = class_index(detector.class_names, "Cylinder")
+        tracker = MultiObjectTracker()
+        decisions = DecisionFilter((gate_id, cylinder_id), on_thres=confidence_thres, off_thres=0.75 * confidence_thres)
+
+        def read_frame():
             while True:
-                start_time = time.time()
                 ret, frame = cap.read()
-                if not ret:
-                    print("Gagal membaca frame.")
+                if ret:
                     break
-
-                im2 = detector.preprocess(frame)
-                y = detector.predict(im2)
-                r = detector.postprocess(frame, y, confidence_thres, iou_thres)
-
-                dimg = frame.copy()
-                box_got, score_got, class_id_got = r
-
-                gate_detected = False
-                cylinder_detected = False
-
-                for i in range(len(box_got)):
-                    box = box_got[i]
-                    score = score_got[i]
-                    class_id = class_id_got[i]
-                    class_name = detector.class_names[class_id]
-
-                    if class_name == "Gate" and score >= confidence_thres:
-                        gate_detected = True
-
-                    if class_name == "Cylinder" and score >= confidence_thres:
-                        cylinder_detected = True
-
-                if cylinder_detected:
-                    print("Silinder terdeteksi. Robot bergerak ke kiri atau kanan secara acak...")
-                    motor_control.move_down()
-                    if random.choice([True, False]):
-                        motor_control.move_left()
-                        arah = "kiri"
-                    else:
-                        motor_control.move_right()
-                        arah = "kanan"
-
-                    print(f"Robot bergerak ke {arah} ...")
-                    time.sleep(0)  
-                    motor_control.stop_all_motors()
-                    robot_active = True
-
-                elif gate_detected:
-                    print("Gate terdeteksi. Robot bergerak lebih lambat...")
-                    motor_control.set_motor_throttle(5, 1000)
-                    motor_control.set_motor_throttle(6, 1000)
-
-                elif robot_active:
-                    motor_control.move_forward()
-
-                end_time = time.time()
-                fps = 1 / (end_time - start_time)
+                # a read also fails on a plain timeout; a stalled camera is waited for, only its end stops the run
+                if cap.ended or pipeline.stop_event.is_set():
+                    print("Gagal membaca frame.")
+                    return None
+                log.warning("kamera_tertunda")
+            return {"frame": frame, "frame_id": cap.last_frame_id, "frame_time": cap.last_frame_time}
+
+        def preprocess(item):
+            item["input"] = detector.preprocess(item["frame"])
+            item["pad"] = (detector.dw, detector.dh)
+            item["t_preprocess"] = time.monotonic()
+            return item
+
+        def infer(item):
+            item["output"] = detector.predict(item.pop("input"))
+            item["t_infer"] = time.monotonic()
+            return item
+
+        def control_policy(decision, now):
+            # runs on the control thread every tick, a dodge keeps going without new frames
+            nonlocal robot_active
+            if decision.get(cylinder_id):
+                arah = random.choice(["kiri", "kanan"])
+                log.info("silinder", arah=arah)
+                robot_active = True
+                return dodge(arah, dodge_time)
+            if decision.get(gate_id):
+                log.info("gate")
+                return slow_through_gate(gate_time)
+            if robot_active:
+                motor_control.move_forward()
+            return None
+
+        scheduler = ControlScheduler(motor_control, control_policy, control_rate)
+
+        def decide(item):
+            nonlocal first_decision
+            frame = item["frame"]
+            if recorder is not None:
+                recorder.frame_id = item["frame_id"]
+            r = detector.postprocess(frame, item.pop("output"), confidence_thres, iou_thres, pad=item["pad"])
+            scheduler.set_decision(dict(decisions.update(tracker.update(r, item["frame_time"]))))
+            cap.mark_decision(item["frame_time"])
+            if recorder is not None:
+                recorder.frame(item["frame_id"], (item["frame_time"], item["t_preprocess"], item["t_infer"],
+                                                  time.monotonic()), r)
+            if first_decision:
+                first_decision = False
+                startup.mark("first_decision")
+                print(f"Waktu startup:\n{startup.format()}")
+            return item
+
+        # capture -> preprocess -> infer -> decide, display stays on this thread
+        pipeline = (Pipeline(read_frame)
+                    .add_stage("preprocess", preprocess)
+                    .add_stage("infer", infer)
+                    .add_stage("decide", decide))
+        last_time = time.time()
+        try:
+            scheduler.start()
+            pipeline.start()
+            while pipeline.running:
+                item = pipeline.get(timeout=0.1)
+                if item is None:
+                    continue
+
+                dimg = item["frame"].copy()
+                now = time.time()
+                fps = 1 / max(now - last_time, 1e-6)
+                last_time = now
                 status = "Screenshot: ON" if screenshot_enabled else "Screenshot: OFF"
                 cv2.putText(dimg, f"FPS: {fps:.2f} | {status}", (10, 30),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
@@ -134,12 +188,21 @@ class RobotControl:
         except KeyboardInterrupt:
             print("Program dihentikan.")
         finally:
+            pipeline.stop()
+            scheduler.stop()
+            print(f"Statistik pipeline:\n{pipeline.format_stats()}")
+            print(f"Statistik kontrol: {scheduler.stats()}")
             print("Menghentikan semua motor dan membersihkan...")
             motor_control.stop_all_motors()
+            print(f"Statistik PWM: {motor_control.write_stats()}")
+            print(f"Statistik kamera: {cap.stats()}")
             cap.release()
+            if recorder is not None:
+                recorder.close()
             cv2.destroyAllWindows()
 
 if __name__ == "__main__":
+    ratelog.setup()
     model_dir = "obstacle_ncnn_model"
     rc = RobotControl()
     rc.run_realtime_multiobj(model_path=model_dir)
@@ -1,14 +1,33 @@
+import struct
+import threading
 import time
+from contextlib import contextmanager
 from adafruit_pca9685 import PCA9685
 import busio
 import board
 
+LED0_ON_L = 0x06  # first PWM register of the PCA9685, 4 bytes per channel
+
+
 class MotorControl:
-    def __init__(self):
+    def __init__(self, block_writes=True):
         i2c = busio.I2C(board.SCL, board.SDA)
         self.pwm = PCA9685(i2c)
+        # also turns on register auto-increment (MODE1 AI), needed for block writes
         self.pwm.frequency = 50
 
+        self._duty = {}      # last committed duty_cycle, per channel
+        self._pending = {}   # requested but not yet committed
+        self._local = threading.local()  # per-thread batch() state, see batch()
+        self._lock = threading.RLock()
+        self._regs = None
+        if block_writes and hasattr(self.pwm, "i2c_device"):
+            self._regs = self._read_registers()
+        self.writes_issued = 0
+        self.writes_suppressed = 0
+        self.bus_transactions = 0
+        self.recorder = None  # flight_recorder.FlightRecorder, gets every committed write
+
         self.MOTOR_CHANNELS = {
             "motor_1": 1,
             "motor_2": 14,
@@ -23,34 +42,113 @@ class MotorControl:
         self.PWM_MEDIUM = 1300  # Kecepatan sedang
         self.PWM_SLOW = 1000    # Kecepatan lambat
 
+    def _request(self, values):
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            batch.update(values)  # this thread is inside batch(), committed when it ends
+            return
+        with self._lock:
+            self._pending.update(values)
+            self.commit()
+
     def set_motor_throttle(self, channel, throttle_us):
         pwm_value = int((throttle_us / 20000) * 65535)
-        self.pwm.channels[channel].duty_cycle = pwm_value
+        self._request({channel: pwm_value})
+
+    @contextmanager
+    def batch(self):
+        """Collect throttle changes and push them with a single commit at the end."""
+        if getattr(self._local, "batch", None) is not None:
+            yield self  # nested: the outermost batch commits
+            return
+        self._local.batch = {}
+        try:
+            yield self
+        finally:
+            collected, self._local.batch = self._local.batch, None
+            with self._lock:
+                self._pending.update(collected)
+                self.commit()
+
+    def commit(self):
+        """Write every pending channel whose duty cycle differs from the last commit."""
+        with self._lock:
+            changed = {ch: v for ch, v in self._pending.items() if self._duty.get(ch) != v}
+            self.writes_suppressed += len(self._pending) - len(changed)
+            self._pending.clear()
+            if not changed:
+                return 0
+            self.writes_issued += len(changed)
+            if self.recorder is not None:
+                self.recorder.pwm(changed)
+            self._write(changed)
+            self._duty.update(changed)
+            return len(changed)
+
+    def _write(self, changed):
+        if self._regs is not None:
+            self._write_block(changed)
+        else:
+            for ch, v in changed.items():
+                self.pwm.channels[ch].duty_cycle = v
+            self.bus_transactions += len(changed)
+
+    def _read_registers(self):
+        regs = bytearray(64)
+        with self.pwm.i2c_device as i2c:
+            i2c.write_then_readinto(bytes([LED0_ON_L]), regs)
+        return regs
+
+    def _write_block(self, changed):
+        # same encoding as adafruit_pca9685 PWMChannel.duty_cycle
+        for ch, v in changed.items():
+            on, off = (0x1000, 0) if v == 0xFFFF else (0, (v + 1) >> 4)
+            struct.pack_into("<HH", self._regs, 4 * ch, on, off)
+        # one auto-increment write from the lowest to the highest changed channel,
+        # channels in between are rewritten with their cached registers
+        lo, hi = min(changed), max(changed) + 1
+        with self.pwm.i2c_device as i2c:
+            i2c.write(bytes([LED0_ON_L + 4 * lo]) + self._regs[4 * lo:4 * hi])
+        self.bus_transactions += 1
+
+    def write_stats(self):
+        return {
+            "issued": self.writes_issued,
+            "suppressed": self.writes_suppressed,
+            "bus_transactions": self.bus_transactions,
+        }
 
     def move_forward(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
 
     def move_backward(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
 
     def move_left(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_1"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_5"], self.PWM_MEDIUM)
 
     def move_right(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_2"], self.PWM_MEDIUM)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_6"], self.PWM_MEDIUM)
 
     def move_down(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MAX)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MAX)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MAX)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MAX)
 
     def move_up(self):
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MIN)
-        self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MIN)
+        with self.batch():
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_3"], self.PWM_MIN)
+            self.set_motor_throttle(self.MOTOR_CHANNELS["motor_4"], self.PWM_MIN)
 
     def stop_all_motors(self):
-        for ch in self.MOTOR_CHANNELS.values():
-            self.set_motor_throttle(ch, self.PWM_MIN)
+        with self.batch():
+            for ch in self.MOTOR_CHANNELS.values():
+                self.set_motor_throttle(ch, self.PWM_MIN)
@@ -0,0 +1,39 @@
+import numpy as np
+
+# only the histogram of program/01/profiler.py, the control scheduler reports its jitter with it
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram (0.1 ms bins up to max_ms), memory stays constant."""
+
+    def __init__(self, max_ms=2000.0, bin_ms=0.1):
+        self.bin_ms = bin_ms
+        self.counts = np.zeros(int(max_ms / bin_ms) + 1, dtype=np.int64)
+        self.total = 0.0
+        self.n = 0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[min(int(ms / self.bin_ms), len(self.counts) - 1)] += 1
+        self.total += ms
+        self.n += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.n += other.n
+        return self
+
+    def percentile(self, q):
+        if self.n == 0:
+            return 0.0
+        idx = np.searchsorted(np.cumsum(self.counts), q / 100 * self.n)
+        return float((idx + 0.5) * self.bin_ms)
+
+    def summary(self):
+        return {
+            "mean_ms": self.total / self.n if self.n else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+        }
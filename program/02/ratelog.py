@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+
+_configured = False
+
+
+def setup(level=logging.INFO):
+    """One-line records on stderr; only the first call configures anything.
+
+    Called by the entry points (__main__), importing a module never
+    configures logging.
+    """
+    global _configured
+    if not _configured:
+        logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+        _configured = True
+
+
+class RateLimitedLogger:
+    """Structured 'event key=value ...' logging, at most one record per event per interval.
+
+    Suppressed calls are only counted, the next record that goes out
+    carries suppressed=N, so a decision repeated every frame costs a dict
+    lookup instead of a console write.
+    """
+
+    def __init__(self, name, interval=1.0):
+        self.logger = logging.getLogger(name)
+        self.interval = interval
+        self._last = {}        # event -> time of the last emitted record
+        self._suppressed = {}  # event -> calls dropped since then
+        self._lock = threading.Lock()
+
+    def log(self, level, event, **fields):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(event, -self.interval) < self.interval:
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return False
+            self._last[event] = now
+            suppressed = self._suppressed.pop(event, 0)
+        if suppressed:
+            fields["suppressed"] = suppressed
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, " ".join([event] + [f"{k}={v}" for k, v in fields.items()]))
+        return True
+
+    def info(self, event, **fields):
+        return self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        return self.log(logging.WARNING, event, **fields)
@@ -1,15 +1,75 @@
 import ncnn as pyncnn
-import yaml
 import os
 import sys
 import numpy as np
-import torch.nn as nn
-import torch
 import cv2
 
+# one detection per record, handy for logging / serialising postprocess output
+DETECTION_DTYPE = np.dtype([("box", np.float32, (4,)), ("score", np.float32), ("class_id", np.int32)])
+
+
+def nms(boxes, scores, iou_thres, class_ids=None, max_det=300):
+    """NMS over (n, 4) xywh boxes in OpenCV's C++ loop, class-aware when class_ids is given.
+
+    Returns at most max_det kept indices, sorted by descending score.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+    scores = np.ascontiguousarray(scores, dtype=np.float32)
+    if class_ids is None:
+        keep = cv2.dnn.NMSBoxes(boxes, scores, 0.0, iou_thres)
+    else:
+        # OpenCV offsets each class by the largest coordinate, which only separates the classes for boxes
+        # at >= 0; boxes may start left of / above the image, IoU does not change when all are moved
+        boxes = boxes.copy()
+        boxes[:, :2] -= min(float(boxes[:, :2].min()), 0.0)
+        keep = cv2.dnn.NMSBoxesBatched(boxes, scores, np.ascontiguousarray(class_ids, dtype=np.int32), 0.0, iou_thres)
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:max_det]
+
+
+def decode_output(output, confidence_thres, iou_thres, dw=0.0, dh=0.0, gain=1.0, max_det=300):
+    """Decode a raw YOLO head (1, 4 + C, N) into (boxes, scores, class_ids).
+
+    Boxes are left, top, width, height in original image coordinates.
+    """
+    pred = np.squeeze(output)  # (4 + C, N)
+    class_scores = pred[4:]
+    max_scores = class_scores.max(axis=0)
+    candidates = np.flatnonzero(max_scores >= confidence_thres)
+    if candidates.size == 0:
+        return (np.empty((0, 4), dtype=np.float32),
+                np.empty(0, dtype=np.float32),
+                np.empty(0, dtype=np.int32))
+
+    scores = max_scores[candidates].astype(np.float32)
+    class_ids = class_scores[:, candidates].argmax(axis=0).astype(np.int32)
+    cx, cy, w, h = pred[:4, candidates].astype(np.float32)
+    boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+
+    keep = nms(boxes, scores, iou_thres, class_ids, max_det)
+    boxes = boxes[keep]
+    # undo the letterbox: remove padding, then rescale
+    boxes[:, 0] -= dw
+    boxes[:, 1] -= dh
+    boxes *= gain
+    return boxes, scores[keep], class_ids[keep]
+
+
+def to_records(r):
+    """Pack a (boxes, scores, class_ids) result into a DETECTION_DTYPE array."""
+    box_got, score_got, class_id_got = r
+    rec = np.empty(len(score_got), dtype=DETECTION_DTYPE)
+    rec["box"] = box_got
+    rec["score"] = score_got
+    rec["class_id"] = class_id_got
+    return rec
+
+
 class NCNNRunner:
-    def __init__(self, model_path,use_gpu=False):
+    def __init__(self, model_path,use_gpu=False,use_torch=False):
         self.model_path = model_path
+        self.use_torch = use_torch  # legacy torch preprocessing
         self.net = pyncnn.Net()
         self.net.opt.use_vulkan_compute = use_gpu
         param_path = os.path.join(model_path,"model.ncnn.param")
@@ -29,10 +89,15 @@ class NCNNRunner:
         if not os.path.exists(self.metadata):
             print("metadata file not found")
             sys.exit(1)
+        import yaml  # only needed here, keeps module import cheap
         with open(self.metadata, 'r') as f:
             data = yaml.safe_load(f)
         self.model_input_shape = data["imgsz"]
         self.class_names = data["names"]
+        # BGR->RGB and 0-255 -> 0.0-1.0 are done by ncnn itself
+        self.norm_vals = [1 / 255.0, 1 / 255.0, 1 / 255.0]
+        self._letterbox_buf = None
+        self._letterbox_shape = None
     
     #   pre_transform
     def pre_transform(self,img):
@@ -64,7 +129,42 @@ class NCNNRunner:
         self.ratio = ratio
 
         return img  #640 640 3 
+
+    def letterbox(self, img):
+        """Letterbox img into a reused buffer, same geometry as pre_transform."""
+        shape = img.shape[:2]
+        if self._letterbox_shape != shape:
+            new_shape = self.model_input_shape
+            r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+            new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+            dw = (new_shape[1] - new_unpad[0]) / 2
+            dh = (new_shape[0] - new_unpad[1]) / 2
+            top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+            # padding is written once, every frame only refreshes the image area
+            self._letterbox_buf = np.full((new_shape[0], new_shape[1], 3), 114, dtype=np.uint8)
+            self._letterbox_roi = self._letterbox_buf[top:top + new_unpad[1], left:left + new_unpad[0]]
+            self._letterbox_geom = (dw, dh, (r, r))
+            self._letterbox_shape = shape
+        self.dw, self.dh, self.ratio = self._letterbox_geom
+        roi = self._letterbox_roi
+        if roi.shape[:2] != shape:
+            cv2.resize(img, (roi.shape[1], roi.shape[0]), dst=roi, interpolation=cv2.INTER_LINEAR)
+        else:
+            np.copyto(roi, img)
+        return self._letterbox_buf
+
     def preprocess(self,im):
+        if self.use_torch:
+            return self.preprocess_torch(im)
+        img = self.letterbox(im)
+        h, w = img.shape[:2]
+        mat_in = pyncnn.Mat.from_pixels(img, pyncnn.Mat.PixelType.PIXEL_BGR2RGB, w, h)
+        mat_in.substract_mean_normalize([], self.norm_vals)
+        return mat_in
+
+    def preprocess_torch(self,im):
+        import torch
+
         im2 = np.stack([self.pre_transform(im)])  # (h, w, c) to (1, h, w, c)ï¼Œ1 ï¼Œ640 ï¼Œ640 ï¼Œ3 
 
         im2 = im2[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW, (n, 3, h, w)   # 1,3,640,640
@@ -76,9 +176,19 @@ class NCNNRunner:
         return im2
 
 
+    def warmup(self, runs=1):
+        """Run the net on a blank input so the first real frame does not pay for layer setup and allocation."""
+        h, w = self.model_input_shape
+        blank = np.zeros((h, w, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.predict(self.preprocess(blank))
+
     def predict(self,img2):
-        b, ch, h, w = img2.shape  # batch, channel, height, width   1 3 640 640
-        mat_in = pyncnn.Mat(img2[0].cpu().numpy())  # im[0].shape  3,640,640
+        if isinstance(img2, pyncnn.Mat):
+            mat_in = img2
+        else:
+            b, ch, h, w = img2.shape  # batch, channel, height, width   1 3 640 640
+            mat_in = pyncnn.Mat(img2[0].cpu().numpy())  # im[0].shape  3,640,640
         with self.net.create_extractor() as ex:
             ex.input(self.net.input_names()[0], mat_in) # self.net.input_names()[0] == in0
             # WARNING: 'output_names' sorted as a temporary fix for https://github.com/pnnx/pnnx/issues/130
@@ -87,51 +197,15 @@ class NCNNRunner:
         
         return y
 
-    def postprocess(self,input_image, output,confidence_thres,iou_thres):
-        print(f"Postprocessing shape: {len(output)} {output[0].shape}")
-
-        outputs = np.transpose(np.squeeze(output[0]))
-        rows = outputs.shape[0]
-        boxes, scores, class_ids = [], [], []
-
-        input_image_height, input_image_width = input_image.shape[:2]
+    def postprocess(self,input_image, output,confidence_thres,iou_thres,pad=None):
+        # pad: (dw, dh) of the frame's letterbox, defaults to the last pre_transform
+        dw, dh = pad if pad is not None else (self.dw, self.dh)
         model_input_height, model_input_width = self.model_input_shape
-       
-        ratio = (input_image_width / model_input_width, input_image_height / model_input_height)
-        np.set_printoptions(suppress=True)
-        for i in range(rows):
-            #print(outputs[i])
-            #print("{:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f} {:.2f}".format(outputs[i]))
-            classes_scores = outputs[i][4:]
-            max_score = np.amax(classes_scores)
-            if max_score >= confidence_thres:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = outputs[i][0], outputs[i][1], outputs[i][2], outputs[i][3]
-                
-                left = (x - w / 2)
-                top = (y - h / 2)
-                width = (w)
-                height = (h)
-
-                boxes.append([left, top, width, height])
-                scores.append(max_score)
-                class_ids.append(class_id)
-        
-        indices = cv2.dnn.NMSBoxes(boxes, scores, confidence_thres, iou_thres)
-        #print(indices,type(indices))
-        boxes = np.array(boxes)
-        scores = np.array(scores)
-        class_ids = np.array(class_ids)
-
-        for b in boxes:
-            
-            b[0] -= self.dw
-            b[1] -= self.dh        
-        
-        box_got = boxes[indices]*np.max(ratio)
-        score_got = scores[indices]
-        class_id_got = class_ids[indices]
-        return box_got, score_got, class_id_got
+        input_image_height, input_image_width = input_image.shape[:2]
+        # letterbox scale back to the original frame (1 / r used in pre_transform)
+        gain = max(input_image_width / model_input_width, input_image_height / model_input_height)
+        return decode_output(output[0], confidence_thres, iou_thres, dw, dh, gain)
+
     def show(self, input_image, r):
         
         dimg = input_image.copy()